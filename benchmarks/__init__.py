@@ -0,0 +1,11 @@
+"""Benchmarks of the tinyfasta package on synthetic data.
+
+Run the benchmarks from the root of the repository::
+
+    python -m benchmarks --scale 0.01
+
+The :mod:`benchmarks.generators` module writes deterministic FASTA files of
+realistic shapes and the :mod:`benchmarks.runner` module times the parser on
+them, reporting records/s, MB/s and peak memory use. Results can be saved as
+a JSON baseline and later runs compared against it.
+"""
@@ -0,0 +1,136 @@
+"""Deterministic generators of synthetic FASTA files.
+
+Each workload writes a FASTA file of a particular shape. The contents only
+depend on the scale and the seed, so files generated on different machines,
+or at different times, are identical. At a scale of 1.0 the files are of
+genome scale, use a smaller scale for quick runs.
+"""
+
+import random
+
+DNA = b"ACGT"
+PROTEIN = b"ACDEFGHIKLMNPQRSTVWY"
+
+_BLOCK_SIZE = 1024 * 1024
+
+
+def _translation_table(alphabet):
+    """Return table translating random bytes into letters of an alphabet."""
+    return bytes(bytearray(alphabet[i % len(alphabet)] for i in range(256)))
+
+_TABLES = {DNA: _translation_table(DNA), PROTEIN: _translation_table(PROTEIN)}
+
+
+def random_sequence(rng, length, alphabet=DNA):
+    """Return a random sequence as bytes.
+
+    :param rng: :class:`random.Random` instance
+    :param length: length of the sequence
+    :param alphabet: bytes with the letters to use
+    """
+    table = _TABLES.get(alphabet) or _translation_table(alphabet)
+    if not length:
+        return b""
+    # The same bytes as rng.randbytes(length), which needs Python 3.9.
+    random_bytes = rng.getrandbits(8 * length).to_bytes(length, "little")
+    return random_bytes.translate(table)
+
+
+def _sequence_lines(rng, length, alphabet, line_width):
+    """Yield the lines of a random sequence.
+
+    The line width is an int, None for a single line, or a function taking
+    the random number generator and returning the width of the next line.
+    """
+    if line_width is None:
+        line_width = length or 1
+    written = 0
+    while written < length:
+        if callable(line_width):
+            block = random_sequence(rng, min(_BLOCK_SIZE, length - written),
+                                    alphabet)
+            pos = 0
+            while pos < len(block):
+                width = line_width(rng)
+                yield block[pos:pos+width]
+                pos += width
+        else:
+            size = min(max(_BLOCK_SIZE // line_width, 1) * line_width,
+                       length - written)
+            block = random_sequence(rng, size, alphabet)
+            for pos in range(0, len(block), line_width):
+                yield block[pos:pos+line_width]
+        written += len(block)
+
+
+def write_fasta(fpath, records, alphabet=DNA, line_width=60, seed=0):
+    """Write a FASTA file with random sequences.
+
+    :param fpath: path of the FASTA file
+    :param records: iterable of (description, length) tuples
+    :param alphabet: bytes with the letters to use
+    :param line_width: int, None for single line sequences, or a function
+                       taking a :class:`random.Random` instance and returning
+                       the width of the next line
+    :param seed: seed of the random number generator
+    """
+    rng = random.Random(seed)
+    with open(fpath, "wb") as fh:
+        for description, length in records:
+            fh.write(">{}\n".format(description).encode("utf-8"))
+            for line in _sequence_lines(rng, length, alphabet, line_width):
+                fh.write(line)
+                fh.write(b"\n")
+
+
+def _scaled(value, scale):
+    """Return value multiplied by scale, but at least one."""
+    return max(int(value * scale), 1)
+
+
+def reads(fpath, scale=1.0, seed=0):
+    """Millions of short single line reads."""
+    lengths = random.Random(seed)
+    records = (("read{} length=150".format(i), 150 - lengths.randint(0, 10))
+               for i in range(_scaled(4000000, scale)))
+    write_fasta(fpath, records, line_width=None, seed=seed)
+
+
+def chromosomes(fpath, scale=1.0, seed=0):
+    """A few chromosome sized sequences."""
+    records = [("chr{}".format(i + 1), _scaled(250000000 - i * 50000000, scale))
+               for i in range(3)]
+    write_fasta(fpath, records, line_width=60, seed=seed)
+
+
+def proteins(fpath, scale=1.0, seed=0):
+    """A UniProt like protein database."""
+    lengths = random.Random(seed)
+    records = (("sp|P{:05d}|PROT{}_HUMAN Synthetic protein {}".format(i, i, i),
+                lengths.randint(50, 1000))
+               for i in range(_scaled(1000000, scale)))
+    write_fasta(fpath, records, alphabet=PROTEIN, line_width=60, seed=seed)
+
+
+def narrow_lines(fpath, scale=1.0, seed=0):
+    """Sequences written with a single base per line."""
+    records = (("narrow{}".format(i), 10000)
+               for i in range(_scaled(5000, scale)))
+    write_fasta(fpath, records, line_width=1, seed=seed)
+
+
+def ragged_lines(fpath, scale=1.0, seed=0):
+    """Sequences written with lines of random widths."""
+    records = (("ragged{}".format(i), 100000)
+               for i in range(_scaled(2000, scale)))
+    write_fasta(fpath, records,
+                line_width=lambda rng: rng.randint(1, 200), seed=seed)
+
+
+WORKLOADS = {
+    "reads": reads,
+    "chromosomes": chromosomes,
+    "proteins": proteins,
+    "narrow_lines": narrow_lines,
+    "ragged_lines": ragged_lines,
+}
@@ -0,0 +1,258 @@
+"""Run the benchmarks and compare the results against a baseline.
+
+Each benchmark is run in a fresh Python process, so that the peak resident
+set size reported reflects that benchmark alone. The results are written as
+JSON, which can be passed back in using ``--compare`` to flag regressions.
+
+Usage::
+
+    python -m benchmarks [--scale SCALE] [--workloads NAME ...]
+                         [--benchmarks NAME ...] [--repeat N]
+                         [--data-dir DIR] [--save RESULTS.json]
+                         [--compare BASELINE.json] [--tolerance FRACTION]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generators import WORKLOADS
+from tinyfasta import FastaParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def parse_lines(fpath):
+    """Iterate over the records using the line based parser."""
+    return sum(1 for _ in FastaParser(fpath))
+
+
+def parse_mmap(fpath):
+    """Iterate over the records using the memory mapped parser."""
+    return sum(1 for _ in FastaParser(fpath, use_mmap=True))
+
+
+def parse_stream(fpath):
+    """Iterate over the records reading from a file object in blocks."""
+    with open(fpath, "rb") as fh:
+        return sum(1 for _ in FastaParser(fh))
+
+
+def parse_raw(fpath):
+    """Iterate over (header, sequence) tuples."""
+    return sum(1 for _ in FastaParser(fpath, raw=True))
+
+
+def sequence_content(fpath):
+    """Build the sequence string of every record."""
+    num_records = 0
+    for fasta_record in FastaParser(fpath, use_mmap=True):
+        str(fasta_record.sequence)
+        num_records += 1
+    return num_records
+
+
+def record_str(fpath):
+    """Format every record as a FASTA string."""
+    num_records = 0
+    for fasta_record in FastaParser(fpath, use_mmap=True):
+        str(fasta_record)
+        num_records += 1
+    return num_records
+
+
+BENCHMARKS = {
+    "parse_lines": parse_lines,
+    "parse_mmap": parse_mmap,
+    "parse_stream": parse_stream,
+    "parse_raw": parse_raw,
+    "sequence_content": sequence_content,
+    "record_str": record_str,
+}
+
+
+def _peak_rss():
+    """Return the peak resident set size of this process in bytes."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_child(benchmark, fpath):
+    """Run a single benchmark in this process and print the result as JSON."""
+    start = time.perf_counter()
+    num_records = BENCHMARKS[benchmark](fpath)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "records": num_records,
+                      "peak_rss": _peak_rss()}))
+
+
+def run_benchmark(benchmark, fpath):
+    """Return dictionary with the measurements of a benchmark run.
+
+    :param benchmark: name of the benchmark
+    :param fpath: path of the FASTA file to run the benchmark on
+    :returns: dict
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get("PYTHONPATH")] if p])
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.runner", "--child", benchmark,
+         fpath], env=env, cwd=ROOT)
+    measurement = json.loads(output.decode("utf-8").splitlines()[-1])
+    size = os.path.getsize(fpath)
+    seconds = max(measurement["seconds"], 1e-9)
+    return {
+        "records": measurement["records"],
+        "bytes": size,
+        "seconds": seconds,
+        "records_per_s": measurement["records"] / seconds,
+        "mb_per_s": size / (1024.0 * 1024.0) / seconds,
+        "peak_rss_mb": measurement["peak_rss"] / (1024.0 * 1024.0),
+    }
+
+
+def workload_path(data_dir, workload, scale, seed):
+    """Return path of a generated workload file, generating it if required."""
+    fpath = os.path.join(data_dir, "{}-{}-{}.fasta".format(workload, scale,
+                                                          seed))
+    if not os.path.isfile(fpath):
+        tmp_path = fpath + ".tmp"
+        WORKLOADS[workload](tmp_path, scale=scale, seed=seed)
+        os.rename(tmp_path, fpath)
+    return fpath
+
+
+def run(workloads, benchmarks, data_dir, scale=1.0, seed=0, repeat=1):
+    """Return the results of running the benchmarks on the workloads.
+
+    The fastest of the repeated runs is kept, along with the largest peak
+    resident set size.
+
+    :returns: dict
+    """
+    results = {}
+    for workload in workloads:
+        fpath = workload_path(data_dir, workload, scale, seed)
+        for benchmark in benchmarks:
+            best = None
+            for _ in range(repeat):
+                result = run_benchmark(benchmark, fpath)
+                if best is None:
+                    best = result
+                else:
+                    peak_rss_mb = max(best["peak_rss_mb"],
+                                      result["peak_rss_mb"])
+                    if result["seconds"] < best["seconds"]:
+                        best = result
+                    best["peak_rss_mb"] = peak_rss_mb
+            key = "{}/{}".format(workload, benchmark)
+            results[key] = best
+            print(format_result(key, best))
+            sys.stdout.flush()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def format_result(key, result):
+    """Return a line of the results table."""
+    return "{:32} {:>12.0f} rec/s {:>8.1f} MB/s {:>8.1f} MB RSS".format(
+        key, result["records_per_s"], result["mb_per_s"],
+        result["peak_rss_mb"])
+
+
+def compare(baseline, current, tolerance=0.1):
+    """Return list of (key, reason) tuples describing regressions.
+
+    A benchmark has regressed if its throughput has dropped, or its peak
+    memory use has grown, by more than the tolerated fraction.
+
+    :param baseline: results loaded from a baseline file
+    :param current: results of the current run
+    :param tolerance: tolerated relative change
+    :returns: list of tuples
+    """
+    regressions = []
+    if baseline.get("scale") != current.get("scale"):
+        raise ValueError("Cannot compare results run at different scales")
+    for key, result in sorted(current["results"].items()):
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        if result["records_per_s"] < before["records_per_s"] * (1 - tolerance):
+            regressions.append((key, "throughput {:.0f} -> {:.0f} rec/s".format(
+                before["records_per_s"], result["records_per_s"])))
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append((key, "peak RSS {:.1f} -> {:.1f} MB".format(
+                before["peak_rss_mb"], result["peak_rss_mb"])))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--scale", type=float, default=0.01,
+                        help="size of the workloads relative to genome scale "
+                             "(default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workloads", nargs="+", default=sorted(WORKLOADS),
+                        choices=sorted(WORKLOADS))
+    parser.add_argument("--benchmarks", nargs="+", default=sorted(BENCHMARKS),
+                        choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--data-dir",
+                        help="directory in which to keep the generated files, "
+                             "by default they are removed after the run")
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--compare", help="compare against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="tolerated relative change (default: "
+                             "%(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir)
+    try:
+        current = run(args.workloads, args.benchmarks, data_dir,
+                      scale=args.scale, seed=args.seed, repeat=args.repeat)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(current, fh, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(baseline, current, args.tolerance)
+        for key, reason in regressions:
+            print("REGRESSION {}: {}".format(key, reason))
+        if regressions:
+            sys.exit(1)
+        print("No regressions compared to {}".format(args.compare))
+
+
+if __name__ == "__main__":
+    main()
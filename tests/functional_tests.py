@@ -6,6 +6,9 @@ HERE = os.path.dirname(__file__)
 DATA_DIR = os.path.join(HERE, 'data')
 TMP_DIR = os.path.join(HERE, 'tmp')
 
+def contains_atta(fasta_record):
+    return fasta_record.sequence.contains("ATTA")
+
 import unittest
 class FunctionalTests(unittest.TestCase):
 
@@ -27,6 +30,173 @@ class FunctionalTests(unittest.TestCase):
         output_data = open(output_fasta, "r").read()
         self.assertEqual(input_data, output_data)
 
+    def test_fasta_writer_is_consistent_with_input(self):
+        from tinyfasta import FastaParser, FastaWriter
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta")
+        with FastaWriter(output_fasta, line_length=None) as writer:
+            writer.write_all(FastaParser(input_fasta))
+        input_data = open(input_fasta, "r").read()
+        output_data = open(output_fasta, "r").read()
+        self.assertEqual(input_data, output_data)
+
+    def test_fasta_writer_line_length_and_index(self):
+        from tinyfasta import FastaIndex, FastaRecord, FastaWriter
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta")
+        with FastaWriter(output_fasta, line_length=4,
+                         write_index=True) as writer:
+            writer.write(FastaRecord.create(">seq1 first", "ACGTACGTAC"))
+            writer.write(("seq2", "TTTT"))
+            writer.write(("seq3", ""))
+        self.assertEqual(open(output_fasta).read(),
+            ">seq1 first\nACGT\nACGT\nAC\n>seq2\nTTTT\n>seq3\n")
+        written_index = open(output_fasta + ".fai").read()
+        os.remove(output_fasta + ".fai")
+        FastaIndex(output_fasta).close()
+        self.assertEqual(written_index, open(output_fasta + ".fai").read())
+
+    def test_fasta_writer_bgzf(self):
+        from tinyfasta import FastaIndex, FastaParser, FastaWriter
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta.gz")
+        sequence = "ACGTTGCA" * 20000
+        with FastaWriter(output_fasta, compression="bgzf", write_index=True,
+                         threads=2) as writer:
+            for i in range(5):
+                writer.write(("seq{}".format(i), sequence))
+        self.assertTrue(os.path.isfile(output_fasta + ".gzi"))
+        records = list(FastaParser(output_fasta))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(str(records[4].sequence), sequence)
+        with FastaIndex(output_fasta) as fasta_index:
+            self.assertEqual(str(fasta_index.sequence("seq3", 100, 110)),
+                             sequence[100:110])
+
+    def test_gzi_build_matches_written_index(self):
+        from tinyfasta import FastaWriter
+        from tinyfasta.bgzf import GziIndex
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta.gz")
+        with FastaWriter(output_fasta, compression="bgzf",
+                         write_index=True) as writer:
+            for i in range(5):
+                writer.write(("seq{}".format(i), "ACGTTGCA" * 20000))
+        written = GziIndex.read(output_fasta + ".gzi")
+        self.assertTrue(len(written.entries) > 1)
+        self.assertEqual(GziIndex.build(output_fasta).entries,
+                         written.entries)
+
+    def test_fasta_writer_gzip(self):
+        from tinyfasta import FastaParser, FastaWriter
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta.gz")
+        with FastaWriter(output_fasta, compression="gzip") as writer:
+            writer.write((">seq1", "ACGT"))
+        self.assertEqual([str(f) for f in FastaParser(output_fasta)],
+                         [">seq1\nACGT"])
+        self.assertRaises(ValueError, FastaWriter, output_fasta,
+                          compression="gzip", write_index=True)
+
+    def test_id_index(self):
+        from tinyfasta import FastaParser, IdIndex
+        input_fasta = os.path.join(TMP_DIR, "dummy.fasta")
+        shutil.copy(os.path.join(DATA_DIR, "dummy.fasta"), input_fasta)
+        fasta_records = list(FastaParser(input_fasta))
+        with IdIndex(input_fasta) as id_index:
+            self.assertTrue(os.path.isfile(input_fasta + ".idx"))
+            for fasta_record in fasta_records:
+                identifier = fasta_record.description.identifier()
+                self.assertTrue(identifier in id_index)
+                self.assertEqual(str(id_index[identifier]), str(fasta_record))
+            self.assertFalse("seq0|contains" in id_index)
+            self.assertFalse("zzz" in id_index)
+            fetched = id_index.fetch_many(["seq8|contains", "seq2|starts",
+                                           "seq8|contains"])
+            self.assertEqual([str(r) for r in fetched],
+                             [str(fasta_records[1]), str(fasta_records[7])])
+            with self.assertRaises(KeyError):
+                list(id_index.fetch_many(["seq1|contains", "missing"]))
+
+    def test_id_index_tokenizer(self):
+        from tinyfasta import IdIndex
+        from tinyfasta.ids import make_tokenizer
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        index_path = os.path.join(TMP_DIR, "dummy.fasta.idx")
+        with IdIndex(input_fasta, index_path=index_path,
+                     tokenizer=make_tokenizer("|", 0)) as id_index:
+            self.assertEqual(str(id_index["seq7"].description),
+                             ">seq7|contains ACCCA motif")
+
+    def test_kmer_index(self):
+        from tinyfasta import FastaParser, KmerIndex
+        input_fasta = os.path.join(TMP_DIR, "dummy.fasta")
+        shutil.copy(os.path.join(DATA_DIR, "dummy.fasta"), input_fasta)
+        fasta_records = list(FastaParser(input_fasta))
+        with KmerIndex(input_fasta, k=4) as kmer_index:
+            self.assertTrue(os.path.isfile(input_fasta + ".kmi"))
+            self.assertEqual(len(kmer_index), len(fasta_records))
+            for query in ["ACCCA", "ATTTA", "AAAAAAAA", "GG", "CCCAAT", "NNN"]:
+                expected = [str(r) for r in fasta_records
+                            if r.sequence.contains(query)]
+                found = [str(r) for r in kmer_index.search(query)]
+                self.assertEqual(found, expected)
+            self.assertEqual(kmer_index.candidates("ACCCA"), [6])
+            self.assertEqual(kmer_index.positions("ACCC"), [(6, 26)])
+        # The index is reused, unless it was built with a different k.
+        mtime = os.path.getmtime(input_fasta + ".kmi")
+        with KmerIndex(input_fasta, k=4) as kmer_index:
+            self.assertEqual(os.path.getmtime(input_fasta + ".kmi"), mtime)
+        with KmerIndex(input_fasta, k=5) as kmer_index:
+            self.assertEqual(kmer_index.k, 5)
+            self.assertEqual(kmer_index.candidates("ACCCA"), [6])
+
+    def test_kmer_counter(self):
+        import gzip
+        from tinyfasta import FastaParser, KmerCounter
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        gzip_fasta = os.path.join(TMP_DIR, "dummy.fasta.gz")
+        with open(input_fasta, "rb") as fh_in:
+            with gzip.open(gzip_fasta, "wb") as fh_out:
+                fh_out.write(fh_in.read())
+        expected = {}
+        for fasta_record in FastaParser(input_fasta):
+            sequence = str(fasta_record.sequence).upper()
+            for i in range(len(sequence) - 3):
+                kmer = sequence[i:i+4]
+                if set(kmer) <= set("ACGT"):
+                    expected[kmer] = expected.get(kmer, 0) + 1
+        kmer_counter = KmerCounter(k=4)
+        kmer_counter.add(FastaParser(input_fasta))
+        self.assertEqual(dict(kmer_counter.items()), expected)
+        from_file = KmerCounter(k=4)
+        from_file.add_file(gzip_fasta)
+        self.assertEqual(dict(from_file.items()), expected)
+        kmer_counter.merge(from_file)
+        self.assertEqual(kmer_counter.count("ACCC"), 2 * expected["ACCC"])
+        sketch = KmerCounter(k=4, sketch=True, width=64)
+        sketch.add_file(input_fasta)
+        for kmer, count in expected.items():
+            self.assertTrue(sketch.count(kmer) >= count)
+
+    def test_two_bit_file(self):
+        from tinyfasta import FastaParser, FastaRecord, TwoBitFile
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        output_2bit = os.path.join(TMP_DIR, "tmp.2bit")
+        records = list(FastaParser(input_fasta))
+        records.append(FastaRecord.create(">masked", "ACGTnnNNacgtAAAAcc"))
+        with TwoBitFile.create(output_2bit, records) as two_bit_file:
+            self.assertEqual(len(two_bit_file), 9)
+            self.assertEqual(list(two_bit_file)[0], "seq1|contains")
+            for fasta_record in records:
+                name = str(fasta_record.description)[1:].split()[0]
+                self.assertEqual(str(two_bit_file.sequence(name)),
+                                 str(fasta_record.sequence))
+            self.assertEqual(str(two_bit_file.sequence("masked", 3, 13)),
+                             "TnnNNacgtA")
+            self.assertEqual(str(two_bit_file.fetch("masked:9-12").sequence),
+                             "acgt")
+            self.assertEqual(str(two_bit_file["seq7|contains"].description),
+                             ">seq7|contains")
+        self.assertTrue(os.path.getsize(output_2bit) <
+                        os.path.getsize(input_fasta) / 2)
+
     def test_descritpion_contains(self):
         from tinyfasta import FastaParser
         input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
@@ -95,6 +265,563 @@ TTTTTTAAAAAAATTTTTTTTTTTTTTTTTTT""")
         self.assertTrue(str(hits[0].description).startswith(">seq7"))
         self.assertTrue(str(hits[1].description).startswith(">seq8"))
 
+    def test_pattern_set_sequence_contains(self):
+        from tinyfasta import FastaParser, PatternSet
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        pattern_set = PatternSet(["ACCCA", "ATTTA"])
+        hits = [f for f in FastaParser(input_fasta)
+                if f.sequence.contains(pattern_set)]
+        self.assertEqual(len(hits), 2)
+        self.assertTrue(str(hits[0].description).startswith(">seq7"))
+        self.assertTrue(str(hits[1].description).startswith(">seq8"))
+
+    def test_pattern_set_scan(self):
+        from tinyfasta import FastaParser, PatternSet
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        pattern_set = PatternSet(["seq3|", "seq5|", "crazy"])
+        hits = [(str(f.description), [m.pattern for m in matches])
+                for f, matches in pattern_set.scan(FastaParser(input_fasta),
+                                                   "description")]
+        self.assertEqual(hits, [
+            (">seq3|ends with ATTA motif in second line", ["seq3|"]),
+            (">seq5|contains ATTA motif split over two lines", ["seq5|"]),
+            (">seq6|crazy formatting", ["crazy"])])
+
+    def test_motif_sequence_contains(self):
+        from tinyfasta import FastaParser, Motif
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        motif = Motif("AYYYA")
+        hits = [f for f in FastaParser(input_fasta)
+                if f.sequence.contains(motif)]
+        self.assertEqual(len(hits), 2)
+        self.assertTrue(str(hits[0].description).startswith(">seq7"))
+        self.assertTrue(str(hits[1].description).startswith(">seq8"))
+
+        # The reverse complement of TGGGT is ACCCA.
+        hits = [(f, m) for f, m in Motif("TGGGT").scan(FastaParser(input_fasta))]
+        self.assertEqual(len(hits), 1)
+        self.assertEqual([(m.start(), m.strand) for m in hits[0][1]],
+                         [(26, "-")])
+
+    def test_fasta_stats(self):
+        from tinyfasta import FastaParser, FastaStats
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        fasta_stats = FastaStats(input_fasta, block_size=100, use_numpy=False)
+        rows = list(fasta_stats.records())
+        self.assertEqual([r.length for r in rows],
+                         [len(f) for f in FastaParser(input_fasta)])
+        self.assertEqual(rows[6].name, "seq7|contains")
+        self.assertEqual((rows[6].a, rows[6].c), (74, 3))
+        summary = fasta_stats.summary()
+        self.assertEqual(summary.num_records, 8)
+        self.assertEqual(summary.total_length, 1034)
+        self.assertEqual(summary.min_length, 77)
+        self.assertEqual(summary.max_length, 154)
+        self.assertEqual(summary.n50, 154)
+        self.assertEqual(summary.composition, {"A": 920, "C": 3, "T": 111})
+
+    def test_fasta_stats_numpy(self):
+        from tinyfasta.stats import _HAVE_NUMPY, FastaStats
+        if not _HAVE_NUMPY:
+            self.skipTest("NumPy is not installed")
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        self.assertEqual(FastaStats(input_fasta, use_numpy=True).summary(),
+                         FastaStats(input_fasta, use_numpy=False).summary())
+
+    def test_mmap_output_is_consistent_with_input(self):
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta")
+        with open(output_fasta, "w") as fh:
+            for fasta_record in FastaParser(input_fasta, use_mmap=True):
+                fh.write("{}\n".format(fasta_record))
+        input_data = open(input_fasta, "r").read()
+        output_data = open(output_fasta, "r").read()
+        self.assertEqual(input_data, output_data)
+
+    def test_mmap_handles_windows_line_endings(self):
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(TMP_DIR, "crlf.fasta")
+        with open(input_fasta, "wb") as fh:
+            fh.write(b">seq1\r\nACGT\r\nAC\r\n>seq2\r\nTT")
+        records = list(FastaParser(input_fasta, use_mmap=True))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(str(records[0]), ">seq1\nACGT\nAC")
+        self.assertEqual(str(records[1]), ">seq2\nTT")
+
+    def test_parse_whitespace_padded_lines(self):
+        import io
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(TMP_DIR, "padded.fasta")
+        data = b">seq1\nACGT \nACGT \nAC \n>seq2\n  TTTT\n>seq3\nGG\t\nGG\t\n"
+        with open(input_fasta, "wb") as fh:
+            fh.write(data)
+        expected = ["ACGTACGTAC", "TTTT", "GGGG"]
+        for fasta_parser in (FastaParser(input_fasta),
+                             FastaParser(input_fasta, use_mmap=True),
+                             FastaParser(input_fasta, lazy=True),
+                             FastaParser(io.BytesIO(data))):
+            self.assertEqual([str(f.sequence) for f in fasta_parser],
+                             expected)
+        self.assertEqual([s for _, s in FastaParser(input_fasta, raw=True)],
+                         expected)
+
+    def test_parse_empty_records_and_files(self):
+        import io
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(TMP_DIR, "empty_record.fasta")
+        empty_fasta = os.path.join(TMP_DIR, "empty.fasta")
+        data = b">seq1\n>seq2\nAC\n>seq3\n"
+        with open(input_fasta, "wb") as fh:
+            fh.write(data)
+        open(empty_fasta, "wb").close()
+        expected = [(">seq1", ""), (">seq2", "AC"), (">seq3", "")]
+        for kwargs in ({}, {"use_mmap": True}, {"lazy": True}):
+            records = [(str(f.description), str(f.sequence))
+                       for f in FastaParser(input_fasta, **kwargs)]
+            self.assertEqual(records, expected)
+            self.assertEqual(list(FastaParser(empty_fasta, **kwargs)), [])
+        records = [(str(f.description), str(f.sequence))
+                   for f in FastaParser(io.BytesIO(data))]
+        self.assertEqual(records, expected)
+        self.assertEqual(list(FastaParser(io.BytesIO(b""))), [])
+        self.assertEqual(list(FastaParser(input_fasta, raw=True)),
+                         [(d[1:], s) for d, s in expected])
+        self.assertEqual(list(FastaParser(empty_fasta, raw=True)), [])
+
+    def test_lazy_output_is_consistent_with_input(self):
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        output_fasta = os.path.join(TMP_DIR, "tmp.fasta")
+        with open(output_fasta, "w") as fh:
+            for fasta_record in FastaParser(input_fasta, lazy=True):
+                fh.write("{}\n".format(fasta_record))
+        input_data = open(input_fasta, "r").read()
+        output_data = open(output_fasta, "r").read()
+        self.assertEqual(input_data, output_data)
+
+    def test_lazy_sequence_is_read_on_access(self):
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        hits = [f for f in FastaParser(input_fasta, lazy=True)
+                if f.description.contains('seq3')]
+        self.assertEqual(len(hits), 1)
+        self.assertTrue(hits[0]._sequence is None)
+        self.assertTrue(hits[0].sequence.contains("ATTA"))
+        self.assertEqual(len(hits[0]), 154)
+        self.assertFalse(hits[0]._sequence is None)
+
+    def test_parallel_map(self):
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        fasta_parser = FastaParser(input_fasta)
+        lengths = list(fasta_parser.parallel_map(len, processes=2,
+                                                 chunk_size=100))
+        self.assertEqual(lengths, [len(f) for f in fasta_parser])
+
+    def test_parallel_filter(self):
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        fasta_parser = FastaParser(input_fasta)
+        hits = list(fasta_parser.parallel_filter(contains_atta, processes=2,
+                                                 chunk_size=100))
+        self.assertEqual([str(f) for f in hits],
+            [str(f) for f in fasta_parser if contains_atta(f)])
+        self.assertEqual(len(hits), 4)
+
+    def test_parse_gzip_file(self):
+        import gzip
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        gzip_fasta = os.path.join(TMP_DIR, "dummy.fasta.gz")
+        with open(input_fasta, "rb") as fh_in:
+            with gzip.open(gzip_fasta, "wb") as fh_out:
+                fh_out.write(fh_in.read())
+        for use_mmap in (False, True):
+            self.assertEqual(
+                [str(f) for f in FastaParser(gzip_fasta, use_mmap=use_mmap)],
+                [str(f) for f in FastaParser(input_fasta)])
+
+    def test_async_parser_over_socket(self):
+        import asyncio
+        import gzip
+        from tinyfasta import AsyncFastaParser, FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        with open(input_fasta, "rb") as fh:
+            data = fh.read()
+        expected = [str(f) for f in FastaParser(input_fasta)]
+
+        async def upload(payload):
+            async def handle(reader, writer):
+                writer.write(payload)
+                await writer.drain()
+                writer.close()
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            fasta_records = [str(r) async for r in
+                             AsyncFastaParser(reader, block_size=100)]
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return fasta_records
+
+        self.assertEqual(asyncio.run(upload(data)), expected)
+        self.assertEqual(asyncio.run(upload(gzip.compress(data))), expected)
+
+    def test_summary_cache(self):
+        from tinyfasta import FastaIndex, FastaParser, FastaStats, SummaryCache
+        input_fasta = os.path.join(TMP_DIR, "cached.fasta")
+        with open(input_fasta, "w") as fh:
+            fh.write(">chr1 first\nACGTA\nCCGTA\nGG\n>chr2\nTTTT\n")
+        cache = SummaryCache()
+        expected = [str(f) for f in FastaParser(input_fasta)]
+        for _ in range(2):
+            self.assertEqual([str(f) for f in FastaParser(input_fasta,
+                              lazy=True, cache=cache)], expected)
+            with FastaIndex(input_fasta, cache=cache) as fasta_index:
+                self.assertEqual(str(fasta_index.sequence("chr2")), "TTTT")
+            fasta_stats = FastaStats(input_fasta, cache=cache)
+            self.assertEqual(fasta_stats.summary().composition,
+                             {"A": 3, "C": 3, "G": 4, "T": 6})
+        self.assertEqual((cache.hits, cache.misses), (3, 3))
+        self.assertTrue(os.path.isfile(input_fasta + ".summary"))
+        self.assertFalse(os.path.isfile(input_fasta + ".fai"))
+
+        # Changing the file invalidates the cached summaries.
+        with open(input_fasta, "a") as fh:
+            fh.write(">chr3\nCC\n")
+        self.assertEqual(cache.get(input_fasta, "spans"), None)
+        self.assertEqual(len(list(FastaParser(input_fasta, use_mmap=True,
+                                              cache=cache))), 3)
+        self.assertEqual(len(cache.get(input_fasta, "spans")), 3)
+
+        # Changes leaving the size and modification time untouched are only
+        # detected by hashing the content.
+        cache = SummaryCache(content_hash=True)
+        cache.put(input_fasta, "names", ["chr1", "chr2", "chr3"])
+        stat = os.stat(input_fasta)
+        with open(input_fasta, "r+") as fh:
+            fh.write(">chrX")
+        os.utime(input_fasta, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(SummaryCache().get(input_fasta, "names"),
+                         ["chr1", "chr2", "chr3"])
+        self.assertEqual(cache.get(input_fasta, "names"), None)
+
+        # A summary stored with the identity taken before the file changed
+        # is not returned for the changed file.
+        identity = cache.identity(input_fasta)
+        with open(input_fasta, "a") as fh:
+            fh.write(">chr4\nGG\n")
+        cache.put(input_fasta, "names", ["chrX", "chr2", "chr3"], identity)
+        self.assertEqual(cache.get(input_fasta, "names", identity),
+                         ["chrX", "chr2", "chr3"])
+        self.assertEqual(cache.get(input_fasta, "names"), None)
+
+    def test_summary_cache_eviction(self):
+        from tinyfasta import SummaryCache
+        cache_dir = os.path.join(TMP_DIR, "cache")
+        cache = SummaryCache(cache_dir, max_size=1500)
+        paths = []
+        for i in range(3):
+            path = os.path.join(TMP_DIR, "{}.fasta".format(i))
+            with open(path, "w") as fh:
+                fh.write(">seq\nACGT\n")
+            cache.put(path, "data", "x" * 400)
+            os.utime(cache.entry_path(path), (i, i))
+            paths.append(path)
+        self.assertFalse(os.path.isfile(cache.entry_path(paths[0])))
+        self.assertEqual(cache.get(paths[1], "data"), "x" * 400)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+        cache.clear()
+        self.assertEqual(os.listdir(cache_dir), [])
+
+    def test_validate_and_normalise(self):
+        import gzip
+        from tinyfasta import AlphabetValidator, FastaParser
+        input_fasta = os.path.join(TMP_DIR, "windows.fasta.gz")
+        output_fasta = os.path.join(TMP_DIR, "clean.fasta")
+        with gzip.open(input_fasta, "wb") as fh:
+            for i in range(2000):
+                fh.write(">seq{} sample\r\nACGTacgt\r\nNNAC\r\n".format(i)
+                         .encode("ascii"))
+            fh.write(b">bad\r\nACGU\r\n")
+        validator = AlphabetValidator(block_size=4096)
+        self.assertEqual(validator.first_error(input_fasta).character, "\r")
+        error = AlphabetValidator(allow_cr=True).first_error(input_fasta)
+        self.assertEqual(error.record_number, 2000)
+        self.assertEqual(error.name, "bad")
+        self.assertEqual(error.position, 3)
+        with gzip.open(input_fasta, "rb") as fh:
+            self.assertEqual(fh.read()[error.offset:error.offset + 1], b"U")
+        masked = validator.normalise(input_fasta, output_fasta,
+                                     uppercase=True, mask=True, strip_cr=True)
+        self.assertEqual(masked, 1)
+        validator.validate(output_fasta)
+        fasta_records = list(FastaParser(output_fasta))
+        self.assertEqual(len(fasta_records), 2001)
+        self.assertEqual(str(fasta_records[0]),
+                         ">seq0 sample\nACGTACGT\nNNAC")
+        self.assertEqual(str(fasta_records[-1].sequence), "ACGN")
+
+    def test_parse_raw_tuples(self):
+        import gzip
+        import io
+        from tinyfasta import FastaParser
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        with open(input_fasta, "rb") as fh:
+            data = fh.read()
+        expected = [(str(f.description)[1:], str(f.sequence))
+                    for f in FastaParser(input_fasta)]
+        self.assertEqual(list(FastaParser(input_fasta, raw=True)), expected)
+        self.assertEqual(
+            list(FastaParser(io.BytesIO(gzip.compress(data)), raw=True)),
+            expected)
+        self.assertRaises(ValueError, FastaParser, input_fasta, lazy=True,
+                          raw=True)
+
+    def test_parse_file_objects(self):
+        import gzip
+        import io
+        import subprocess
+        import sys
+        from tinyfasta import FastaParser, ParserMetrics
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        with open(input_fasta, "rb") as fh:
+            data = fh.read()
+        expected = [str(f) for f in FastaParser(input_fasta)]
+        self.assertEqual([str(f) for f in FastaParser(io.BytesIO(data))],
+                         expected)
+        self.assertEqual(
+            [str(f) for f in FastaParser(io.TextIOWrapper(io.BytesIO(data)))],
+            expected)
+        self.assertEqual(
+            [str(f) for f in FastaParser(io.BytesIO(gzip.compress(data)))],
+            expected)
+        with self.assertRaises(ValueError):
+            list(FastaParser(io.BytesIO(data), lazy=True))
+        with self.assertRaises(ValueError):
+            list(FastaParser(io.BytesIO(data)).parallel_filter(contains_atta))
+
+        # Non-seekable pipe, as when reading from standard input.
+        process = subprocess.Popen(
+            [sys.executable, "-c",
+             "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        process.stdin.write(gzip.compress(data))
+        process.stdin.close()
+        metrics = ParserMetrics()
+        self.assertEqual(
+            [str(f) for f in FastaParser(process.stdout, metrics=metrics)],
+            expected)
+        process.stdout.close()
+        process.wait()
+        self.assertEqual(metrics.bytes_parsed, len(data))
+        self.assertEqual(metrics.lines, 24)
+        self.assertEqual(metrics.records, 8)
+        self.assertEqual(metrics.percent, None)
+
+    def test_deduplicator_spills_to_disk(self):
+        import random
+        from tinyfasta import Deduplicator, FastaParser
+        rng = random.Random(0)
+        sequences = ["".join(rng.choice("ACGT") for _ in range(20))
+                     for _ in range(300)]
+        input_fasta = os.path.join(TMP_DIR, "duplicates.fasta")
+        with open(input_fasta, "w") as fh:
+            for i in range(2000):
+                sequence = rng.choice(sequences)
+                fh.write(">r{}\n{}\n".format(i, sequence))
+        fasta_records = list(FastaParser(input_fasta))
+        first = {}
+        for fasta_record in fasta_records:
+            first.setdefault(str(fasta_record.sequence),
+                             str(fasta_record.description))
+        for merge_headers in (False, True):
+            deduplicator = Deduplicator(merge_headers=merge_headers,
+                                        memory_budget=10000, partitions=4,
+                                        tmp_dir=TMP_DIR, separator=" ")
+            unique = list(deduplicator.unique(FastaParser(input_fasta)))
+            self.assertTrue(deduplicator.spilled)
+            self.assertEqual(deduplicator.num_records, 2000)
+            self.assertEqual(deduplicator.num_unique, len(first))
+            self.assertEqual(sorted(str(r.sequence) for r in unique),
+                             sorted(first))
+            self.assertEqual(os.listdir(TMP_DIR), ["duplicates.fasta"])
+        for fasta_record in unique:
+            names = str(fasta_record.description)[1:].split()
+            self.assertEqual(">" + names[0],
+                             first[str(fasta_record.sequence)])
+            self.assertEqual(
+                sorted(names),
+                sorted(str(r.description)[1:] for r in fasta_records
+                       if str(r.sequence) == str(fasta_record.sequence)))
+
+    def test_external_sort(self):
+        import random
+        from tinyfasta import FastaParser, RecordSorter
+        rng = random.Random(0)
+        input_fasta = os.path.join(TMP_DIR, "unsorted.fasta")
+        with open(input_fasta, "w") as fh:
+            for i in range(500):
+                fh.write(">r{}\n{}\n".format(i, "A" * rng.randint(1, 50)))
+        fasta_records = list(FastaParser(input_fasta))
+        for key, reverse in [("length", False), ("length", True),
+                             ("description", False)]:
+            sorter = RecordSorter(key=key, reverse=reverse,
+                                  memory_budget=5000, tmp_dir=TMP_DIR,
+                                  fan_in=3)
+            output = [str(r) for r in sorter.sort(FastaParser(input_fasta))]
+            self.assertTrue(sorter.num_runs > 3)
+            self.assertEqual(output, [str(r) for r in sorted(fasta_records,
+                key=sorter.key, reverse=reverse)])
+            self.assertEqual(os.listdir(TMP_DIR), ["unsorted.fasta"])
+
+    def test_split_fasta(self):
+        import random
+        from tinyfasta import FastaIndex, FastaParser
+        from tinyfasta.split import split_fasta
+        rng = random.Random(0)
+        input_fasta = os.path.join(TMP_DIR, "large.fasta")
+        with open(input_fasta, "w") as fh:
+            for i in range(50):
+                sequence = "ACGT" * rng.randint(1, 100)
+                fh.write(">r{} x\n".format(i))
+                for j in range(0, len(sequence), 60):
+                    fh.write(sequence[j:j+60] + "\n")
+        shards = split_fasta(input_fasta, 4, write_index=True)
+        self.assertEqual([os.path.basename(s.path) for s in shards],
+            ["large.1.fasta", "large.2.fasta", "large.3.fasta",
+             "large.4.fasta"])
+        data = b"".join(open(s.path, "rb").read() for s in shards)
+        self.assertEqual(data, open(input_fasta, "rb").read())
+        self.assertEqual(sum(s.num_records for s in shards), 50)
+        total = sum(len(r) for r in FastaParser(input_fasta))
+        for shard in shards:
+            self.assertTrue(abs(shard.residues - total / 4.0) < 400)
+            self.assertEqual(shard.residues,
+                             sum(len(r) for r in FastaParser(shard.path)))
+            with FastaIndex(shard.path) as fasta_index:
+                for fasta_record in FastaParser(shard.path):
+                    name = fasta_record.description.identifier()
+                    self.assertEqual(str(fasta_index.sequence(name)),
+                                     str(fasta_record.sequence))
+        prefix = os.path.join(TMP_DIR, "part")
+        shards = split_fasta(input_fasta, 5, by="records", prefix=prefix)
+        self.assertEqual([s.num_records for s in shards], [10] * 5)
+        self.assertEqual(shards[0].path, prefix + ".1.fasta")
+        self.assertFalse(os.path.isfile(prefix + ".1.fasta.fai"))
+
+    def test_parser_metrics(self):
+        import gzip
+        from tinyfasta import FastaParser, ParserMetrics
+        from tinyfasta.bgzf import BgzfWriter
+        input_fasta = os.path.join(DATA_DIR, "dummy.fasta")
+        gzip_fasta = os.path.join(TMP_DIR, "dummy.fasta.gz")
+        bgzf_fasta = os.path.join(TMP_DIR, "dummy.bgzf.fasta.gz")
+        with open(input_fasta, "rb") as fh_in:
+            data = fh_in.read()
+        with gzip.open(gzip_fasta, "wb") as fh_out:
+            fh_out.write(data)
+        with BgzfWriter(bgzf_fasta) as fh_out:
+            fh_out.write(data)
+        for fpath, kwargs in [(input_fasta, {}),
+                              (input_fasta, {"use_mmap": True}),
+                              (input_fasta, {"lazy": True}),
+                              (gzip_fasta, {}),
+                              (gzip_fasta, {"use_mmap": True}),
+                              (bgzf_fasta, {}),
+                              (bgzf_fasta, {"use_mmap": True})]:
+            reports = []
+            metrics = ParserMetrics(progress=reports.append, interval=0)
+            fasta_parser = FastaParser(fpath, metrics=metrics, **kwargs)
+            self.assertEqual(len(list(fasta_parser)), 8)
+            counters = metrics.as_dict()
+            self.assertEqual(counters["records"], 8)
+            self.assertEqual(counters["lines"], 24)
+            self.assertEqual(counters["bytes_parsed"],
+                             os.path.getsize(input_fasta))
+            self.assertEqual(counters["bytes_read"], os.path.getsize(fpath))
+            self.assertEqual(counters["percent"], 100.0)
+            self.assertEqual(len(reports), 9)
+            # Iterating again resets the counters.
+            list(fasta_parser)
+            self.assertEqual(metrics.records, 8)
+
+    def test_parse_bgzf_file(self):
+        from tinyfasta import FastaParser
+        from tinyfasta.bgzf import BgzfWriter, is_bgzf
+        input_fasta = os.path.join(TMP_DIR, "large.fasta")
+        bgzf_fasta = os.path.join(TMP_DIR, "large.fasta.gz")
+        with open(input_fasta, "w") as fh_plain:
+            with BgzfWriter(bgzf_fasta) as fh_bgzf:
+                for i in range(20):
+                    line = ">seq{}\n{}\n".format(i, "ACGTTGCA" * 1000)
+                    fh_plain.write(line)
+                    fh_bgzf.write(line.encode("utf-8"))
+        self.assertTrue(is_bgzf(bgzf_fasta))
+        self.assertEqual([str(f) for f in FastaParser(bgzf_fasta)],
+                         [str(f) for f in FastaParser(input_fasta)])
+
+    def test_fasta_index_bgzf(self):
+        from tinyfasta import FastaIndex
+        from tinyfasta.bgzf import BgzfWriter
+        bgzf_fasta = os.path.join(TMP_DIR, "indexed.fasta.gz")
+        sequence = "".join("ACGT"[i % 7 % 4] for i in range(200000))
+        with BgzfWriter(bgzf_fasta) as fh:
+            fh.write(b">chr1\n")
+            for i in range(0, len(sequence), 60):
+                fh.write(sequence[i:i+60].encode("utf-8") + b"\n")
+            fh.write(b">chr2\nACGT\n")
+        with FastaIndex(bgzf_fasta) as fasta_index:
+            self.assertTrue(os.path.isfile(bgzf_fasta + ".gzi"))
+            self.assertEqual(fasta_index.entry("chr1").length, len(sequence))
+            self.assertEqual(str(fasta_index.sequence("chr1", 65000, 140000)),
+                             sequence[65000:140000])
+            self.assertEqual(str(fasta_index.fetch("chr2").sequence), "ACGT")
+
+        # Reload the existing .fai and .gzi files from disk.
+        with FastaIndex(bgzf_fasta) as fasta_index:
+            self.assertEqual(str(fasta_index.fetch("chr1:130001-130010")
+                                 .sequence), sequence[130000:130010])
+
+    def test_fasta_index_plain_gzip(self):
+        import gzip
+        from tinyfasta import FastaIndex
+        gzip_fasta = os.path.join(TMP_DIR, "indexed.fasta.gz")
+        with gzip.open(gzip_fasta, "wb") as fh:
+            fh.write(b">chr1\nACGT\n")
+        self.assertRaises(ValueError, FastaIndex, gzip_fasta)
+
+    def test_fasta_index(self):
+        from tinyfasta import FastaIndex
+        input_fasta = os.path.join(TMP_DIR, "indexed.fasta")
+        with open(input_fasta, "w") as fh:
+            fh.write(">chr1 first\nACGTA\nCCGTA\nGG\n>chr2\nTTTT\n")
+        fasta_index = FastaIndex(input_fasta)
+        self.assertTrue(os.path.isfile(input_fasta + ".fai"))
+        self.assertEqual(open(input_fasta + ".fai").read(),
+            "chr1\t12\t12\t5\t6\nchr2\t4\t33\t4\t5\n")
+        self.assertEqual(list(fasta_index), ["chr1", "chr2"])
+        self.assertEqual(str(fasta_index.fetch("chr1")),
+            ">chr1\nACGTA\nCCGTA\nGG")
+        self.assertEqual(str(fasta_index.fetch("chr1:4-8").sequence), "TACCG")
+        self.assertEqual(str(fasta_index.sequence("chr2", 1, 3)), "TT")
+        self.assertTrue(fasta_index["chr1"].sequence.contains("TACC"))
+        fasta_index.close()
+
+        # Reload the existing index from disk.
+        fasta_index = FastaIndex(input_fasta)
+        self.assertEqual(len(fasta_index), 2)
+        self.assertEqual(fasta_index.entry("chr2").offset, 33)
+        fasta_index.close()
+
+    def test_fasta_index_irregular_lines(self):
+        from tinyfasta import FastaIndex
+        input_fasta = os.path.join(TMP_DIR, "irregular.fasta")
+        shutil.copy(os.path.join(DATA_DIR, "dummy.fasta"), input_fasta)
+        self.assertRaises(ValueError, FastaIndex, input_fasta)
+
         
 if __name__ == "__main__":
     unittest.main()
@@ -22,6 +22,16 @@ class FastaParserUnitTests(unittest.TestCase):
         fasta_parser = FastaParser('test.fasta')
         self.assertEqual(fasta_parser.fpath, 'test.fasta')
 
+    def test_use_mmap_defaults_to_false(self):
+        from tinyfasta import FastaParser
+        self.assertFalse(FastaParser('test.fasta').use_mmap)
+        self.assertTrue(FastaParser('test.fasta', use_mmap=True).use_mmap)
+
+    def test_lazy_defaults_to_false(self):
+        from tinyfasta import FastaParser
+        self.assertFalse(FastaParser('test.fasta').lazy)
+        self.assertTrue(FastaParser('test.fasta', lazy=True).lazy)
+
     def test_FastaParser_is_iterable(self):
         from tinyfasta import FastaParser
         fasta_parser = FastaParser('test.fasta')
@@ -57,6 +67,14 @@ class FastaRecordComponentUnitTests(unittest.TestCase):
         self.assertTrue(component.contains(regex_match))
         self.assertFalse(component.contains(regex_no_match))
 
+    def test_find_all_function(self):
+        from tinyfasta import _FastaRecordComponent
+        component = _FastaRecordComponent()
+        component._content = "ATTAGATTA"
+        self.assertEqual([m.start() for m in component.find_all("ATTA")],
+                         [0, 5])
+        self.assertEqual(component.find_all("CCC"), [])
+
 class DescriptionUnitTests(unittest.TestCase):
 
     def test_Description_initialisation(self):
@@ -118,6 +136,60 @@ class SequenceUnitTests(unittest.TestCase):
         sequence.add_sequence_line("TAAT")
         self.assertEqual(str(sequence), "attaTAAT")
 
+    def test_add_sequence_block(self):
+        from tinyfasta import Sequence
+        sequence = Sequence()
+        sequence._add_sequence_block(b"atta\r\nTAAT\r\nAT\n")
+        self.assertEqual(sequence._sequences, ["atta", "TAAT", "AT"])
+        self.assertEqual(len(sequence), 10)
+
+    def test_add_single_line_sequence_block(self):
+        from tinyfasta import Sequence
+        for block in (b"attaTAAT\r\n", b"attaTAAT\n", b"attaTAAT"):
+            sequence = Sequence()
+            sequence._add_sequence_block(block)
+            self.assertEqual(sequence._sequences, ["attaTAAT"])
+            self.assertEqual(len(sequence), 8)
+        sequence = Sequence()
+        sequence._add_sequence_block(b"atta\rTAAT\n")
+        self.assertEqual(str(sequence), "atta\rTAAT")
+
+    def test_add_sequence_lines(self):
+        from tinyfasta import Sequence
+        sequence = Sequence()
+        sequence._add_sequence_lines(["atta\n", "TAAT\n", "AT\n"])
+        self.assertEqual(sequence._line_lengths, None)
+        self.assertEqual(sequence._sequences, ["atta", "TAAT", "AT"])
+        for lines in (["at\n", "TAAT\n"], ["AAA", "", "CC"]):
+            sequence = Sequence()
+            sequence._add_sequence_lines(lines)
+            self.assertEqual(sequence._sequences,
+                             [line.strip() for line in lines])
+
+    def test_add_irregular_sequence_block(self):
+        from tinyfasta import Sequence
+        sequence = Sequence()
+        sequence._add_sequence_block(b"at\nTAAT\n")
+        self.assertEqual(sequence._sequences, ["at", "TAAT"])
+        self.assertEqual(str(sequence), "atTAAT")
+
+    def test_irregular_lines_are_preserved(self):
+        from tinyfasta import Sequence
+        sequence = Sequence()
+        for line in ["AAA", "TTTTT", "", "CC"]:
+            sequence.add_sequence_line(line)
+        self.assertEqual(sequence._sequences, ["AAA", "TTTTT", "", "CC"])
+        self.assertEqual(len(sequence), 10)
+        sequence.format_line_length(4)
+        self.assertEqual(sequence._sequences, ["AAAT", "TTTT", "CC"])
+
+    def test_content_is_cached(self):
+        from tinyfasta import Sequence
+        sequence = Sequence()
+        sequence.add_sequence_line("atta")
+        sequence.add_sequence_line("TAAT")
+        self.assertTrue(sequence._content is sequence._content)
+
     def test_has_format_line_length(self):
         from tinyfasta import Sequence
         sequence = Sequence()
@@ -147,6 +219,13 @@ class SequenceUnitTests(unittest.TestCase):
 
 class FastaRecordUnitTests(unittest.TestCase):
 
+    def test_FastaRecord_has_no_instance_dict(self):
+        from tinyfasta import FastaRecord
+        fasta_record = FastaRecord.create(">seq1", "ACGT")
+        for obj in (fasta_record, fasta_record.description,
+                    fasta_record.sequence):
+            self.assertFalse(hasattr(obj, "__dict__"))
+
     def test_FastaRecord_initialisation(self):
         from tinyfasta import FastaRecord
         fasta_record = FastaRecord(">seq101|testing\n")
@@ -205,5 +284,567 @@ ATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG""")
         fasta_record = FastaRecord(">seq101|testing\n")
         self.assertEqual(len(fasta_record), 0)
 
+    def test_string_representation_when_empty(self):
+        from tinyfasta import FastaRecord
+        fasta_record = FastaRecord(">seq101|testing\n")
+        self.assertEqual(str(fasta_record), ">seq101|testing")
+
+    def test_string_representation_follows_changes(self):
+        from tinyfasta import FastaRecord
+        fasta_record = FastaRecord(">seq101|testing\n")
+        fasta_record.add_sequence_line("ACGT")
+        self.assertEqual(str(fasta_record), ">seq101|testing\nACGT")
+        fasta_record.add_sequence_line("AC")
+        self.assertEqual(str(fasta_record), ">seq101|testing\nACGT\nAC")
+        fasta_record.sequence.format_line_length(3)
+        self.assertEqual(str(fasta_record), ">seq101|testing\nACG\nTAC")
+
+class BlocksUnitTests(unittest.TestCase):
+
+    def test_record_spans(self):
+        from tinyfasta._blocks import record_spans
+        data = b">a\nAC\nGT\n>b\nTT\n"
+        self.assertEqual(list(record_spans(data)), [(0, 3, 9), (9, 12, 15)])
+
+    def test_chunk_spans(self):
+        from tinyfasta._blocks import chunk_spans
+        data = b">a\nAC\n>b\nGT\n>c\nTT\n"
+        self.assertEqual(list(chunk_spans(data, 1)),
+            [(0, 6), (6, 12), (12, 18)])
+        self.assertEqual(list(chunk_spans(data, 8)), [(0, 12), (12, 18)])
+        self.assertEqual(list(chunk_spans(data, 100)), [(0, 18)])
+
+    def test_line_layout(self):
+        from tinyfasta._blocks import line_layout
+        self.assertEqual(line_layout(b"ACGT\nACGT\nAC\n"), (10, 4, 5))
+        self.assertEqual(line_layout(b"ACGT\r\nAC\r\n"), (6, 4, 6))
+        self.assertEqual(line_layout(b"ACG\n"), (3, 3, 4))
+        self.assertEqual(line_layout(b""), (0, 0, 0))
+
+    def test_line_layout_irregular(self):
+        from tinyfasta._blocks import line_layout
+        self.assertEqual(line_layout(b"ACG\nACGT\n"), None)
+        self.assertEqual(line_layout(b"ACGT\nAC\nAC\n"), None)
+
+    def test_line_layout_of_part_of_buffer(self):
+        import mmap
+        import tempfile
+        from tinyfasta._blocks import count_bytes, line_layout
+        data = b">a\nACGT\nACGT\nAC\n>b\nACG\nACGT\n"
+        self.assertEqual(line_layout(data, 3, 16), (10, 4, 5))
+        self.assertEqual(line_layout(data, 19), None)
+        with tempfile.TemporaryFile() as fh:
+            fh.write(data)
+            fh.flush()
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self.assertEqual(line_layout(mapped, 3, 16), (10, 4, 5))
+            self.assertEqual(count_bytes(mapped, b"\n", 3, 16), 3)
+            mapped.close()
+
+    def test_read_blocks(self):
+        import io
+        from tinyfasta._blocks import read_blocks
+        data = b">a\nACGT\n"
+        self.assertEqual(list(read_blocks(io.BytesIO(data), 4)),
+                         [b">a\nA", b"CGT\n"])
+        class Reader(object):
+            def __init__(self):
+                self.fh = io.BytesIO(data)
+            def read(self, size):
+                return self.fh.read(size)
+        self.assertEqual(list(read_blocks(Reader(), 5)), [b">a\nAC", b"GT\n"])
+
+    def test_split_records(self):
+        from tinyfasta._blocks import split_records
+        raw_records = list(split_records([b">a\nA", b"C\n>", b"b\nG"]))
+        self.assertEqual([r[2] for r in raw_records], [b">a", b">b"])
+        self.assertEqual([r[3] for r in raw_records], [b"AC\n", b"G"])
+
+    def test_record_splitter_carries_partial_records(self):
+        from tinyfasta._blocks import RecordSplitter
+        splitter = RecordSplitter()
+        self.assertEqual(splitter.feed(b">a\nAC"), [])
+        self.assertEqual(splitter.feed(b"GT\n"), [])
+        self.assertEqual(splitter.feed(b">b\nTT\n"),
+            [(0, 3, b">a", b"ACGT\n")])
+        self.assertEqual(splitter.close(), [(8, 11, b">b", b"TT\n")])
+
+    def test_split_tuples(self):
+        from tinyfasta._blocks import split_tuples
+        blocks = [b"junk\n>a x\r\nAC\r", b"\nG\r\n>", b"b\n>c\nTT"]
+        self.assertEqual(list(split_tuples(blocks)),
+                         [("a x", "ACG"), ("b", ""), ("c", "TT")])
+
+class PatternSetUnitTests(unittest.TestCase):
+
+    def test_finditer(self):
+        from tinyfasta import PatternSet
+        pattern_set = PatternSet(["he", "she", "his", "hers"])
+        hits = [(m.pattern, m.span()) for m in pattern_set.finditer("ushers")]
+        self.assertEqual(hits, [("she", (1, 4)), ("he", (2, 4)),
+                                ("hers", (2, 6))])
+
+    def test_search(self):
+        from tinyfasta import PatternSet
+        pattern_set = PatternSet(["ATTA", "CCCA"])
+        self.assertEqual(pattern_set.search("GGATTACCCA").group(), "ATTA")
+        self.assertEqual(pattern_set.search("GGGG"), None)
+
+    def test_hits(self):
+        from tinyfasta import PatternSet
+        pattern_set = PatternSet(["AA", "AAA", "T"])
+        self.assertEqual(dict(pattern_set.hits("AAAAT")),
+                         {"AA": [0, 1, 2], "AAA": [0, 1], "T": [4]})
+
+    def test_ignore_case(self):
+        from tinyfasta import PatternSet
+        pattern_set = PatternSet(["atta"], ignore_case=True)
+        match = pattern_set.search("GGATTA")
+        self.assertEqual(match.group(), "ATTA")
+        self.assertEqual(match.pattern, "atta")
+
+    def test_duplicate_and_empty_patterns_are_ignored(self):
+        from tinyfasta import PatternSet
+        self.assertEqual(len(PatternSet(["A", "A", ""])), 1)
+
+class ApproximatePatternSetUnitTests(unittest.TestCase):
+
+    def test_mismatches(self):
+        from tinyfasta import ApproximatePatternSet
+        pattern_set = ApproximatePatternSet(["ACGT", "TTT"], max_mismatches=1)
+        hits = [(m.pattern, m.span(), m.distance)
+                for m in pattern_set.finditer("ACCTTTT")]
+        self.assertEqual(hits, [("ACGT", (0, 4), 1), ("TTT", (2, 5), 1),
+                                ("TTT", (3, 6), 0), ("TTT", (4, 7), 0)])
+
+    def test_edits(self):
+        from tinyfasta import ApproximatePatternSet
+        pattern_set = ApproximatePatternSet(["ACGTACGT"], max_edits=1)
+        # One base of the pattern is deleted.
+        match = pattern_set.search("TTACGACGTTT")
+        self.assertEqual((match.group(), match.distance), ("ACGACGT", 1))
+        self.assertEqual(pattern_set.search("TTACGTTT"), None)
+
+    def test_ignore_case(self):
+        from tinyfasta import ApproximatePatternSet
+        pattern_set = ApproximatePatternSet(["acgt"], max_mismatches=0,
+                                            ignore_case=True)
+        self.assertEqual(pattern_set.search("GACGT").group(), "ACGT")
+
+    def test_requires_one_limit(self):
+        from tinyfasta import ApproximatePatternSet
+        self.assertRaises(ValueError, ApproximatePatternSet, ["A"])
+        self.assertRaises(ValueError, ApproximatePatternSet, ["A"],
+                          max_mismatches=1, max_edits=1)
+
+    def test_sequence_contains(self):
+        from tinyfasta import FastaRecord
+        sequence = FastaRecord.create(">seq", "GGATTAGG").sequence
+        self.assertFalse(sequence.contains("ATCA"))
+        self.assertTrue(sequence.contains("ATCA", max_mismatches=1))
+        self.assertEqual(
+            [m.span() for m in sequence.find_all("GATAG", max_edits=1)],
+            [(1, 7)])
+
+    def test_sequence_contains_regex_is_not_approximate(self):
+        import re
+        from tinyfasta import FastaRecord
+        sequence = FastaRecord.create(">seq", "GGATTAGG").sequence
+        self.assertRaises(ValueError, sequence.contains, re.compile("AT+A"),
+                          max_mismatches=1)
+        self.assertRaises(ValueError, sequence.find_all, re.compile("AT+A"),
+                          max_edits=1)
+
+class MotifUnitTests(unittest.TestCase):
+
+    def test_reverse_complement(self):
+        from tinyfasta.alphabet import reverse_complement
+        self.assertEqual(reverse_complement("AACGTN"), "NACGTT")
+        self.assertEqual(reverse_complement("acRY"), "RYgt")
+
+    def test_degenerate_motif(self):
+        from tinyfasta import Motif
+        motif = Motif("ARA", both_strands=False)
+        self.assertEqual([m.span() for m in motif.finditer("AAAGACAGA")],
+                         [(0, 3), (2, 5), (6, 9)])
+
+    def test_both_strands(self):
+        from tinyfasta import Motif
+        motif = Motif("AAC")
+        hits = [(m.start(), m.strand) for m in motif.finditer("AACTTGTTAAC")]
+        self.assertEqual(hits, [(0, "+"), (5, "-"), (8, "+")])
+
+    def test_palindromic_motif_hits_both_strands(self):
+        from tinyfasta import Motif
+        motif = Motif("GAATTC")
+        hits = [(m.start(), m.strand) for m in motif.finditer("AGAATTCA")]
+        self.assertEqual(hits, [(1, "+"), (1, "-")])
+
+    def test_ignore_case(self):
+        from tinyfasta import Motif
+        self.assertEqual(Motif("ANT").search("ccagt"), None)
+        self.assertEqual(Motif("ANT", ignore_case=True).search("ccagt").span(),
+                         (2, 5))
+
+    def test_invalid_code(self):
+        from tinyfasta import Motif
+        self.assertRaises(ValueError, Motif, "AXT")
+
+class AlphabetValidatorUnitTests(unittest.TestCase):
+
+    def data(self):
+        import io
+        return io.BytesIO(b">r1 a>b\nACGT\nacgn\n>r2\r\nAC\r\nGX-T\r\n")
+
+    def test_first_error(self):
+        from tinyfasta.validate import AlphabetValidator
+        error = AlphabetValidator().first_error(self.data())
+        self.assertEqual(error, (1, "r2", 25, 2, "\r"))
+        error = AlphabetValidator(allow_cr=True).first_error(self.data())
+        self.assertEqual(error, (1, "r2", 28, 3, "X"))
+        error = AlphabetValidator(allow_lowercase=False).first_error(
+            self.data())
+        self.assertEqual(error, (0, "r1", 13, 4, "a"))
+
+    def test_mid_line_header_character(self):
+        import io
+        from tinyfasta.validate import AlphabetValidator
+        error = AlphabetValidator().first_error(io.BytesIO(b">r1\nAC>GT\n"))
+        self.assertEqual(error, (0, "r1", 6, 2, ">"))
+
+    def test_validate(self):
+        import io
+        from tinyfasta.validate import AlphabetValidator
+        validator = AlphabetValidator("protein")
+        validator.validate(io.BytesIO(b">p\nMKVX*\n"))
+        self.assertRaises(ValueError, validator.validate,
+                          io.BytesIO(b">p\nMKV1\n"))
+
+    def test_normalise(self):
+        import io
+        from tinyfasta.validate import AlphabetValidator
+        validator = AlphabetValidator()
+        output = io.BytesIO()
+        masked = validator.normalise(self.data(), output, uppercase=True,
+                                     mask=True, strip_cr=True)
+        self.assertEqual(masked, 2)
+        self.assertEqual(output.getvalue(),
+                         b">r1 a>b\nACGT\nACGN\n>r2\nAC\nGNNT\n")
+        output = io.BytesIO()
+        validator.normalise(self.data(), output, mask=True)
+        self.assertEqual(output.getvalue(),
+                         b">r1 a>b\nACGT\nacgn\n>r2\r\nAC\r\nGNNT\r\n")
+
+class StatsUnitTests(unittest.TestCase):
+
+    def test_n50(self):
+        from tinyfasta.stats import n50
+        self.assertEqual(n50([2, 3, 4, 5, 6, 7, 8, 9, 10]), 8)
+        self.assertEqual(n50([10]), 10)
+        self.assertEqual(n50([]), 0)
+
+    def test_record_stats_gc_content(self):
+        from tinyfasta.stats import RecordStats
+        record_stats = RecordStats("seq1", 10, 1, 2, 2, 3, 2, 0)
+        self.assertEqual(record_stats.gc_content, 0.5)
+
+    def test_count_python(self):
+        import collections
+        from tinyfasta.stats import _count_python
+        composition = collections.Counter()
+        counts, length = _count_python(b"ACgtN\nnXX\r\n", composition)
+        self.assertEqual(counts, [1, 1, 1, 1, 2])
+        self.assertEqual(length, 8)
+        self.assertEqual(composition[ord("X")], 2)
+        self.assertEqual(composition[ord("g")], 1)
+
+class AsyncFastaParserUnitTests(unittest.TestCase):
+
+    def parse(self, source, block_size=4):
+        import asyncio
+        from tinyfasta import AsyncFastaParser
+        async def collect():
+            return [str(r) async for r in AsyncFastaParser(source, block_size)]
+        return asyncio.run(collect())
+
+    def test_async_iterable_source(self):
+        async def source():
+            for block in [b">", b"a\nAC\nG", b"T\n>b\n", b"TT"]:
+                yield block
+        self.assertEqual(self.parse(source()), [">a\nAC\nGT", ">b\nTT"])
+
+    def test_stream_reader_source(self):
+        import asyncio
+        async def collect():
+            from tinyfasta import AsyncFastaParser
+            reader = asyncio.StreamReader()
+            reader.feed_data(b">a desc\nACGT\nAC\n>b\nG\n")
+            reader.feed_eof()
+            return [str(r) async for r in AsyncFastaParser(reader, 3)]
+        self.assertEqual(asyncio.run(collect()),
+                         [">a desc\nACGT\nAC", ">b\nG"])
+
+    def test_decompress_blocks(self):
+        import gzip
+        from tinyfasta.bgzf import decompress_blocks
+        data = b">a\nACGT\n"
+        compressed = gzip.compress(data)
+        blocks = [compressed[:1], compressed[1:5], compressed[5:]]
+        self.assertEqual(b"".join(decompress_blocks(blocks)), data)
+        self.assertEqual(list(decompress_blocks([b">", b"a\n"])),
+                         [b">a\n"])
+        self.assertEqual(list(decompress_blocks([])), [])
+
+    def test_gzip_decoder_multiple_members(self):
+        import gzip
+        from tinyfasta.bgzf import _GzipDecoder
+        data = gzip.compress(b">a\nAC\n") + gzip.compress(b">b\nGT\n")
+        decoder = _GzipDecoder()
+        decoded = b"".join(decoder.decode(data[i:i+5])
+                           for i in range(0, len(data), 5))
+        self.assertEqual(decoded + decoder.flush(), b">a\nAC\n>b\nGT\n")
+
+class MetricsUnitTests(unittest.TestCase):
+
+    def test_counting_reader(self):
+        import io
+        from tinyfasta.metrics import _CountingReader
+        reader = _CountingReader(io.BytesIO(b">a\nAC\nGT\n"), count_lines=True)
+        self.assertEqual(io.BufferedReader(reader).read(), b">a\nAC\nGT\n")
+        self.assertEqual(reader.bytes, 9)
+        self.assertEqual(reader.lines, 3)
+
+    def test_as_dict_before_parsing(self):
+        from tinyfasta import ParserMetrics
+        metrics = ParserMetrics()
+        self.assertEqual(metrics.as_dict()["records"], 0)
+        self.assertEqual(metrics.percent, 100.0)
+
+class DedupeUnitTests(unittest.TestCase):
+
+    def records(self):
+        from tinyfasta import FastaRecord
+        return [FastaRecord.create(">a", "ACGT"),
+                FastaRecord.create(">b", "AACC"),
+                FastaRecord.create(">c", "ACGT"),
+                FastaRecord.create(">d", "GGTT"),
+                FastaRecord.create(">e", "AACC")]
+
+    def test_sequence_digest(self):
+        from tinyfasta.dedupe import DIGEST_SIZE, sequence_digest
+        self.assertEqual(len(sequence_digest("ACGT")), DIGEST_SIZE)
+        self.assertNotEqual(sequence_digest("AACC"), sequence_digest("GGTT"))
+        self.assertEqual(sequence_digest("AACC", canonical=True),
+                         sequence_digest("GGTT", canonical=True))
+
+    def test_unique(self):
+        from tinyfasta import Deduplicator
+        deduplicator = Deduplicator()
+        unique = deduplicator.unique(self.records())
+        self.assertEqual([str(r.description) for r in unique],
+                         [">a", ">b", ">d"])
+        self.assertEqual(deduplicator.num_records, 5)
+        self.assertEqual(deduplicator.num_unique, 3)
+        self.assertFalse(deduplicator.spilled)
+
+    def test_unique_canonical(self):
+        from tinyfasta import Deduplicator
+        unique = Deduplicator(canonical=True).unique(self.records())
+        self.assertEqual([str(r.description) for r in unique], [">a", ">b"])
+
+    def test_merge_headers(self):
+        from tinyfasta import Deduplicator
+        unique = Deduplicator(merge_headers=True,
+                              separator=";").unique(self.records())
+        self.assertEqual([str(r.description) for r in unique],
+                         [">a;c", ">b;e", ">d"])
+
+class RecordSorterUnitTests(unittest.TestCase):
+
+    def records(self):
+        from tinyfasta import FastaRecord
+        return [FastaRecord.create(">c x", "ACGTA"),
+                FastaRecord.create(">a z", "AC"),
+                FastaRecord.create(">b y", "GGTTACC"),
+                FastaRecord.create(">d w", "AC")]
+
+    def test_sort_in_memory(self):
+        from tinyfasta import RecordSorter
+        def names(key, reverse=False):
+            sorter = RecordSorter(key=key, reverse=reverse)
+            names = [str(r.description)[1] for r in sorter.sort(self.records())]
+            self.assertEqual(sorter.num_runs, 1)
+            return names
+        self.assertEqual(names("length"), ["a", "d", "c", "b"])
+        self.assertEqual(names("length", reverse=True), ["b", "c", "a", "d"])
+        self.assertEqual(names("identifier"), ["a", "b", "c", "d"])
+        self.assertEqual(names(lambda r: r.description.identifier(field=1)),
+                         ["d", "c", "b", "a"])
+
+    def test_unknown_key(self):
+        from tinyfasta import RecordSorter
+        with self.assertRaises(ValueError):
+            RecordSorter(key="colour")
+
+class SplitUnitTests(unittest.TestCase):
+
+    def test_shard_boundaries(self):
+        from tinyfasta.split import shard_boundaries
+        self.assertEqual(shard_boundaries([1, 1, 1, 1], 2), [0, 2, 4])
+        self.assertEqual(shard_boundaries([10, 1, 1, 1, 1, 10], 2),
+                         [0, 3, 6])
+        self.assertEqual(shard_boundaries([100, 1, 1], 3), [0, 1, 2, 3])
+        self.assertEqual(shard_boundaries([2, 100, 1], 2), [0, 1, 3])
+        self.assertEqual(shard_boundaries([5, 5], 4), [0, 1, 2])
+        self.assertEqual(shard_boundaries([], 4), [0])
+
+    def test_unknown_balance(self):
+        from tinyfasta.split import split_fasta
+        with self.assertRaises(ValueError):
+            split_fasta("dummy.fasta", 2, by="bytes")
+
+class IdsUnitTests(unittest.TestCase):
+
+    def test_make_tokenizer(self):
+        from tinyfasta.ids import make_tokenizer
+        description = ">sp|P69905|HBA_HUMAN Hemoglobin subunit alpha"
+        self.assertEqual(make_tokenizer()(description), "sp|P69905|HBA_HUMAN")
+        self.assertEqual(make_tokenizer(field=1)(description), "Hemoglobin")
+        self.assertEqual(make_tokenizer("|", 1)(description), "P69905")
+        self.assertEqual(make_tokenizer("|", 5)(description), "")
+
+    def test_description_identifier(self):
+        from tinyfasta import FastaRecord
+        description = FastaRecord.Description(">sp|P69905|HBA_HUMAN alpha")
+        self.assertEqual(description.identifier(), "sp|P69905|HBA_HUMAN")
+        self.assertEqual(description.identifier("|", 2), "HBA_HUMAN")
+
+    def test_build_id_entries(self):
+        import io
+        from tinyfasta.ids import build_id_entries, make_tokenizer
+        data = b">b|2 x\nAC\n>a|1 y\nGT\nT\n"
+        entries = build_id_entries(io.BytesIO(data), make_tokenizer("|", 1))
+        self.assertEqual(entries, [(b"1", 10, 12), (b"2", 0, 10)])
+
+    def test_build_id_entries_duplicate(self):
+        import io
+        from tinyfasta.ids import build_id_entries, make_tokenizer
+        data = b">a x\nAC\n>a y\nGT\n"
+        with self.assertRaises(ValueError):
+            build_id_entries(io.BytesIO(data), make_tokenizer())
+
+class KmerUnitTests(unittest.TestCase):
+
+    def test_kmer_codes(self):
+        from tinyfasta.kmers import _kmer_codes
+        self.assertEqual(list(_kmer_codes(b"ACGTNAC", 3)),
+                         [(0, 6), (1, 27)])
+
+    def test_kmer_code(self):
+        from tinyfasta.kmers import _kmer_code
+        self.assertEqual(_kmer_code(b"CGT"), 27)
+        self.assertEqual(_kmer_code(b"CNT"), None)
+
+    def test_bisect(self):
+        from tinyfasta.kmers import _bisect
+        values = [1, 3, 5, 7]
+        self.assertEqual(_bisect(values, 5, 0, 4), 2)
+        self.assertEqual(_bisect(values, 4, 0, 4), -1)
+        self.assertEqual(_bisect(values, 7, 0, 3), -1)
+
+    def test_radix_order(self):
+        import array
+        from tinyfasta.kmers import _radix_order
+        codes = array.array("Q", [70000, 3, 70000, 0, 3, 1 << 40])
+        self.assertEqual(list(_radix_order(codes, 48)), [3, 1, 4, 0, 2, 5])
+        self.assertEqual(list(_radix_order(array.array("Q"), 24)), [])
+
+    def test_group_postings(self):
+        import array
+        from tinyfasta.kmers import _HAVE_NUMPY, _group_postings
+        codes = array.array("Q", [27, 6, 27, 6, 9])
+        keys = array.array("Q", [0, 1, 2, 3, 4])
+        expected = ([6, 9, 27], [0, 2, 3, 5], [1, 3, 4, 0, 2])
+        self.assertEqual(tuple(list(values) for values in
+                               _group_postings(codes, keys, 3, False)),
+                         expected)
+        if not _HAVE_NUMPY:
+            self.skipTest("NumPy is not installed")
+        self.assertEqual(tuple(list(values) for values in
+                               _group_postings(codes, keys, 3, True)),
+                         expected)
+
+    def test_rolling_codes(self):
+        from tinyfasta.kmers import _rolling_codes
+        self.assertEqual(list(_rolling_codes(b"ACGTNAC", 3, False)), [6, 27])
+        # The reverse complements are ACG (6) and ACG (6).
+        self.assertEqual(list(_rolling_codes(b"ACGTNAC", 3, True)), [6, 6])
+
+    def test_count_exact(self):
+        from tinyfasta.kmers import _HAVE_NUMPY, KmerCounter
+        for use_numpy in (False, True):
+            if use_numpy and not _HAVE_NUMPY:
+                self.skipTest("NumPy is not installed")
+            kmer_counter = KmerCounter(k=2, use_numpy=use_numpy)
+            kmer_counter.add_sequence("AACGNaa")
+            self.assertEqual(kmer_counter.total, 4)
+            self.assertEqual(sorted(kmer_counter.items()),
+                             [("AA", 2), ("AC", 1), ("CG", 1)])
+            self.assertEqual(kmer_counter.count("aa"), 2)
+            self.assertEqual(kmer_counter.count("GN"), 0)
+            self.assertRaises(ValueError, kmer_counter.count, "AAA")
+
+    def test_count_canonical(self):
+        from tinyfasta.kmers import KmerCounter
+        kmer_counter = KmerCounter(k=3, canonical=True, use_numpy=False)
+        kmer_counter.add_sequence("AAACTTT")
+        self.assertEqual(kmer_counter.count("TTT"), 2)
+        self.assertEqual(kmer_counter.most_common(1), [("AAA", 2)])
+
+    def test_count_sketch(self):
+        from tinyfasta.kmers import _HAVE_NUMPY, KmerCounter
+        # Sketches filled with and without NumPy can be merged.
+        counters = [KmerCounter(k=3, sketch=True, width=16, use_numpy=False),
+                    KmerCounter(k=3, sketch=True, width=16,
+                                use_numpy=_HAVE_NUMPY)]
+        counters[0].add_sequence("ACGTACGT")
+        counters[1].add_sequence("ACGGG")
+        counters[0].merge(counters[1])
+        self.assertEqual(counters[0].total, 9)
+        self.assertTrue(counters[0].count("ACG") >= 3)
+        self.assertRaises(TypeError, len, counters[0])
+        self.assertRaises(ValueError, counters[0].merge, KmerCounter(k=3))
+        self.assertRaises(ValueError, KmerCounter, sketch=True, width=100)
+
+class TwoBitUnitTests(unittest.TestCase):
+
+    def test_pack_unpack(self):
+        from tinyfasta.twobit import _pack, _unpack
+        packed = _pack("TCAGGACTA")
+        self.assertEqual(len(packed), 3)
+        self.assertEqual(_unpack(packed)[:9], "TCAGGACTA")
+
+    def test_overlapping(self):
+        from tinyfasta.twobit import _overlapping
+        starts, ends = [2, 10, 20], [5, 15, 25]
+        self.assertEqual(list(_overlapping(starts, ends, 4, 12)),
+                         [(4, 5), (10, 12)])
+        self.assertEqual(list(_overlapping(starts, ends, 5, 10)), [])
+
+class BgzfUnitTests(unittest.TestCase):
+
+    def test_compress_decompress_block(self):
+        from tinyfasta.bgzf import _compress_block, _decompress_block
+        block = _compress_block(b"ACGT" * 100)
+        self.assertEqual(_decompress_block(block), b"ACGT" * 100)
+
+    def test_gzi_locate(self):
+        from tinyfasta.bgzf import GziIndex
+        gzi = GziIndex([(100, 65280), (200, 130560)])
+        self.assertEqual(gzi.locate(0), (0, 0))
+        self.assertEqual(gzi.locate(65279), (0, 65279))
+        self.assertEqual(gzi.locate(65280), (100, 0))
+        self.assertEqual(gzi.locate(140000), (200, 9440))
+
 if __name__ == "__main__":
     unittest.main()
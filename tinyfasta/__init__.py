@@ -1,39 +1,119 @@
 """Package for parsing and generating FASTA files of biological sequences.
 
-Use the :class:`tinyfasta.FastaParser` class to parse FASTA files. 
+Use the :class:`tinyfasta.FastaParser` class to parse FASTA files. Pass it a
+:class:`tinyfasta.ParserMetrics` instance to monitor the progress of the
+parsing. Records arriving over asynchronous streams, e.g. sockets, can be
+parsed using the :class:`tinyfasta.AsyncFastaParser` class. Summaries of
+files that are parsed over and over again can be kept in a
+:class:`tinyfasta.SummaryCache`.
 
 To generate FASTA files use the  :func:`tinyfasta.FastaRecord.create` static
 method to create :class:`tinyfasta.FastaRecord` instances, which can be written
-to file.
+to file using the :class:`tinyfasta.FastaWriter` class.
+
+Use the :class:`tinyfasta.FastaIndex` class to fetch individual records, or
+parts of them, without having to parse the whole FASTA file, and the
+:class:`tinyfasta.IdIndex` class to fetch many records by identifier. Nucleotide
+sequences can also be stored compactly, with random access, using the
+:class:`tinyfasta.TwoBitFile` class.
+
+Use the :class:`tinyfasta.PatternSet` class to search for many strings at once
+and the :class:`tinyfasta.Motif` class to search for IUPAC nucleotide motifs on
+both strands. Strings can be searched for allowing mismatches or edits using
+the :class:`tinyfasta.ApproximatePatternSet` class. To look up short sequences
+in a large, static FASTA file many times over use the
+:class:`tinyfasta.KmerIndex` class, and to count k-mers use the
+:class:`tinyfasta.KmerCounter` class.
+
+Use the :class:`tinyfasta.FastaStats` class to compute length and composition
+statistics of a FASTA file and the :class:`tinyfasta.Deduplicator` class to
+remove records with duplicate sequences. Files too large to sort in memory can
+be sorted using the :class:`tinyfasta.RecordSorter` class, and split into
+balanced shards using the :func:`tinyfasta.split.split_fasta` function. The
+sequence alphabet of a file can be checked, and the file cleaned, using the
+:class:`tinyfasta.AlphabetValidator` class.
 """
 
 __version__ = "0.1.0"
 
+import collections
+import importlib
+import io
+import mmap
+import re
+
+from tinyfasta._blocks import (chunk_spans, has_padding, iter_raw_records,
+                               line_layout, read_blocks, record_spans,
+                               split_records, split_tuples)
+from tinyfasta.bgzf import decompress_blocks, is_gzip, open_fasta
+
+_ENCODING = "utf-8"
+_PARALLEL_CHUNK_SIZE = 4 * 1024 * 1024
+
 class _FastaRecordComponent(object):
     """Component of a FastaRecort."""
 
-    def contains(self, search_term):
+    __slots__ = ("_content",)
+
+    def contains(self, search_term, max_mismatches=None, max_edits=None):
         """Return True if the component contains the search term.
-        
-        :param search_term: string or compiled regular expression to search for
+
+        Approximate matches of a search string are found by passing the
+        maximum number of mismatches, or edits, see
+        :class:`tinyfasta.ApproximatePatternSet`.
+
+        :param search_term: string, compiled regular expression or search
+                            object such as :class:`tinyfasta.PatternSet`
+        :param max_mismatches: maximum number of substitutions in a match
+        :param max_edits: maximum number of substitutions, insertions and
+                          deletions in a match
         :returns: bool
         """
+        search_term = _approximate(search_term, max_mismatches, max_edits)
         if hasattr(search_term, "search"):
             return search_term.search(self._content) is not None
         return self._content.find(search_term) != -1
 
+    def find_all(self, search_term, max_mismatches=None, max_edits=None):
+        """Return list of all the matches of the search term in the component.
+
+        :param search_term: string, compiled regular expression or search
+                            object such as :class:`tinyfasta.PatternSet`
+        :param max_mismatches: maximum number of substitutions in a match
+        :param max_edits: maximum number of substitutions, insertions and
+                          deletions in a match
+        :returns: list of match objects
+        """
+        search_term = _approximate(search_term, max_mismatches, max_edits)
+        if not hasattr(search_term, "finditer"):
+            search_term = re.compile(re.escape(search_term))
+        return list(search_term.finditer(self._content))
+
 class Sequence(_FastaRecordComponent):
-    """Class representing a biological sequence."""
-          
+    """Class representing a biological sequence.
+
+    The sequence is stored as a single string. The way the sequence is split
+    over several lines is kept as layout information, which is only applied
+    when the sequence lines are written out. The lines are then kept until the
+    sequence or its layout changes.
+    """
+
+    __slots__ = ("_chunks", "_length", "_line_length", "_line_lengths",
+                 "_lines")
+
     def __init__(self):
-        self._sequences = []
+        self._chunks = []
+        self._length = 0
+        self._line_length = None
+        self._line_lengths = None
+        self._lines = None
 
     def __str__(self):
         return self._content
 
     def __len__(self):
         """Return the length of the biological sequence."""
-        return sum(len(s) for s in self._sequences)
+        return self._length
 
     @property
     def _content(self):
@@ -41,7 +121,52 @@ class Sequence(_FastaRecordComponent):
         
         :returns: str
         """
-        return ''.join(self._sequences)
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    @property
+    def _sequences(self):
+        """Return the sequence split into lines according to its layout.
+
+        :returns: list of str
+        """
+        if self._lines is not None:
+            return self._lines
+        content = self._content
+        if self._line_lengths is None:
+            if not content:
+                return []
+            n = self._line_length
+            if self._length <= n:
+                lines = [content]
+            else:
+                lines = [content[i:i+n] for i in range(0, len(content), n)]
+        else:
+            lines = []
+            start = 0
+            for n in self._line_lengths:
+                lines.append(content[start:start+n])
+                start += n
+        if self._length:
+            self._lines = lines
+        return lines
+
+    def _add_line_to_layout(self, n):
+        """Update the layout with a sequence line of length n."""
+        if self._line_lengths is not None:
+            self._line_lengths.append(n)
+        elif self._line_length is None and self._length == 0 and n > 0:
+            self._line_length = n
+        elif (self._line_length is not None and n > 0
+                and n <= self._line_length
+                and self._length % self._line_length == 0):
+            pass
+        else:
+            # The lines are no longer all of the same length, record the
+            # length of each individual line instead.
+            self._line_lengths = [len(line) for line in self._sequences]
+            self._line_lengths.append(n)
 
     def add_sequence_line(self, sequence_line):
         """
@@ -53,29 +178,106 @@ class Sequence(_FastaRecordComponent):
 
         :param sequence_line: string representing (part of) a sequence
         """
-        self._sequences.append( sequence_line.strip() )
+        sequence_line = sequence_line.strip()
+        n = len(sequence_line)
+        # Another full line of the same length leaves the layout unchanged.
+        if (n != self._line_length or self._line_lengths is not None
+                or self._length % n):
+            self._add_line_to_layout(n)
+        self._chunks.append(sequence_line)
+        self._length += n
+        self._lines = None
+
+    def _add_sequence_lines(self, sequence_lines):
+        """Add the sequence lines of a record in one go.
+
+        If all the lines are of the same length, apart from the last one, the
+        layout is worked out from their lengths without a check per line.
+
+        :param sequence_lines: list of strings
+        """
+        if len(sequence_lines) < 2:
+            for line in sequence_lines:
+                self.add_sequence_line(line)
+            return
+        lines = [line.strip() for line in sequence_lines]
+        lengths = list(map(len, lines))
+        if not self._length:
+            width = lengths[0]
+            if (0 < lengths[-1] <= width
+                    and lengths[:-1].count(width) == len(lengths) - 1):
+                self._chunks = [''.join(lines)]
+                self._length = sum(lengths)
+                self._line_length = width
+                return
+        for line in lines:
+            self.add_sequence_line(line)
+
+    def _add_sequence_block(self, sequence_block):
+        """Add a block of newline separated sequence lines in one go.
+
+        If all the lines are of the same length, apart from the last one, the
+        newlines are removed in one pass over the block. Blocks with other
+        whitespace, which is stripped from each line, are added line by line.
+
+        :param sequence_block: bytes with one or more sequence lines
+        """
+        eol = sequence_block.find(b"\n")
+        if not self._length and (eol == -1 or eol == len(sequence_block) - 1):
+            # Single line sequences, e.g. short reads, need no layout checks.
+            content = sequence_block.rstrip()
+            if content.isalpha():
+                self._chunks = [content.decode(_ENCODING)]
+                self._length = self._line_length = len(content)
+                return
+        layout = None
+        if not self._length and not has_padding(sequence_block):
+            layout = line_layout(sequence_block)
+        if layout is None:
+            self._add_block_lines(sequence_block)
+            return
+        length, line_bases, _ = layout
+        if length:
+            content = sequence_block.translate(None, b"\r\n")
+            self._chunks = [content.decode(_ENCODING)]
+            self._length = length
+            self._line_length = line_bases
+
+    def _add_block_lines(self, sequence_block):
+        """Add the lines of a block of bytes one at a time."""
+        lines = sequence_block.decode(_ENCODING).split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        for line in lines:
+            self.add_sequence_line(line)
 
     def format_line_length(self, line_length=80):
         """Format line length used to represent the sequence.
 
-        The full sequence is stored as list of shorter sequences. These shorter
-        sequences are used verbatim when writing out the
-        :class:`tinyfasta.FastaRecord` over several lines.
+        The line length is only used when writing out the
+        :class:`tinyfasta.FastaRecord` over several lines, the sequence itself
+        is left untouched.
         
-        :param line_length: length of the sequences used to make up the full
-                            sequence
+        :param line_length: length of the lines used to write out the sequence
         """
-        def string_to_list(seq, n):
-            """Return list of strings of length n."""
-            return [seq[i:i+n] for i in range(0, len(seq), n)]
-        self._sequences = string_to_list(self._content, line_length)
+        self._line_length = line_length
+        self._line_lengths = None
+        self._lines = None
     
 class FastaRecord(object):
-    """Class representing a FASTA record."""
+    """Class representing a FASTA record.
+
+    The record classes use ``__slots__``, so that the many records created
+    when parsing a file of short reads take up little memory.
+    """
+
+    __slots__ = ("description", "sequence")
 
     class Description(_FastaRecordComponent):
         """Description line in a :class:`tinyfasta.FastaRecord`."""
-        
+
+        __slots__ = ()
+
         def __init__(self, description):
             self.update(description)
 
@@ -94,6 +296,18 @@ class FastaRecord(object):
                 description = ">{}".format(description)
             self._content = description.strip()
 
+        def identifier(self, delimiter=None, field=0):
+            """Return the identifier of the record.
+
+            See :func:`tinyfasta.ids.make_tokenizer`.
+
+            :param delimiter: string separating the fields of the first word
+            :param field: zero-based index of the field holding the identifier
+            :returns: str
+            """
+            from tinyfasta.ids import make_tokenizer
+            return make_tokenizer(delimiter, field)(self._content)
+
 
     @staticmethod
     def create(description, sequence):
@@ -118,8 +332,10 @@ class FastaRecord(object):
 
     def __str__(self):
         """String representation of the :class:`tinyfasta.FastaRecord` instance."""
+        sequence = self.sequence
         lines = [str(self.description),]
-        lines.extend(self.sequence._sequences)
+        # Use the lines kept by the sequence without a call to the property.
+        lines.extend(sequence._lines or sequence._sequences)
         return '\n'.join(lines)
 
     def __len__(self):
@@ -137,25 +353,369 @@ class FastaRecord(object):
         """
         self.sequence.add_sequence_line(sequence_line)
 
+class _LazyFastaRecord(FastaRecord):
+    """FastaRecord that reads its sequence from file when first accessed."""
+
+    __slots__ = ("_sequence", "_span")
+
+    def __init__(self, description, fpath, start, end):
+        """Initialise an instance of the _LazyFastaRecord class.
+
+        :param description: description string
+        :param fpath: path to the FASTA file
+        :param start: offset of the sequence in the FASTA file
+        :param end: offset of the end of the sequence in the FASTA file
+        """
+        self.description = FastaRecord.Description(description)
+        self._sequence = None
+        self._span = (fpath, start, end)
+
+    @property
+    def sequence(self):
+        """The :class:`tinyfasta.Sequence` of the record."""
+        if self._sequence is None:
+            sequence = Sequence()
+            sequence._add_sequence_block(_read_chunk(*self._span))
+            self._sequence = sequence
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, sequence):
+        self._sequence = sequence
+
 class FastaParser(object):
-    """Class for parsing FASTA files."""
+    """Class for parsing FASTA files.
+
+    Gzip and BGZF compressed files are detected and decompressed on the fly.
 
-    def __init__(self, fpath):
+    Instead of a path, a binary file object, e.g. ``sys.stdin.buffer`` or an
+    :class:`io.BytesIO` instance, can be parsed. File objects are read in
+    large blocks, so they need not be seekable and pipes are parsed as fast
+    as files.
+    """
+
+    def __init__(self, fpath, use_mmap=False, lazy=False, metrics=None,
+                 raw=False, cache=None):
         """Initialise an instance of the FastaParser.
         
-        :param fpath: path to the FASTA file to be parsed
+        :param fpath: path to the FASTA file to be parsed, or file object to
+                      read it from
+        :param use_mmap: memory map the file and locate the records using bulk
+                         searches rather than reading it line by line
+        :param lazy: only read the description lines up front, the sequence
+                     of a record is read from file when it is first accessed
+        :param metrics: :class:`tinyfasta.ParserMetrics` instance in which to
+                        collect counters while iterating over the records
+        :param raw: yield ``(header, sequence)`` tuples of strings instead of
+                    :class:`tinyfasta.FastaRecord` instances, where the header
+                    is the description line without the leading ">"
+        :param cache: :class:`tinyfasta.SummaryCache` in which to keep the
+                      locations of the records, so that memory mapped and
+                      lazy parsing need not search the file for them again
         """
+        if raw and lazy:
+            raise ValueError("Cannot parse raw records lazily")
         self.fpath = fpath
+        self.use_mmap = use_mmap
+        self.lazy = lazy
+        self.metrics = metrics
+        self.raw = raw
+        self.cache = cache
 
     def __iter__(self):
-        """Yield FastaRecord instances."""
+        """Yield FastaRecord instances, or tuples if raw is True."""
+        if self.raw:
+            fasta_records = self._iter_tuples()
+        elif self._is_stream():
+            if self.lazy:
+                raise ValueError("Cannot parse a file object lazily")
+            fasta_records = self._iter_stream()
+        elif self.lazy:
+            fasta_records = self._iter_lazy()
+        elif self.use_mmap:
+            fasta_records = self._iter_mmap()
+        else:
+            fasta_records = self._iter_lines()
+        if self.metrics is None:
+            return fasta_records
+        return self.metrics._measure(fasta_records)
+
+    def _is_stream(self):
+        """Return True if the parser reads from a file object."""
+        return hasattr(self.fpath, "read")
+
+    def _stream_blocks(self):
+        """Yield uncompressed blocks of bytes read from a file object."""
+        fh = self.fpath
+        if isinstance(fh, io.TextIOBase):
+            fh = fh.buffer
+        blocks = read_blocks(fh)
+        if self.metrics is not None:
+            blocks = self.metrics._count_read(blocks)
+        blocks = decompress_blocks(blocks)
+        if self.metrics is not None:
+            blocks = self.metrics._count_parsed(blocks)
+        return blocks
+
+    def _iter_stream(self):
+        """Yield FastaRecord instances reading a file object in blocks."""
+        for _, _, header, sequence_block in split_records(
+                self._stream_blocks()):
+            yield _record_from_bytes(header, sequence_block)
+
+    def _iter_tuples(self):
+        """Yield (header, sequence) tuples reading the file in blocks."""
+        if self._is_stream():
+            for fasta_tuple in split_tuples(self._stream_blocks(), _ENCODING):
+                yield fasta_tuple
+            return
+        with self._open() as fh:
+            for fasta_tuple in split_tuples(read_blocks(fh), _ENCODING):
+                yield fasta_tuple
+
+    def _open(self):
+        """Return binary file object with the uncompressed file content."""
+        if self.metrics is None:
+            return open_fasta(self.fpath)
+        return self.metrics._open(self.fpath)
+
+    def _record_spans(self, mapped):
+        """Yield the record spans of the memory mapped file."""
+        if self.cache is None:
+            spans = record_spans(mapped)
+        else:
+            spans = self.cache.get_or_build(
+                self.fpath, "spans", lambda: list(record_spans(mapped)))
+        if self.metrics is None:
+            return spans
+        return self.metrics._count_spans(mapped, spans)
+
+    def _iter_lines(self):
+        """Yield FastaRecord instances reading the file line by line."""
         fasta_record = None
-        with open(self.fpath, 'r') as fh:
+        sequence_lines = []
+        with io.TextIOWrapper(self._open(), encoding=_ENCODING) as fh:
             for line in fh:
                 if line.startswith('>'):
-                    if fasta_record:
+                    if fasta_record is not None:
+                        fasta_record.sequence._add_sequence_lines(
+                            sequence_lines)
                         yield fasta_record
                     fasta_record = FastaRecord(line)
+                    sequence_lines = []
                 else:
-                    fasta_record.add_sequence_line(line)
-        yield fasta_record
+                    sequence_lines.append(line)
+        if fasta_record is not None:
+            fasta_record.sequence._add_sequence_lines(sequence_lines)
+            yield fasta_record
+
+    def _iter_mmap(self):
+        """Yield FastaRecord instances from the memory mapped file."""
+        if is_gzip(self.fpath):
+            # Compressed files cannot be mapped, parse them in blocks instead.
+            with self._open() as fh:
+                for _, _, header, sequence_block in iter_raw_records(fh):
+                    yield _record_from_bytes(header, sequence_block)
+            return
+        with open(self.fpath, "rb") as fh:
+            mapped = _map_file(fh)
+            if mapped is None:
+                return
+            try:
+                for start, sequence_start, end in self._record_spans(mapped):
+                    yield _record_from_bytes(mapped[start:sequence_start],
+                                             mapped[sequence_start:end])
+            finally:
+                mapped.close()
+
+    def _iter_lazy(self):
+        """Yield FastaRecord instances that read their sequence on demand."""
+        if is_gzip(self.fpath):
+            raise ValueError(
+                "Cannot parse compressed file '{}' lazily".format(self.fpath))
+        with open(self.fpath, "rb") as fh:
+            mapped = _map_file(fh)
+            if mapped is None:
+                return
+            try:
+                for start, sequence_start, end in self._record_spans(mapped):
+                    header = mapped[start:sequence_start]
+                    yield _LazyFastaRecord(header.decode(_ENCODING),
+                                           self.fpath, sequence_start, end)
+            finally:
+                mapped.close()
+
+    def _chunk_spans(self, chunk_size):
+        """Return list of (start, end) byte spans aligned to records."""
+        if self._is_stream():
+            raise ValueError("Cannot split a file object into chunks")
+        if is_gzip(self.fpath):
+            raise ValueError(
+                "Cannot split compressed file '{}' into chunks".format(
+                    self.fpath))
+        with open(self.fpath, "rb") as fh:
+            mapped = _map_file(fh)
+            if mapped is None:
+                return []
+            try:
+                return list(chunk_spans(mapped, chunk_size))
+            finally:
+                mapped.close()
+
+    def _parallel(self, worker, func, processes, chunk_size):
+        """Yield the results of applying worker to chunks of the file.
+
+        Only the file path and the byte offsets of a chunk are sent to the
+        worker processes. The number of chunks in flight is bounded to keep
+        the memory usage in check.
+        """
+        # Imported here as it takes longer to import than the whole package.
+        import multiprocessing
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes)
+        try:
+            pending = collections.deque()
+            for start, end in self._chunk_spans(chunk_size):
+                pending.append(pool.apply_async(worker,
+                    (self.fpath, start, end, func)))
+                if len(pending) >= 2 * processes:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def parallel_map(self, func, processes=None,
+                     chunk_size=_PARALLEL_CHUNK_SIZE):
+        """Yield the result of func(fasta_record) for all the records.
+
+        The file is split into chunks aligned to record boundaries, which are
+        parsed and processed by a pool of worker processes. The results are
+        yielded in the order of the records in the file.
+
+        :param func: picklable function taking a
+                     :class:`tinyfasta.FastaRecord` as its argument
+        :param processes: number of worker processes, defaults to the number
+                          of CPUs
+        :param chunk_size: approximate number of bytes in each chunk
+        """
+        for results in self._parallel(_map_chunk, func, processes, chunk_size):
+            for result in results:
+                yield result
+
+    def parallel_filter(self, func, processes=None,
+                        chunk_size=_PARALLEL_CHUNK_SIZE):
+        """Yield the FastaRecord instances for which func returns True.
+
+        The worker processes only return the byte offsets of the matching
+        records, which are then read and parsed again in this process.
+
+        :param func: picklable function taking a
+                     :class:`tinyfasta.FastaRecord` as its argument
+        :param processes: number of worker processes, defaults to the number
+                          of CPUs
+        :param chunk_size: approximate number of bytes in each chunk
+        """
+        if self._is_stream():
+            raise ValueError("Cannot split a file object into chunks")
+        with open(self.fpath, "rb") as fh:
+            for spans in self._parallel(_filter_chunk, func, processes,
+                                        chunk_size):
+                for start, end in spans:
+                    fh.seek(start)
+                    for fasta_record in _records_from_bytes(
+                            fh.read(end - start)):
+                        yield fasta_record
+
+
+def _approximate(search_term, max_mismatches, max_edits):
+    """Return the search term, as an approximate search if requested."""
+    if max_mismatches is None and max_edits is None:
+        return search_term
+    if not isinstance(search_term, str):
+        raise ValueError("approximate search needs a plain string pattern")
+    from tinyfasta.search import ApproximatePatternSet
+    return ApproximatePatternSet([search_term], max_mismatches, max_edits)
+
+
+def _map_file(fh):
+    """Return read only mmap of an open file or None if the file is empty."""
+    try:
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        return None
+
+
+def _record_from_bytes(header, sequence_block):
+    """Return a FastaRecord built from raw header and sequence bytes."""
+    fasta_record = FastaRecord(header.decode(_ENCODING))
+    fasta_record.sequence._add_sequence_block(sequence_block)
+    return fasta_record
+
+
+def _records_from_bytes(data):
+    """Yield the FastaRecord instances in a buffer of bytes."""
+    for start, sequence_start, end in record_spans(data):
+        yield _record_from_bytes(data[start:sequence_start],
+                                 data[sequence_start:end])
+
+
+def _read_chunk(fpath, start, end):
+    """Return the bytes from start to end in a file."""
+    with open(fpath, "rb") as fh:
+        fh.seek(start)
+        return fh.read(end - start)
+
+
+def _map_chunk(fpath, start, end, func):
+    """Return list of func(fasta_record) for the records in a chunk."""
+    data = _read_chunk(fpath, start, end)
+    return [func(fasta_record) for fasta_record in _records_from_bytes(data)]
+
+
+def _filter_chunk(fpath, start, end, func):
+    """Return list of (start, end) spans of records for which func is True."""
+    data = _read_chunk(fpath, start, end)
+    spans = []
+    for record_start, sequence_start, record_end in record_spans(data):
+        fasta_record = _record_from_bytes(data[record_start:sequence_start],
+                                          data[sequence_start:record_end])
+        if func(fasta_record):
+            spans.append((start + record_start, start + record_end))
+    return spans
+
+from tinyfasta.cache import SummaryCache
+from tinyfasta.dedupe import Deduplicator
+from tinyfasta.ids import IdIndex
+from tinyfasta.index import FastaIndex
+from tinyfasta.metrics import ParserMetrics
+from tinyfasta.search import ApproximatePatternSet, Motif, PatternSet
+from tinyfasta.sort import RecordSorter
+from tinyfasta.twobit import TwoBitFile
+from tinyfasta.validate import AlphabetValidator
+from tinyfasta.writer import FastaWriter
+
+# Classes whose modules pull in asyncio or NumPy, which take many times longer
+# to import than the rest of the package, are imported on first use.
+_LAZY_IMPORTS = {
+    "AsyncFastaParser": "tinyfasta.aio",
+    "FastaStats": "tinyfasta.stats",
+    "KmerCounter": "tinyfasta.kmers",
+    "KmerIndex": "tinyfasta.kmers",
+}
+
+
+def __getattr__(name):
+    """Return a class imported on first use."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
@@ -0,0 +1,325 @@
+"""Low level helpers for locating FASTA records in blocks of bytes.
+
+The functions in this module work on raw bytes rather than on lines of text.
+They are used internally wherever the record boundaries of a FASTA file need
+to be found quickly, e.g. when indexing a file or when parsing it in bulk.
+"""
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+_COUNT_WINDOW = 1024 * 1024
+
+# ASCII whitespace, apart from line endings, stripped by str.strip.
+_PADDING = tuple(b" \t\x0b\x0c\x1c\x1d\x1e\x1f")
+
+
+def has_padding(data):
+    """Return True if the data may hold whitespace other than line endings.
+
+    Lines with such whitespace need stripping one at a time, like the line by
+    line parser does. Non-ASCII data is assumed to hold whitespace.
+
+    :param data: bytes or str
+    """
+    if not data.isascii():
+        return True
+    if isinstance(data, str):
+        return any(data.find(chr(c)) != -1 for c in _PADDING)
+    return any(data.find(c) != -1 for c in _PADDING)
+
+
+def record_spans(buf, start=0, end=None):
+    """Yield the byte spans of the FASTA records in a buffer.
+
+    Each span is a tuple ``(record_start, sequence_start, record_end)``. The
+    header line runs from ``record_start`` up to ``sequence_start`` and the
+    (newline separated) sequence from ``sequence_start`` up to ``record_end``.
+
+    :param buf: bytes, bytearray or mmap object
+    :param start: offset from which to start looking for records
+    :param end: offset at which to stop looking for records
+    """
+    if end is None:
+        end = len(buf)
+    pos = buf.find(b">", start, end)
+    while pos != -1:
+        nxt = buf.find(b"\n>", pos, end)
+        record_end = end if nxt == -1 else nxt + 1
+        eol = buf.find(b"\n", pos, record_end)
+        sequence_start = record_end if eol == -1 else eol + 1
+        yield pos, sequence_start, record_end
+        pos = -1 if nxt == -1 else nxt + 1
+
+
+def chunk_spans(buf, chunk_size):
+    """Yield (start, end) spans of at least chunk_size bytes.
+
+    The spans cover all the records in the buffer and are aligned to record
+    boundaries, so that each span can be parsed independently.
+
+    :param buf: bytes, bytearray or mmap object
+    :param chunk_size: minimum number of bytes in each span
+    """
+    end = len(buf)
+    start = buf.find(b">")
+    if start == -1:
+        return
+    while start < end:
+        stop = buf.find(b"\n>", start + max(chunk_size, 1) - 1)
+        stop = end if stop == -1 else stop + 1
+        yield start, stop
+        start = stop
+
+
+def record_name(header):
+    """Return the name of a record, i.e. the first word of its header line.
+
+    :param header: raw header line including the leading ">"
+    :returns: str
+    """
+    fields = header[1:].split()
+    return fields[0].decode("utf-8") if fields else ""
+
+
+def count_bytes(buf, byte, start=0, end=None):
+    """Return the number of times a byte occurs in part of a buffer.
+
+    Memory mapped files have no ``count`` method, so they are counted a
+    window at a time rather than by copying the whole part into a bytes
+    object.
+
+    :param buf: bytes, bytearray or mmap object
+    :param byte: bytes of length one to count
+    :param start: offset at which to start counting
+    :param end: offset at which to stop counting
+    :returns: int
+    """
+    if end is None:
+        end = len(buf)
+    count = getattr(buf, "count", None)
+    if count is not None:
+        return count(byte, start, end)
+    total = 0
+    for pos in range(start, end, _COUNT_WINDOW):
+        total += buf[pos:min(pos + _COUNT_WINDOW, end)].count(byte)
+    return total
+
+
+def line_layout(body, start=0, end=None):
+    """Return the line layout of a newline separated sequence.
+
+    The layout is a tuple ``(length, line_bases, line_width)`` as used in
+    samtools ``.fai`` files. If the sequence lines are not all of the same
+    length, apart from the last one which may be shorter, None is returned.
+
+    :param body: bytes making up the sequence part of a FASTA record, or
+                 buffer holding it from start to end
+    :param start: offset of the sequence in body
+    :param end: offset of the end of the sequence in body
+    :returns: tuple or None
+    """
+    if end is None:
+        end = len(body)
+    content_end = end
+    while content_end > start and body[content_end - 1:content_end].isspace():
+        content_end -= 1
+    length = content_end - start
+    if not length:
+        return 0, 0, 0
+    eol = body.find(b"\n", start, content_end)
+    if eol == -1:
+        if body.find(b"\r", start, content_end) != -1:
+            return None
+        terminator = body[content_end:content_end + 2]
+        width = length + (2 if terminator == b"\r\n" else 1)
+        return length, length, width
+    crlf = eol > start and body[eol - 1:eol] == b"\r"
+    bases = eol - start - 1 if crlf else eol - start
+    width = eol - start + 1
+    full, remainder = divmod(length, width)
+    if remainder > bases or remainder == 0:
+        return None
+    if count_bytes(body, b"\n", start, content_end) != full:
+        return None
+    if body[start + width - 1:content_end:width].count(b"\n") != full:
+        return None
+    if crlf or body.find(b"\r", start, content_end) != -1:
+        if count_bytes(body, b"\r", start, content_end) != full:
+            return None
+        if body[start + width - 2:content_end:width].count(b"\r") != full:
+            return None
+    return full * bases + remainder, bases, width
+
+
+class RecordSplitter(object):
+    """Split a stream of byte blocks into raw FASTA records.
+
+    Blocks are passed in using :func:`feed` and the records completed by each
+    block are returned straight away. Partial records are carried over to the
+    next block. Each record is a tuple ``(offset, sequence_offset, header,
+    body)`` where the offsets are relative to the start of the stream, the
+    header is the header line without its line terminator and the body is the
+    newline separated sequence.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def feed(self, block):
+        """Add a block of bytes and return the records it completes.
+
+        :param block: bytes
+        :returns: list of raw records
+        """
+        data = self.feed_data(block)
+        return [] if data is None else self._split(data)
+
+    def close(self):
+        """Return the records remaining once the stream is exhausted.
+
+        :returns: list of raw records
+        """
+        return self._split(self.close_data())
+
+    def feed_data(self, block):
+        """Add a block of bytes and return the complete records as bytes.
+
+        The data returned ends at a record boundary and, apart from any bytes
+        preceding the first record of the stream, starts at one.
+
+        :param block: bytes
+        :returns: bytes, or None if the block completes no records
+        """
+        cut = block.rfind(b"\n>")
+        if cut != -1:
+            cut += 1
+        elif (block[:1] == b">" and self._chunks
+                and self._chunks[-1][-1:] == b"\n"):
+            cut = 0
+        else:
+            if block:
+                self._chunks.append(block)
+            return None
+        self._chunks.append(block[:cut])
+        data = b"".join(self._chunks)
+        self._chunks = [block[cut:]]
+        return data
+
+    def close_data(self):
+        """Return the bytes of the records remaining at the end of the stream.
+
+        :returns: bytes
+        """
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+    def _split(self, data):
+        """Return the raw records in data and advance the stream offset."""
+        base = self._offset
+        self._offset += len(data)
+        records = []
+        for start, sequence_start, end in record_spans(data):
+            header = data[start:sequence_start].rstrip(b"\r\n")
+            records.append((base + start, base + sequence_start, header,
+                            data[sequence_start:end]))
+        return records
+
+
+def read_blocks(fh, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield blocks of bytes read from a binary file object.
+
+    If the file object supports it, the data is read using ``readinto`` into
+    a buffer that is reused for every block. Pipes and other non-seekable
+    file objects are supported.
+
+    :param fh: binary file like object
+    :param block_size: number of bytes to read at a time
+    """
+    readinto = getattr(fh, "readinto", None)
+    if readinto is None:
+        while True:
+            block = fh.read(block_size)
+            if not block:
+                return
+            yield block
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    while True:
+        size = readinto(buf)
+        if not size:
+            return
+        yield view[:size].tobytes()
+
+
+def split_records(blocks):
+    """Yield raw records from an iterable of blocks of bytes.
+
+    See :class:`tinyfasta._blocks.RecordSplitter` for the format of the raw
+    records.
+
+    :param blocks: iterable of bytes
+    """
+    splitter = RecordSplitter()
+    for block in blocks:
+        for raw_record in splitter.feed(block):
+            yield raw_record
+    for raw_record in splitter.close():
+        yield raw_record
+
+
+def split_blocks(blocks):
+    """Yield blocks of bytes cut at record boundaries.
+
+    Each block yielded holds one or more complete records. See
+    :func:`tinyfasta._blocks.RecordSplitter.feed_data`.
+
+    :param blocks: iterable of bytes
+    """
+    splitter = RecordSplitter()
+    for block in blocks:
+        data = splitter.feed_data(block)
+        if data:
+            yield data
+    data = splitter.close_data()
+    if data:
+        yield data
+
+
+def split_tuples(blocks, encoding="utf-8"):
+    """Yield (header, sequence) tuples of strings from blocks of bytes.
+
+    The header is the header line without the leading ">" and the sequence
+    has its line terminators, and any whitespace around its lines, removed. The records are split apart using
+    string methods on whole blocks, so only the two strings of each tuple are
+    created per record.
+
+    :param blocks: iterable of bytes
+    :param encoding: encoding of the FASTA file
+    """
+    for data in split_blocks(blocks):
+        start = data.find(b">")
+        if start == -1:
+            continue
+        text = data[start + 1:].decode(encoding)
+        padded = has_padding(text)
+        for record in text.split("\n>"):
+            header, _, sequence = record.partition("\n")
+            if padded:
+                sequence = "".join(line.strip()
+                                   for line in sequence.split("\n"))
+            else:
+                sequence = sequence.replace("\n", "")
+                if "\r" in sequence:
+                    sequence = sequence.replace("\r", "")
+            yield header.rstrip(), sequence
+
+
+def iter_raw_records(fh, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield raw records from a binary file handle.
+
+    :param fh: binary file like object
+    :param block_size: number of bytes to read at a time
+    """
+    return split_records(read_blocks(fh, block_size))
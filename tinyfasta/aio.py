@@ -0,0 +1,79 @@
+"""Parsing FASTA records from asynchronous byte streams.
+
+The :class:`tinyfasta.AsyncFastaParser` reads from an
+:class:`asyncio.StreamReader`, or any other asynchronous source of bytes, and
+locates the records using the same block based logic as the other parsers.
+"""
+
+import asyncio
+
+from tinyfasta import _record_from_bytes
+from tinyfasta._blocks import RecordSplitter
+from tinyfasta.bgzf import GZIP_MAGIC, _GzipDecoder
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+class AsyncFastaParser(object):
+    """Class for parsing FASTA records from an asynchronous byte stream.
+
+    Use ``async for`` to iterate over the records. The source is only read
+    when more records are needed, so a consumer that falls behind stops the
+    reading, and with an :class:`asyncio.StreamReader` the transport is
+    paused until it catches up. Gzip and BGZF compressed streams are detected
+    and decompressed on the fly.
+    """
+
+    def __init__(self, source, block_size=DEFAULT_BLOCK_SIZE):
+        """Initialise an instance of the AsyncFastaParser.
+
+        :param source: :class:`asyncio.StreamReader`, object with a coroutine
+                       ``read(size)`` method, or asynchronous iterable of
+                       bytes
+        :param block_size: maximum number of bytes read at a time
+        """
+        self.source = source
+        self.block_size = block_size
+
+    def __aiter__(self):
+        """Yield FastaRecord instances."""
+        return self._iter_records()
+
+    async def _iter_blocks(self):
+        """Yield blocks of bytes from the source."""
+        if hasattr(self.source, "read"):
+            while True:
+                block = await self.source.read(self.block_size)
+                if not block:
+                    return
+                yield block
+        else:
+            async for block in self.source:
+                if block:
+                    yield bytes(block)
+
+    async def _iter_records(self):
+        """Yield FastaRecord instances from the blocks read."""
+        splitter = RecordSplitter()
+        decoder = None
+        head = b""
+        async for block in self._iter_blocks():
+            if head is not None:
+                # Wait for the first two bytes to check for compression.
+                head += block
+                if len(head) < 2:
+                    continue
+                block, head = head, None
+                if block[:2] == GZIP_MAGIC:
+                    decoder = _GzipDecoder()
+            if decoder is not None:
+                block = decoder.decode(block)
+            for _, _, header, sequence_block in splitter.feed(block):
+                yield _record_from_bytes(header, sequence_block)
+            # Give other tasks a chance to run between blocks.
+            await asyncio.sleep(0)
+        raw_records = splitter.feed(head or b"")
+        if decoder is not None:
+            raw_records += splitter.feed(decoder.flush())
+        for _, _, header, sequence_block in raw_records + splitter.close():
+            yield _record_from_bytes(header, sequence_block)
@@ -0,0 +1,50 @@
+"""Biological sequence alphabets and related helper functions."""
+
+#: IUPAC nucleotide codes and the bases they stand for.
+IUPAC_NUCLEOTIDES = {
+    "A": "A",
+    "C": "C",
+    "G": "G",
+    "T": "TU",
+    "U": "TU",
+    "R": "AG",
+    "Y": "CTU",
+    "S": "CG",
+    "W": "ATU",
+    "K": "GTU",
+    "M": "AC",
+    "B": "CGTU",
+    "D": "AGTU",
+    "H": "ACTU",
+    "V": "ACG",
+    "N": "ACGTU",
+}
+
+#: Upper case characters of the sequence alphabets known by name.
+ALPHABETS = {
+    "dna": "ACGTRYSWKMBDHVN",
+    "rna": "ACGURYSWKMBDHVN",
+    "protein": "ACDEFGHIKLMNPQRSTVWYBZXJUO*",
+}
+
+#: Character standing for an unknown residue in each alphabet.
+UNKNOWN_RESIDUES = {
+    "dna": "N",
+    "rna": "N",
+    "protein": "X",
+}
+
+_COMPLEMENT = str.maketrans("ACGTURYSWKMBDHVNacgturyswkmbdhvn",
+                            "TGCAAYRSWMKVHDBNtgcaayrswmkvhdbn")
+
+
+def reverse_complement(sequence):
+    """Return the reverse complement of a nucleotide sequence.
+
+    IUPAC ambiguity codes are complemented and the case of each base is
+    preserved.
+
+    :param sequence: nucleotide sequence string
+    :returns: str
+    """
+    return sequence.translate(_COMPLEMENT)[::-1]
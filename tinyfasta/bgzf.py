@@ -0,0 +1,455 @@
+"""Reading and writing gzip and BGZF compressed FASTA files.
+
+BGZF is the blocked gzip format written by ``bgzip``. It is a series of
+independent gzip members, each holding at most 64 KiB of data. This makes it
+possible to decompress the blocks in parallel and, with the help of a ``.gzi``
+index, to seek to any position in the uncompressed data.
+"""
+
+import bisect
+import collections
+import functools
+import gzip
+import io
+import os
+import struct
+import zlib
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+_HEADER = struct.Struct("<4BI2BH")
+_BGZF_EOF = (b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43"
+             b"\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+_MAX_BLOCK_DATA = 0xff00
+_DEFAULT_THREADS = 4
+
+
+def _peek(fpath, size=18):
+    """Return the first bytes of a file."""
+    with open(fpath, "rb") as fh:
+        return fh.read(size)
+
+
+def _is_bgzf_header(header):
+    """Return True if the bytes are the start of a BGZF block."""
+    return (len(header) >= 18 and header[:2] == GZIP_MAGIC
+            and header[3:4] == b"\x04" and header[12:14] == b"BC")
+
+
+def _thread_pool(threads):
+    """Return a pool of threads.
+
+    The pool is imported here as importing multiprocessing takes longer than
+    importing the whole package.
+    """
+    from multiprocessing.pool import ThreadPool
+    return ThreadPool(threads)
+
+
+def is_gzip(fpath):
+    """Return True if the file is gzip compressed (including BGZF).
+
+    :param fpath: path to file
+    :returns: bool
+    """
+    return _peek(fpath, 2) == GZIP_MAGIC
+
+
+def is_bgzf(fpath):
+    """Return True if the file is BGZF compressed.
+
+    :param fpath: path to file
+    :returns: bool
+    """
+    return _is_bgzf_header(_peek(fpath))
+
+
+def _read_block(fh):
+    """Return the next raw BGZF block from a file handle or None at EOF."""
+    header = fh.read(12)
+    if not header:
+        return None
+    if len(header) < 12 or header[:2] != GZIP_MAGIC:
+        raise ValueError("Invalid BGZF block header")
+    xlen = _HEADER.unpack(header)[-1]
+    extra = fh.read(xlen)
+    block_size = None
+    pos = 0
+    while pos + 4 <= len(extra):
+        subfield_length = struct.unpack("<H", extra[pos+2:pos+4])[0]
+        if extra[pos:pos+2] == b"BC":
+            block_size = struct.unpack("<H", extra[pos+4:pos+6])[0] + 1
+        pos += 4 + subfield_length
+    if block_size is None:
+        raise ValueError("Not a BGZF block: missing BC extra field")
+    rest = fh.read(block_size - 12 - xlen)
+    return header + extra + rest
+
+
+def _decompress_block(block):
+    """Return the uncompressed data of a raw BGZF block."""
+    xlen = _HEADER.unpack(block[:12])[-1]
+    data = zlib.decompress(block[12+xlen:-8], -15)
+    crc, size = struct.unpack("<2I", block[-8:])
+    if size != len(data) or crc != zlib.crc32(data) & 0xffffffff:
+        raise ValueError("BGZF block failed its integrity check")
+    return data
+
+
+def _compress_block(data, level=6):
+    """Return a raw BGZF block holding the data."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = _HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6)
+    extra = b"BC" + struct.pack("<2H", 2, len(cdata) + 25)
+    trailer = struct.pack("<2I", zlib.crc32(data) & 0xffffffff, len(data))
+    return header + extra + cdata + trailer
+
+
+class _GzipDecoder(object):
+    """Incremental decoder of gzip data made up of one or more members."""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decode(self, data):
+        """Return the uncompressed bytes of the next block of data."""
+        chunks = []
+        while data:
+            chunks.append(self._decompressor.decompress(data))
+            data = self._decompressor.unused_data
+            if data:
+                # The end of a member was reached, BGZF files for example
+                # are made up of many of them.
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b"".join(chunks)
+
+    def flush(self):
+        """Return any remaining uncompressed bytes."""
+        return self._decompressor.flush()
+
+
+def decompress_blocks(blocks):
+    """Yield blocks of bytes, decompressing them if they are gzip compressed.
+
+    The compression is detected from the first bytes of the stream, so this
+    works on pipes and other streams that cannot be peeked into.
+
+    :param blocks: iterable of bytes
+    """
+    blocks = iter(blocks)
+    head = b""
+    for block in blocks:
+        head += block
+        if len(head) >= 2:
+            break
+    if head[:2] != GZIP_MAGIC:
+        if head:
+            yield head
+        for block in blocks:
+            yield block
+        return
+    decoder = _GzipDecoder()
+    yield decoder.decode(head)
+    for block in blocks:
+        yield decoder.decode(block)
+    yield decoder.flush()
+
+
+class GziIndex(object):
+    """Index of the BGZF blocks in a file, compatible with ``bgzip -i``.
+
+    The index is a sorted list of (compressed offset, uncompressed offset)
+    pairs, one for each block.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = [(0, 0)]
+        self._uncompressed = [0]
+        for compressed, uncompressed in entries or []:
+            if compressed:
+                self.add(compressed, uncompressed)
+
+    def add(self, compressed, uncompressed):
+        """Add the offsets of the start of a block to the index.
+
+        :param compressed: offset of the block in the compressed file
+        :param uncompressed: offset of the block in the uncompressed data
+        """
+        self.entries.append((compressed, uncompressed))
+        self._uncompressed.append(uncompressed)
+
+    @staticmethod
+    def build(fpath):
+        """Return a :class:`tinyfasta.bgzf.GziIndex` built by scanning a file.
+
+        Only the block headers are read, no data is decompressed.
+
+        :param fpath: path to BGZF file
+        :returns: :class:`tinyfasta.bgzf.GziIndex`
+        """
+        entries = []
+        compressed = uncompressed = 0
+        with open(fpath, "rb") as fh:
+            while True:
+                block = _read_block(fh)
+                if block is None:
+                    break
+                size = struct.unpack("<I", block[-4:])[0]
+                # Like the BgzfWriter, only index the blocks holding data and
+                # not the empty EOF block.
+                if size:
+                    entries.append((compressed, uncompressed))
+                compressed += len(block)
+                uncompressed += size
+        return GziIndex(entries)
+
+    @staticmethod
+    def read(index_path):
+        """Return a :class:`tinyfasta.bgzf.GziIndex` read from a file.
+
+        :param index_path: path to ``.gzi`` file
+        :returns: :class:`tinyfasta.bgzf.GziIndex`
+        """
+        with open(index_path, "rb") as fh:
+            data = fh.read()
+        count = struct.unpack("<Q", data[:8])[0]
+        values = struct.unpack("<{}Q".format(2 * count), data[8:8+16*count])
+        return GziIndex(zip(values[0::2], values[1::2]))
+
+    def write(self, index_path):
+        """Write the index to a ``.gzi`` file.
+
+        :param index_path: path to ``.gzi`` file
+        """
+        entries = self.entries[1:]
+        with open(index_path, "wb") as fh:
+            fh.write(struct.pack("<Q", len(entries)))
+            for compressed, uncompressed in entries:
+                fh.write(struct.pack("<2Q", compressed, uncompressed))
+
+    def locate(self, offset):
+        """Return the block containing an uncompressed offset.
+
+        :param offset: offset in the uncompressed data
+        :returns: tuple (compressed offset of block, offset within block)
+        """
+        i = bisect.bisect_right(self._uncompressed, offset) - 1
+        compressed, uncompressed = self.entries[i]
+        return compressed, offset - uncompressed
+
+
+class BgzfReader(io.RawIOBase):
+    """Binary file object returning the uncompressed data of a BGZF file.
+
+    When reading sequentially, blocks are decompressed ahead of the reader on
+    a pool of threads. When a :class:`tinyfasta.bgzf.GziIndex` is supplied
+    the reader supports seeking to uncompressed offsets, decompressing only
+    the blocks that are read.
+    """
+
+    def __init__(self, fpath, threads=None, index=None):
+        """Initialise an instance of the BgzfReader.
+
+        :param fpath: path to BGZF file, or binary file object reading it,
+                      which is left open when the reader is closed
+        :param threads: number of decompression threads, values less than two
+                        decompress the blocks in the reading thread
+        :param index: optional :class:`tinyfasta.bgzf.GziIndex`
+        """
+        io.RawIOBase.__init__(self)
+        self._pool = None
+        self._owns_fh = not hasattr(fpath, "read")
+        self._fh = open(fpath, "rb") if self._owns_fh else fpath
+        self._index = index
+        if threads is None:
+            threads = min(_DEFAULT_THREADS, os.cpu_count() or 1)
+        self._threads = threads
+        if threads > 1:
+            self._pool = _thread_pool(threads)
+        self._position = 0
+        self._start(0, 0)
+
+    def _start(self, compressed_offset, skip):
+        """Start decompressing blocks from a compressed offset."""
+        self._fh.seek(compressed_offset)
+        self._blocks = self._iter_blocks()
+        self._buffer = b""
+        self._buffer_pos = 0
+        while skip > 0:
+            data = next(self._blocks, b"")
+            if not data:
+                break
+            if skip < len(data):
+                self._buffer = data
+                self._buffer_pos = skip
+                break
+            skip -= len(data)
+
+    def _iter_blocks(self):
+        """Yield uncompressed blocks, decompressing ahead on the pool."""
+        if self._pool is None:
+            while True:
+                block = _read_block(self._fh)
+                if block is None:
+                    return
+                yield _decompress_block(block)
+        pending = collections.deque()
+        while True:
+            block = _read_block(self._fh)
+            if block is not None:
+                pending.append(self._pool.apply_async(_decompress_block,
+                                                      (block,)))
+            if not pending:
+                return
+            if block is None or len(pending) >= 2 * self._threads:
+                yield pending.popleft().get()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._index is not None
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Seek to an offset in the uncompressed data.
+
+        :raises: io.UnsupportedOperation if there is no index
+        """
+        if self._index is None:
+            raise io.UnsupportedOperation("seeking requires a .gzi index")
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("can only seek from the start")
+        self._start(*self._index.locate(offset))
+        self._position = offset
+        return offset
+
+    def readinto(self, b):
+        """Read uncompressed bytes into a pre-allocated buffer."""
+        while self._buffer_pos >= len(self._buffer):
+            self._buffer = next(self._blocks, None)
+            self._buffer_pos = 0
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        size = min(len(b), len(self._buffer) - self._buffer_pos)
+        b[:size] = self._buffer[self._buffer_pos:self._buffer_pos+size]
+        self._buffer_pos += size
+        self._position += size
+        return size
+
+    def close(self):
+        if not self.closed and hasattr(self, "_fh"):
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+            if self._owns_fh:
+                self._fh.close()
+        io.RawIOBase.close(self)
+
+
+class BgzfWriter(object):
+    """Binary file object writing BGZF compressed data.
+
+    Blocks can be compressed on a pool of threads, in which case several
+    blocks are collected before being compressed in one go.
+    """
+
+    def __init__(self, fpath, level=6, threads=1):
+        """Initialise an instance of the BgzfWriter.
+
+        :param fpath: path to the output file
+        :param level: zlib compression level
+        :param threads: number of compression threads, None to use one per
+                        CPU up to a maximum of four
+        """
+        self._pool = None
+        self._fh = open(fpath, "wb")
+        self._level = level
+        if threads is None:
+            threads = min(_DEFAULT_THREADS, os.cpu_count() or 1)
+        self._batch_size = _MAX_BLOCK_DATA
+        if threads > 1:
+            self._pool = _thread_pool(threads)
+            self._batch_size *= 4 * threads
+        self._pending = []
+        self._pending_size = 0
+        self.index = GziIndex()
+        self._compressed = 0
+        self._uncompressed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data):
+        """Write uncompressed bytes."""
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= self._batch_size:
+            self._flush_blocks(final=False)
+
+    def _flush_blocks(self, final):
+        """Compress the pending data into full blocks."""
+        data = b"".join(self._pending)
+        end = len(data) if final else len(data) - len(data) % _MAX_BLOCK_DATA
+        chunks = [data[pos:pos+_MAX_BLOCK_DATA]
+                  for pos in range(0, end, _MAX_BLOCK_DATA)]
+        if self._pool is not None and len(chunks) > 1:
+            blocks = self._pool.map(
+                functools.partial(_compress_block, level=self._level), chunks)
+        else:
+            blocks = [_compress_block(chunk, self._level) for chunk in chunks]
+        for chunk, block in zip(chunks, blocks):
+            if self._compressed:
+                self.index.add(self._compressed, self._uncompressed)
+            self._fh.write(block)
+            self._compressed += len(block)
+            self._uncompressed += len(chunk)
+        self._pending = [data[end:]] if end < len(data) else []
+        self._pending_size = len(data) - end
+
+    def close(self):
+        """Flush the remaining data, write the EOF block and close the file."""
+        if self._fh.closed:
+            return
+        self._flush_blocks(final=True)
+        self._fh.write(_BGZF_EOF)
+        self._fh.close()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+
+def open_fasta(fpath, threads=None, fileobj=None):
+    """Return a binary file object with the uncompressed content of a file.
+
+    Plain, gzip and BGZF compressed files are detected automatically. BGZF
+    files are decompressed on a pool of threads.
+
+    :param fpath: path to file
+    :param threads: number of threads used to decompress BGZF files
+    :param fileobj: binary file object, positioned at the start of fpath, to
+                    read the file through instead of opening it; it is left
+                    open when the returned object is closed, unless the file
+                    is uncompressed in which case fileobj itself is returned
+    :returns: binary file object
+    """
+    header = _peek(fpath)
+    if _is_bgzf_header(header):
+        return io.BufferedReader(
+            BgzfReader(fpath if fileobj is None else fileobj,
+                       threads=threads),
+            buffer_size=_MAX_BLOCK_DATA)
+    if header[:2] == GZIP_MAGIC:
+        if fileobj is not None:
+            return gzip.GzipFile(fileobj=fileobj, mode="rb")
+        return gzip.open(fpath, "rb")
+    return open(fpath, "rb") if fileobj is None else fileobj
@@ -0,0 +1,217 @@
+"""Persistent cache of summaries computed by scanning FASTA files.
+
+Scanning a large reference file to find its records, their lengths or their
+composition takes seconds to minutes, while the results only take up a few
+kilobytes. A :class:`tinyfasta.SummaryCache` stores these summaries in a JSON
+file, either next to the FASTA file or in a shared cache directory, together
+with the identity of the FASTA file they were computed from. A summary is
+only used while the file still has the same path, size and modification time,
+and optionally the same content hash.
+"""
+
+import hashlib
+import json
+import os
+
+_SUFFIX = ".summary"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(fpath):
+    """Return the hexadecimal BLAKE2b digest of the content of a file.
+
+    :param fpath: path to the file
+    :returns: str
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    buf = bytearray(_HASH_BLOCK_SIZE)
+    view = memoryview(buf)
+    with open(fpath, "rb") as fh:
+        while True:
+            size = fh.readinto(buf)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+class SummaryCache(object):
+    """Class for storing summaries of FASTA files between runs.
+
+    Each FASTA file has one cache entry, holding any number of summaries of
+    different kinds, e.g. the record spans used by the
+    :class:`tinyfasta.FastaParser`, the index entries used by the
+    :class:`tinyfasta.FastaIndex` and the statistics computed by the
+    :class:`tinyfasta.FastaStats`. Pass the same instance to each of them to
+    share the cache.
+
+    Without a cache directory the entry is written next to the FASTA file, in
+    a file with ``.summary`` appended to its name. With a cache directory the
+    least recently used entries are removed once the directory holds more
+    than ``max_size`` bytes of entries.
+    """
+
+    def __init__(self, cache_dir=None, max_size=256 * 1024 * 1024,
+                 content_hash=False):
+        """Initialise an instance of the SummaryCache class.
+
+        :param cache_dir: directory in which to keep the cache entries,
+                          created if it does not exist
+        :param max_size: maximum number of bytes of entries in the cache
+                         directory
+        :param content_hash: also check a hash of the file content, which
+                             detects changes that leave the size and
+                             modification time untouched at the cost of
+                             reading the whole file
+        """
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, fpath):
+        """Return the path to the cache entry of a FASTA file.
+
+        :param fpath: path to the FASTA file
+        :returns: str
+        """
+        if self.cache_dir is None:
+            return fpath + _SUFFIX
+        name = hashlib.blake2b(os.path.abspath(fpath).encode("utf-8"),
+                               digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, name + _SUFFIX)
+
+    def identity(self, fpath):
+        """Return the identity of a FASTA file used to validate its entry.
+
+        :param fpath: path to the FASTA file
+        :returns: dict
+        """
+        stat = os.stat(fpath)
+        identity = {
+            "path": os.path.abspath(fpath),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        if self.content_hash:
+            identity["blake2b"] = file_digest(fpath)
+        return identity
+
+    def _load(self, fpath, identity):
+        """Return the summaries of a valid cache entry, or None."""
+        entry_path = self.entry_path(fpath)
+        try:
+            with open(entry_path, "r") as fh:
+                entry = json.load(fh)
+        except (IOError, OSError, ValueError):
+            return None
+        # Entries stored with a content hash are valid for caches that do
+        # not check it, but not the other way round.
+        stored = entry.get("identity") or {}
+        if any(stored.get(key) != value for key, value in identity.items()):
+            return None
+        if self.cache_dir is not None:
+            # Mark the entry as recently used.
+            os.utime(entry_path)
+        return entry["summaries"]
+
+    def get(self, fpath, kind, identity=None):
+        """Return a cached summary of a FASTA file, or None.
+
+        Tuples stored in the summary are returned as lists.
+
+        :param fpath: path to the FASTA file
+        :param kind: name of the summary
+        :param identity: identity of the file, as returned by
+                         :func:`identity`, defaults to its current identity
+        :returns: summary or None
+        """
+        if identity is None:
+            identity = self.identity(fpath)
+        summaries = self._load(fpath, identity)
+        if summaries is None or kind not in summaries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return summaries[kind]
+
+    def put(self, fpath, kind, summary, identity=None):
+        """Store a summary of a FASTA file.
+
+        Other summaries of the file are kept if they are still valid. Pass
+        the identity taken before the summary was computed, so that a file
+        changed in the meantime does not get a stale summary.
+
+        :param fpath: path to the FASTA file
+        :param kind: name of the summary
+        :param summary: JSON serialisable summary
+        :param identity: identity of the file, as returned by
+                         :func:`identity`, defaults to its current identity
+        """
+        if identity is None:
+            identity = self.identity(fpath)
+        summaries = self._load(fpath, identity) or {}
+        summaries[kind] = summary
+        entry_path = self.entry_path(fpath)
+        tmp_path = "{}.{}.tmp".format(entry_path, os.getpid())
+        with open(tmp_path, "w") as fh:
+            json.dump({"identity": identity, "summaries": summaries}, fh,
+                      separators=(",", ":"))
+        os.replace(tmp_path, entry_path)
+        if self.cache_dir is not None:
+            self.evict()
+
+    def get_or_build(self, fpath, kind, build):
+        """Return a cached summary, building and storing it if required.
+
+        :param fpath: path to the FASTA file
+        :param kind: name of the summary
+        :param build: function taking no arguments and returning the summary
+        :returns: summary
+        """
+        identity = self.identity(fpath)
+        summary = self.get(fpath, kind, identity)
+        if summary is None:
+            summary = build()
+            self.put(fpath, kind, summary, identity)
+        return summary
+
+    def evict(self):
+        """Remove the least recently used entries from the cache directory
+        until it holds at most ``max_size`` bytes of entries."""
+        if self.cache_dir is None:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self, fpath=None):
+        """Remove the cache entry of a file, or all the entries in the cache
+        directory.
+
+        :param fpath: path to the FASTA file, defaults to all files
+        """
+        if fpath is not None:
+            paths = [self.entry_path(fpath)]
+        elif self.cache_dir is not None:
+            paths = [os.path.join(self.cache_dir, name)
+                     for name in os.listdir(self.cache_dir)
+                     if name.endswith(_SUFFIX)]
+        else:
+            paths = []
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
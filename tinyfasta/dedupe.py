@@ -0,0 +1,213 @@
+"""Removal of duplicate sequences from streams of FASTA records.
+
+Sequences are compared using fixed size digests of their content, so the
+memory needed per distinct sequence does not depend on its length. When the
+digests no longer fit in the memory budget the remaining records are spilled
+to hash partitions on disk, each of which is deduplicated in a second pass.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+from tinyfasta import FastaParser
+from tinyfasta.alphabet import reverse_complement
+
+DIGEST_SIZE = 16
+
+#: Separator used by the NCBI non-redundant databases for merged headers.
+HEADER_SEPARATOR = "\x01"
+
+# Approximate number of bytes used by a digest held in a Python set.
+_DIGEST_COST = 100
+
+
+def sequence_digest(sequence, canonical=False):
+    """Return a fixed size digest of a sequence.
+
+    :param sequence: sequence string
+    :param canonical: give a sequence and its reverse complement the same
+                      digest
+    :returns: bytes
+    """
+    if canonical:
+        sequence = min(sequence, reverse_complement(sequence))
+    return hashlib.blake2b(sequence.encode("utf-8"),
+                           digest_size=DIGEST_SIZE).digest()
+
+
+class Deduplicator(object):
+    """Class for removing records with duplicate sequences.
+
+    By default the first record with each sequence is kept, and yielded as
+    soon as it is read. With ``merge_headers`` the descriptions of all the
+    records with the same sequence are joined into the description of the
+    first one, so the records are only yielded once all of them have been
+    read.
+
+    The order of the records is preserved as long as the memory budget is
+    not exceeded. Otherwise the records read after that point are yielded
+    grouped by hash partition, in the order they were read within each
+    partition. Each partition is deduplicated in memory, so increase the
+    number of partitions for inputs many times larger than the budget.
+    """
+
+    def __init__(self, canonical=False, merge_headers=False,
+                 memory_budget=256 * 1024 * 1024, partitions=64, tmp_dir=None,
+                 separator=HEADER_SEPARATOR):
+        """Initialise an instance of the Deduplicator class.
+
+        :param canonical: treat a sequence and its reverse complement as
+                          duplicates
+        :param merge_headers: merge the descriptions of duplicate records
+        :param memory_budget: approximate number of bytes to use for the
+                              records and digests held in memory
+        :param partitions: number of hash partitions to spill to
+        :param tmp_dir: directory in which to create the partition files
+        :param separator: string joining merged descriptions
+        """
+        self.canonical = canonical
+        self.merge_headers = merge_headers
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.tmp_dir = tmp_dir
+        self.separator = separator
+        self.num_records = 0
+        self.num_unique = 0
+        self.spilled = False
+
+    def unique(self, fasta_records):
+        """Yield the records with unique sequences.
+
+        :param fasta_records: iterable of :class:`tinyfasta.FastaRecord`
+                              instances, e.g. a :class:`tinyfasta.FastaParser`
+        """
+        self.num_records = 0
+        self.num_unique = 0
+        self.spilled = False
+        fasta_records = iter(fasta_records)
+        if self.merge_headers:
+            groups = {}
+            size = 0
+            for fasta_record in self._count(fasta_records):
+                digest = self._digest(fasta_record)
+                size += _DIGEST_COST + self._merge(groups, digest,
+                                                   fasta_record)
+                if size > self.memory_budget:
+                    break
+            else:
+                self.num_unique = len(groups)
+                for fasta_record in groups.values():
+                    yield fasta_record
+                return
+            spill = list(groups.items())
+            groups = None
+        else:
+            seen = set()
+            for fasta_record in self._count(fasta_records):
+                digest = self._digest(fasta_record)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                self.num_unique += 1
+                yield fasta_record
+                if len(seen) * _DIGEST_COST > self.memory_budget:
+                    break
+            else:
+                return
+            spill = [(digest, None) for digest in seen]
+            seen = None
+        for fasta_record in self._spill(spill, fasta_records):
+            self.num_unique += 1
+            yield fasta_record
+
+    def _count(self, fasta_records):
+        """Yield the records, counting them."""
+        for fasta_record in fasta_records:
+            self.num_records += 1
+            yield fasta_record
+
+    def _digest(self, fasta_record):
+        """Return the digest of the sequence of a record."""
+        return sequence_digest(str(fasta_record.sequence), self.canonical)
+
+    def _merge(self, groups, digest, fasta_record):
+        """Add a record to the groups of records with merged descriptions."""
+        first = groups.get(digest)
+        if first is None:
+            groups[digest] = fasta_record
+            return len(fasta_record) + len(str(fasta_record.description))
+        description = str(fasta_record.description)[1:]
+        first.description.update("{}{}{}".format(
+            str(first.description), self.separator, description))
+        return len(description)
+
+    def _spill(self, spilled, fasta_records):
+        """Yield unique records using hash partitions on disk.
+
+        :param spilled: list of (digest, fasta_record) tuples held in memory
+                        when the budget was exceeded; the records are None if
+                        they have already been yielded
+        :param fasta_records: iterator over the remaining records
+        """
+        self.spilled = True
+        work_dir = tempfile.mkdtemp(dir=self.tmp_dir)
+        try:
+            seen_paths = [os.path.join(work_dir, "{}.seen".format(i))
+                          for i in range(self.partitions)]
+            record_paths = [os.path.join(work_dir, "{}.fasta".format(i))
+                            for i in range(self.partitions)]
+            seen_files = [open(p, "wb") for p in seen_paths]
+            record_files = [open(p, "w", encoding="utf-8")
+                            for p in record_paths]
+            try:
+                for digest, fasta_record in spilled:
+                    i = self._partition(digest)
+                    if fasta_record is None:
+                        seen_files[i].write(digest)
+                    else:
+                        self._write(record_files[i], fasta_record)
+                del spilled[:]
+                for fasta_record in self._count(fasta_records):
+                    digest = self._digest(fasta_record)
+                    self._write(record_files[self._partition(digest)],
+                                fasta_record)
+            finally:
+                for fh in seen_files + record_files:
+                    fh.close()
+            for seen_path, record_path in zip(seen_paths, record_paths):
+                for fasta_record in self._unique_in_partition(seen_path,
+                                                              record_path):
+                    yield fasta_record
+        finally:
+            shutil.rmtree(work_dir)
+
+    def _partition(self, digest):
+        """Return the partition number of a digest."""
+        return int.from_bytes(digest[:4], "big") % self.partitions
+
+    @staticmethod
+    def _write(fh, fasta_record):
+        """Write a record, with its sequence on a single line."""
+        fh.write("{}\n{}\n".format(fasta_record.description,
+                                   fasta_record.sequence))
+
+    def _unique_in_partition(self, seen_path, record_path):
+        """Yield the unique records of a partition."""
+        with open(seen_path, "rb") as fh:
+            data = fh.read()
+        seen = set(data[i:i+DIGEST_SIZE]
+                   for i in range(0, len(data), DIGEST_SIZE))
+        if os.path.getsize(record_path) == 0:
+            return
+        groups = {}
+        for fasta_record in FastaParser(record_path, use_mmap=True):
+            digest = self._digest(fasta_record)
+            if self.merge_headers:
+                self._merge(groups, digest, fasta_record)
+            elif digest not in seen:
+                seen.add(digest)
+                yield fasta_record
+        for fasta_record in groups.values():
+            yield fasta_record
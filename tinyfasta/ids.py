@@ -0,0 +1,211 @@
+"""Lookup of FASTA records by the identifiers in their description lines.
+
+The identifiers are pulled out of the description lines by a tokenizer and
+written, together with the byte span of each record, to a sorted text file.
+Identifiers are looked up by binary search in the memory mapped file, so the
+index never needs to be loaded into memory as a whole.
+"""
+
+import os
+
+from tinyfasta import _ENCODING, _map_file, _records_from_bytes
+from tinyfasta._blocks import iter_raw_records
+from tinyfasta.bgzf import is_gzip
+
+
+def make_tokenizer(delimiter=None, field=0):
+    """Return function that extracts the identifier from a description.
+
+    Without a delimiter the description is split into whitespace separated
+    fields. With a delimiter, e.g. "|" for descriptions such as
+    ``>sp|P69905|HBA_HUMAN Hemoglobin``, the first word of the description is
+    split on the delimiter.
+
+    :param delimiter: string separating the fields of the first word
+    :param field: zero-based index of the field holding the identifier
+    :returns: function mapping a description string to an identifier string
+    """
+    def tokenizer(description):
+        fields = description.lstrip(">").split(None, 1 if delimiter else -1)
+        if delimiter and fields:
+            fields = fields[0].split(delimiter)
+        try:
+            return fields[field]
+        except IndexError:
+            return ""
+    return tokenizer
+
+
+def build_id_entries(fh, tokenizer):
+    """Return list of (identifier, offset, length) tuples sorted by identifier.
+
+    :param fh: binary file handle positioned at the start of a FASTA file
+    :param tokenizer: function mapping a description string to an identifier
+    :returns: list of tuples
+    :raises: ValueError if an identifier occurs more than once or contains
+             white space
+    """
+    entries = []
+    for offset, sequence_offset, header, body in iter_raw_records(fh):
+        identifier = tokenizer(header.decode(_ENCODING))
+        if identifier.split() != [identifier]:
+            raise ValueError(
+                "Invalid identifier '{}' extracted from '{}'".format(
+                    identifier, header.decode(_ENCODING)))
+        entries.append((identifier.encode(_ENCODING), offset,
+                        sequence_offset + len(body) - offset))
+    entries.sort()
+    for previous, entry in zip(entries, entries[1:]):
+        if previous[0] == entry[0]:
+            raise ValueError("Duplicate identifier '{}'".format(
+                entry[0].decode(_ENCODING)))
+    return entries
+
+
+def write_id_entries(index_path, entries):
+    """Write sorted (identifier, offset, length) tuples to an index file.
+
+    :param index_path: path to the index file
+    :param entries: iterable of tuples sorted by identifier
+    """
+    with open(index_path, "wb") as fh:
+        for identifier, offset, length in entries:
+            fh.write(b"%s\t%d\t%d\n" % (identifier, offset, length))
+
+
+class IdIndex(object):
+    """Class for fetching FASTA records by identifier.
+
+    The index is stored as a tab separated file, sorted by identifier, next
+    to the FASTA file. If the index file does not exist, or if it is older
+    than the FASTA file, it is built when the :class:`tinyfasta.IdIndex` is
+    created. An index built with one tokenizer is not rebuilt when another
+    tokenizer is used, so use a separate ``index_path`` for each tokenizer.
+    """
+
+    def __init__(self, fpath, index_path=None, tokenizer=None):
+        """Initialise an instance of the IdIndex class.
+
+        :param fpath: path to the uncompressed FASTA file
+        :param index_path: path to the index file, defaults to fpath with
+                           ``.idx`` appended to it
+        :param tokenizer: function mapping a description string to an
+                          identifier, see :func:`tinyfasta.ids.make_tokenizer`,
+                          defaults to the first word of the description
+        """
+        if is_gzip(fpath):
+            raise ValueError(
+                "Cannot build identifier index for compressed file "
+                "'{}'".format(fpath))
+        self.fpath = fpath
+        if index_path is None:
+            index_path = fpath + ".idx"
+        self.index_path = index_path
+        if tokenizer is None:
+            tokenizer = make_tokenizer()
+        if not self._is_current(index_path):
+            with open(fpath, "rb") as fh:
+                entries = build_id_entries(fh, tokenizer)
+            write_id_entries(index_path, entries)
+        self._fh = open(index_path, "rb")
+        self._mapped = _map_file(self._fh)
+        self._fasta_fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, identifier):
+        return self._find(identifier) is not None
+
+    def __getitem__(self, identifier):
+        """Return the :class:`tinyfasta.FastaRecord` with the identifier."""
+        return self.fetch(identifier)
+
+    def _is_current(self, index_path):
+        """Return True if the index file exists and is up to date."""
+        if not os.path.isfile(index_path):
+            return False
+        return os.path.getmtime(index_path) >= os.path.getmtime(self.fpath)
+
+    def _find(self, identifier):
+        """Return (offset, length) of the record with the identifier or None."""
+        mapped = self._mapped
+        if mapped is None:
+            return None
+        key = identifier.encode(_ENCODING)
+        lo, hi = 0, len(mapped)
+        # Binary search over byte positions, keeping lo at the start of a
+        # line, for the first line whose identifier is not less than key.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = max(lo, mapped.rfind(b"\n", lo, mid) + 1)
+            if mapped[start:mapped.find(b"\t", start)] < key:
+                lo = mapped.find(b"\n", start) + 1
+            else:
+                hi = start
+        if lo >= len(mapped):
+            return None
+        end = mapped.find(b"\n", lo)
+        fields = mapped[lo:end].split(b"\t")
+        if fields[0] != key:
+            return None
+        return int(fields[1]), int(fields[2])
+
+    def close(self):
+        """Close the index and FASTA files."""
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        self._fh.close()
+        if self._fasta_fh is not None:
+            self._fasta_fh.close()
+            self._fasta_fh = None
+
+    def locate(self, identifier):
+        """Return (offset, length) of the record with the identifier.
+
+        :param identifier: identifier of the record
+        :returns: tuple
+        :raises: KeyError if there is no record with the identifier
+        """
+        span = self._find(identifier)
+        if span is None:
+            raise KeyError(identifier)
+        return span
+
+    def _read(self, offset, size):
+        """Return size bytes read from the FASTA file at offset."""
+        if self._fasta_fh is None:
+            self._fasta_fh = open(self.fpath, "rb")
+        if self._fasta_fh.tell() != offset:
+            self._fasta_fh.seek(offset)
+        return self._fasta_fh.read(size)
+
+    def fetch(self, identifier):
+        """Return the :class:`tinyfasta.FastaRecord` with the identifier.
+
+        :param identifier: identifier of the record
+        :returns: :class:`tinyfasta.FastaRecord`
+        :raises: KeyError if there is no record with the identifier
+        """
+        offset, length = self.locate(identifier)
+        return next(_records_from_bytes(self._read(offset, length)))
+
+    def fetch_many(self, identifiers):
+        """Yield the :class:`tinyfasta.FastaRecord` instances with the
+        identifiers.
+
+        All the identifiers are looked up first. The records are then read in
+        the order in which they occur in the FASTA file, so that the file is
+        read in a single forward sweep, and yielded in that order.
+
+        :param identifiers: iterable of identifiers
+        :raises: KeyError if there is no record with one of the identifiers
+        """
+        spans = sorted(set(self.locate(identifier)
+                           for identifier in identifiers))
+        for offset, length in spans:
+            yield next(_records_from_bytes(self._read(offset, length)))
@@ -0,0 +1,285 @@
+"""Random access to FASTA records using samtools compatible ``.fai`` files."""
+
+import collections
+import io
+import os
+
+from tinyfasta import FastaRecord, Sequence
+from tinyfasta._blocks import iter_raw_records, line_layout, record_name
+from tinyfasta.bgzf import BgzfReader, GziIndex, is_bgzf, is_gzip, open_fasta
+
+FaiEntry = collections.namedtuple("FaiEntry",
+    ["name", "length", "offset", "line_bases", "line_width"])
+
+
+def parse_region(region, length):
+    """Return (name, start, end) tuple from a region string.
+
+    Regions are written in the samtools style, i.e. ``name``,
+    ``name:start`` or ``name:start-end``, where the coordinates are
+    one-based and inclusive. The returned coordinates are zero-based and
+    half-open.
+
+    :param region: region string
+    :param length: function returning the sequence length of a named record,
+                   raising KeyError for unknown names
+    :returns: tuple
+    :raises: KeyError if the region refers to an unknown record
+    """
+    try:
+        return region, 0, length(region)
+    except KeyError:
+        pass
+    name, _, interval = region.rpartition(":")
+    try:
+        sequence_length = length(name)
+    except KeyError:
+        raise KeyError(region)
+    start, _, end = interval.replace(",", "").partition("-")
+    start = max(int(start) - 1, 0) if start else 0
+    end = min(int(end), sequence_length) if end else sequence_length
+    return name, start, max(start, end)
+
+
+def build_fai_entries(fh):
+    """Return list of :class:`tinyfasta.index.FaiEntry` instances.
+
+    :param fh: binary file handle positioned at the start of a FASTA file
+    :returns: list of :class:`tinyfasta.index.FaiEntry` instances
+    :raises: ValueError if a record has lines of different lengths
+    """
+    entries = []
+    for offset, sequence_offset, header, body in iter_raw_records(fh):
+        name = record_name(header)
+        layout = line_layout(body)
+        if layout is None:
+            raise ValueError(
+                "Cannot index record '{}': its sequence lines are of "
+                "different lengths".format(name))
+        length, line_bases, line_width = layout
+        entries.append(FaiEntry(name, length, sequence_offset,
+                                line_bases, line_width))
+    return entries
+
+
+def read_fai(index_path):
+    """Return list of :class:`tinyfasta.index.FaiEntry` read from a file.
+
+    :param index_path: path to ``.fai`` file
+    :returns: list of :class:`tinyfasta.index.FaiEntry` instances
+    """
+    entries = []
+    with open(index_path, "r") as fh:
+        for line in fh:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 5:
+                continue
+            entries.append(FaiEntry(fields[0], *[int(f) for f in fields[1:5]]))
+    return entries
+
+
+def write_fai(index_path, entries):
+    """Write :class:`tinyfasta.index.FaiEntry` instances to a ``.fai`` file.
+
+    :param index_path: path to ``.fai`` file
+    :param entries: iterable of :class:`tinyfasta.index.FaiEntry` instances
+    """
+    with open(index_path, "w") as fh:
+        for entry in entries:
+            fh.write("\t".join(str(f) for f in entry) + "\n")
+
+
+class FastaIndex(object):
+    """Class for random access to the records in a FASTA file.
+
+    The index is stored in a samtools compatible ``.fai`` file next to the
+    FASTA file. If the index file does not exist, or if it is older than the
+    FASTA file, it is built and written out when the
+    :class:`tinyfasta.FastaIndex` is created.
+
+    BGZF compressed files are supported. For these a ``.gzi`` file recording
+    the offsets of the compressed blocks is also kept next to the FASTA file,
+    so that fetching a region only decompresses the blocks it spans.
+
+    Given a :class:`tinyfasta.SummaryCache`, the index entries are kept in the
+    cache instead of in the ``.fai`` file, e.g. for files in read only
+    directories.
+    """
+
+    def __init__(self, fpath, index_path=None, cache=None):
+        """Initialise an instance of the FastaIndex.
+
+        :param fpath: path to the FASTA file
+        :param index_path: path to the ``.fai`` file, defaults to fpath with
+                           ``.fai`` appended to it
+        :param cache: :class:`tinyfasta.SummaryCache` in which to keep the
+                      index entries
+        """
+        self.fpath = fpath
+        if index_path is None:
+            index_path = fpath + ".fai"
+        self.index_path = index_path
+        self._fh = None
+        self._gzi = None
+        if is_bgzf(fpath):
+            self._gzi = self._load_gzi()
+        elif is_gzip(fpath):
+            raise ValueError(
+                "Cannot index '{}': random access requires BGZF rather than "
+                "plain gzip compression, use bgzip to recompress it".format(
+                    fpath))
+        if cache is not None:
+            entries = [FaiEntry(*entry)
+                       for entry in cache.get_or_build(fpath, "fai",
+                                                       self._build)]
+        elif self._is_current(index_path):
+            entries = read_fai(index_path)
+        else:
+            entries = self._build()
+            write_fai(index_path, entries)
+        self._entries = collections.OrderedDict((e.name, e) for e in entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """Return the number of records in the index."""
+        return len(self._entries)
+
+    def __iter__(self):
+        """Yield the names of the records in the index."""
+        return iter(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __getitem__(self, name):
+        """Return the named :class:`tinyfasta.FastaRecord`."""
+        return self.fetch(name)
+
+    @property
+    def entries(self):
+        """List of :class:`tinyfasta.index.FaiEntry` instances."""
+        return list(self._entries.values())
+
+    def _is_current(self, index_path):
+        """Return True if the index file exists and is up to date."""
+        if not os.path.isfile(index_path):
+            return False
+        return os.path.getmtime(index_path) >= os.path.getmtime(self.fpath)
+
+    def _load_gzi(self):
+        """Return the BGZF block index, building it if required."""
+        gzi_path = self.fpath + ".gzi"
+        if self._is_current(gzi_path):
+            return GziIndex.read(gzi_path)
+        gzi = GziIndex.build(self.fpath)
+        gzi.write(gzi_path)
+        return gzi
+
+    def _build(self):
+        """Return list of index entries built by scanning the FASTA file."""
+        with open_fasta(self.fpath) as fh:
+            entries = build_fai_entries(fh)
+        names = set()
+        for entry in entries:
+            if entry.name in names:
+                raise ValueError(
+                    "Cannot index '{}': duplicate record name '{}'".format(
+                        self.fpath, entry.name))
+            names.add(entry.name)
+        return entries
+
+    def _read(self, offset, size):
+        """Return size bytes read from the FASTA file at offset."""
+        if self._fh is None:
+            if self._gzi is None:
+                self._fh = open(self.fpath, "rb")
+            else:
+                self._fh = io.BufferedReader(
+                    BgzfReader(self.fpath, threads=0, index=self._gzi))
+        self._fh.seek(offset)
+        return self._fh.read(size)
+
+    def close(self):
+        """Close the file handle used to read the FASTA file."""
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def entry(self, name):
+        """Return the :class:`tinyfasta.index.FaiEntry` of a record.
+
+        :param name: name of the record
+        :returns: :class:`tinyfasta.index.FaiEntry`
+        :raises: KeyError if there is no record with that name
+        """
+        return self._entries[name]
+
+    def parse_region(self, region):
+        """Return (name, start, end) tuple from a region string.
+
+        See :func:`tinyfasta.index.parse_region`.
+
+        :param region: region string
+        :returns: tuple
+        :raises: KeyError if the region refers to an unknown record
+        """
+        return parse_region(region, self.length)
+
+    def length(self, name):
+        """Return the length of the sequence of a record.
+
+        :param name: name of the record
+        :returns: int
+        """
+        return self._entries[name].length
+
+    def sequence(self, name, start=0, end=None):
+        """Return a :class:`tinyfasta.Sequence` read straight from the file.
+
+        Only the bytes spanning the requested part of the sequence are read.
+
+        :param name: name of the record
+        :param start: zero-based start coordinate
+        :param end: zero-based end coordinate (exclusive), defaults to the end
+                    of the sequence
+        :returns: :class:`tinyfasta.Sequence`
+        """
+        entry = self._entries[name]
+        if end is None or end > entry.length:
+            end = entry.length
+        sequence = Sequence()
+        if start >= end:
+            return sequence
+        first = self._byte_offset(entry, start)
+        last = self._byte_offset(entry, end - 1)
+        data = self._read(first, last - first + 1)
+        data = data.replace(b"\n", b"").replace(b"\r", b"")
+        sequence.add_sequence_line(data.decode("utf-8"))
+        if entry.line_bases:
+            sequence.format_line_length(entry.line_bases)
+        return sequence
+
+    def fetch(self, region):
+        """Return a :class:`tinyfasta.FastaRecord` for a record or region.
+
+        When fetching a whole record the description is the record name,
+        otherwise it is the region string.
+
+        :param region: record name or samtools style region string
+        :returns: :class:`tinyfasta.FastaRecord`
+        """
+        name, start, end = self.parse_region(region)
+        fasta_record = FastaRecord(region)
+        fasta_record.sequence = self.sequence(name, start, end)
+        return fasta_record
+
+    @staticmethod
+    def _byte_offset(entry, position):
+        """Return the file offset of a zero-based sequence position."""
+        lines, column = divmod(position, entry.line_bases)
+        return entry.offset + lines * entry.line_width + column
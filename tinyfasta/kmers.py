@@ -0,0 +1,631 @@
+"""K-mer counting and a persistent k-mer index of nucleotide sequences.
+
+The :class:`tinyfasta.KmerCounter` class counts the k-mers of a stream of
+records, either exactly or approximately in a fixed amount of memory.
+
+The :class:`tinyfasta.KmerIndex` class maps each k-mer in a FASTA file to the
+records, and the positions within them, where it occurs. It is written to a
+single binary file that is memory mapped when the index is opened, so that
+queries only touch the parts of the index they need.
+
+K-mers are encoded as integers using two bits per base, so k is at most 32.
+"""
+
+import array
+import collections
+import importlib.util
+import mmap
+import os
+import re
+import struct
+import sys
+
+from tinyfasta import _map_file, _read_chunk, _records_from_bytes
+from tinyfasta._blocks import iter_raw_records, record_spans
+from tinyfasta.bgzf import is_gzip, open_fasta
+
+MAGIC = b"TFKI"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sIIcxxxQQQ")
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+# NumPy takes far longer to import than tinyfasta, so the functions that use
+# it only import it when they are called.
+_HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+_RADIX_BITS = 16
+
+_ENCODE = bytes.maketrans(b"ACGT", b"\x00\x01\x02\x03")
+_ACGT_RUNS = re.compile(b"[ACGT]+")
+
+
+def _kmer_codes(sequence, k):
+    """Yield (position, code) of the k-mers of an upper case sequence.
+
+    K-mers spanning bases other than A, C, G and T are skipped.
+
+    :param sequence: upper case sequence as bytes
+    :param k: k-mer length
+    """
+    mask = (1 << (2 * k)) - 1
+    for run in _ACGT_RUNS.finditer(sequence):
+        start, end = run.span()
+        if end - start < k:
+            continue
+        code = 0
+        for i, value in enumerate(sequence[start:end].translate(_ENCODE)):
+            code = ((code << 2) | value) & mask
+            if i >= k - 1:
+                yield start + i - k + 1, code
+
+
+def _kmer_code(kmer):
+    """Return the code of a k-mer or None if it is not made up of ACGT."""
+    if not _ACGT_RUNS.fullmatch(kmer):
+        return None
+    code = 0
+    for value in kmer.translate(_ENCODE):
+        code = (code << 2) | value
+    return code
+
+
+def _rolling_codes(sequence, k, canonical):
+    """Yield the codes of the k-mers of an upper case sequence.
+
+    The forward code, and the code of the reverse complement if canonical is
+    True, are updated by one base at a time. K-mers spanning bases other
+    than A, C, G and T are skipped.
+
+    :param sequence: upper case sequence as bytes
+    :param k: k-mer length
+    :param canonical: yield the smaller of the codes of each k-mer and its
+                      reverse complement
+    """
+    mask = (1 << (2 * k)) - 1
+    shift = 2 * (k - 1)
+    for run in _ACGT_RUNS.finditer(sequence):
+        start, end = run.span()
+        if end - start < k:
+            continue
+        code = reverse = 0
+        for i, value in enumerate(sequence[start:end].translate(_ENCODE)):
+            code = ((code << 2) | value) & mask
+            if canonical:
+                reverse = (reverse >> 2) | ((3 - value) << shift)
+            if i >= k - 1:
+                yield min(code, reverse) if canonical else code
+
+
+def _numpy_codes(sequence, k, canonical):
+    """Return numpy array of the codes of the k-mers of a sequence.
+
+    Vectorised equivalent of :func:`_rolling_codes`.
+    """
+    import numpy
+    arrays = []
+    for run in _ACGT_RUNS.finditer(sequence):
+        start, end = run.span()
+        num_kmers = end - start - k + 1
+        if num_kmers < 1:
+            continue
+        values = numpy.frombuffer(sequence[start:end].translate(_ENCODE),
+                                  dtype=numpy.uint8).astype(numpy.uint64)
+        codes = numpy.zeros(num_kmers, dtype=numpy.uint64)
+        for j in range(k):
+            codes |= values[j:j+num_kmers] << numpy.uint64(2 * (k - 1 - j))
+        if canonical:
+            complement = numpy.uint64(3) - values
+            reverse = numpy.zeros(num_kmers, dtype=numpy.uint64)
+            for j in range(k):
+                reverse |= complement[j:j+num_kmers] << numpy.uint64(2 * j)
+            codes = numpy.minimum(codes, reverse)
+        arrays.append(codes)
+    if not arrays:
+        return numpy.zeros(0, dtype=numpy.uint64)
+    return numpy.concatenate(arrays)
+
+
+def _reverse_complement_code(code, k):
+    """Return the code of the reverse complement of a k-mer."""
+    reverse = 0
+    for _ in range(k):
+        reverse = (reverse << 2) | (3 - (code & 3))
+        code >>= 2
+    return reverse
+
+
+def _decode(code, k):
+    """Return the k-mer string of a code."""
+    return "".join("ACGT"[(code >> (2 * (k - 1 - i))) & 3] for i in range(k))
+
+
+def _bisect(values, x, lo, hi):
+    """Return index of x in the sorted slice values[lo:hi] or -1."""
+    end = hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo if lo < end and values[lo] == x else -1
+
+
+def _radix_order(codes, bits):
+    """Return array of the indices that sort the codes, in a stable order.
+
+    A least significant digit radix sort over arrays, so that no Python
+    object is kept per k-mer.
+
+    :param codes: array of k-mer codes
+    :param bits: number of bits used by the codes
+    :returns: :class:`array.array`
+    """
+    mask = (1 << _RADIX_BITS) - 1
+    order = array.array("Q", range(len(codes)))
+    for shift in range(0, bits, _RADIX_BITS):
+        counts = array.array("Q", [0]) * (mask + 2)
+        for code in codes:
+            counts[((code >> shift) & mask) + 1] += 1
+        for digit in range(1, mask + 2):
+            counts[digit] += counts[digit - 1]
+        sorted_order = array.array("Q", [0]) * len(codes)
+        for i in order:
+            digit = (codes[i] >> shift) & mask
+            sorted_order[counts[digit]] = i
+            counts[digit] += 1
+        order = sorted_order
+    return order
+
+
+def _group_postings(codes, keys, k, use_numpy):
+    """Return (kmers, starts, postings) arrays grouping the keys by k-mer.
+
+    The sort is stable, which keeps the postings of each k-mer in (record,
+    position) order as the queries rely on.
+    """
+    if use_numpy and codes:
+        import numpy
+        codes = numpy.frombuffer(codes, dtype=numpy.uint64)
+        order = numpy.argsort(codes, kind="stable")
+        kmers, starts = numpy.unique(codes[order], return_index=True)
+        postings = numpy.frombuffer(keys, dtype=numpy.uint64)[order]
+        starts = numpy.append(starts, len(postings)).astype(numpy.uint64)
+        return kmers, starts, postings
+    kmers = array.array("Q")
+    starts = array.array("Q")
+    postings = array.array("Q")
+    for i in _radix_order(codes, 2 * k):
+        code = codes[i]
+        if not kmers or kmers[-1] != code:
+            kmers.append(code)
+            starts.append(len(postings))
+        postings.append(keys[i])
+    starts.append(len(postings))
+    return kmers, starts, postings
+
+
+def build_kmer_index(index_path, fpath, k, use_numpy=None):
+    """Scan a FASTA file and write a k-mer index for it.
+
+    :param index_path: path to the index file
+    :param fpath: path to the uncompressed FASTA file
+    :param k: k-mer length, at most 32
+    :param use_numpy: sort the k-mers using NumPy, defaults to True if NumPy
+                      is installed
+    """
+    if use_numpy is None:
+        use_numpy = _HAVE_NUMPY
+    if use_numpy and not _HAVE_NUMPY:
+        raise ImportError("NumPy is required when use_numpy is True")
+    spans = array.array("Q")
+    codes = array.array("Q")
+    keys = array.array("Q")
+    with open(fpath, "rb") as fh:
+        mapped = _map_file(fh)
+        try:
+            if mapped is not None:
+                for record_id, span in enumerate(record_spans(mapped)):
+                    spans.extend(span)
+                    body = mapped[span[1]:span[2]]
+                    sequence = body.translate(None, b"\r\n").upper()
+                    for position, code in _kmer_codes(sequence, k):
+                        codes.append(code)
+                        keys.append((record_id << 32) | position)
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+    kmers, starts, postings = _group_postings(codes, keys, k, use_numpy)
+    with open(index_path, "wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, VERSION, k, _BYTE_ORDER,
+                              len(spans) // 3, len(kmers), len(postings)))
+        for values in (spans, kmers, starts, postings):
+            values.tofile(fh)
+
+
+class KmerIndex(object):
+    """Class for finding the records that contain a short sequence.
+
+    The index is stored next to the FASTA file, in a file with ``.kmi``
+    appended to its name. If the index file does not exist, or if it is older
+    than the FASTA file, it is built when the :class:`tinyfasta.KmerIndex` is
+    created.
+
+    A query is split into k-mers, which are looked up in the index to find
+    the records, and offsets, at which all of them occur in the right order.
+    Only these candidate records are read from the FASTA file and confirmed
+    using :func:`tinyfasta.Sequence.contains`, so the time taken by a query
+    depends on the number of hits rather than on the size of the file.
+    """
+
+    def __init__(self, fpath, index_path=None, k=12):
+        """Initialise an instance of the KmerIndex class.
+
+        :param fpath: path to the uncompressed FASTA file
+        :param index_path: path to the index file, defaults to fpath with
+                           ``.kmi`` appended to it
+        :param k: k-mer length used when building the index, at most 32
+        """
+        if not 0 < k <= 32:
+            raise ValueError("The k-mer length must be between 1 and 32")
+        if is_gzip(fpath):
+            raise ValueError(
+                "Cannot build k-mer index for compressed file '{}'".format(
+                    fpath))
+        self.fpath = fpath
+        if index_path is None:
+            index_path = fpath + ".kmi"
+        self.index_path = index_path
+        if not self._is_current(index_path, k):
+            build_kmer_index(index_path, fpath, k)
+        self._fh = open(index_path, "rb")
+        self._mapped = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, self.k, _, num_records, num_kmers, num_postings = \
+            _HEADER.unpack(self._mapped[:_HEADER.size])
+        view = memoryview(self._mapped)[_HEADER.size:].cast("Q")
+        sizes = [3 * num_records, num_kmers, num_kmers + 1, num_postings]
+        self._views = [view]
+        pos = 0
+        for size in sizes:
+            self._views.append(view[pos:pos+size])
+            pos += size
+        _, self._spans, self._kmers, self._starts, self._postings = \
+            self._views
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """Return the number of records in the index."""
+        return len(self._spans) // 3
+
+    def _is_current(self, index_path, k):
+        """Return True if the index file exists, is up to date and usable."""
+        if not os.path.isfile(index_path):
+            return False
+        if os.path.getmtime(index_path) < os.path.getmtime(self.fpath):
+            return False
+        with open(index_path, "rb") as fh:
+            header = fh.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return False
+        magic, version, index_k, byte_order = _HEADER.unpack(header)[:4]
+        return (magic, version, index_k, byte_order) == (
+            MAGIC, VERSION, k, _BYTE_ORDER)
+
+    def close(self):
+        """Close the index file."""
+        if self._fh.closed:
+            return
+        for view in reversed(self._views):
+            view.release()
+        self._mapped.close()
+        self._fh.close()
+
+    def positions(self, kmer):
+        """Return list of (record_number, position) tuples of a k-mer.
+
+        The record numbers count the records in the FASTA file from zero.
+
+        :param kmer: string of length k
+        :returns: list of tuples
+        """
+        return [(key >> 32, key & 0xFFFFFFFF)
+                for key in self._postings[slice(*self._posting_range(kmer))]]
+
+    def _posting_range(self, kmer):
+        """Return (start, end) of the postings of a k-mer."""
+        if len(kmer) != self.k:
+            raise ValueError("Expected a k-mer of length {}".format(self.k))
+        code = _kmer_code(kmer.upper().encode("ascii", "replace"))
+        i = -1 if code is None else _bisect(self._kmers, code, 0,
+                                            len(self._kmers))
+        if i == -1:
+            return 0, 0
+        return self._starts[i], self._starts[i+1]
+
+    def candidates(self, query):
+        """Return sorted list of record numbers that may contain the query.
+
+        Records are only excluded if they cannot contain the query. If the
+        query is shorter than k, or made up of characters other than A, C, G
+        and T, all records are candidates.
+
+        :param query: nucleotide string
+        :returns: list of int
+        """
+        query = query.upper()
+        k = self.k
+        offsets = list(range(0, len(query) - k + 1, k))
+        if offsets and offsets[-1] != len(query) - k:
+            offsets.append(len(query) - k)
+        ranges = []
+        for offset in offsets:
+            kmer = query[offset:offset+k]
+            if _kmer_code(kmer.encode("ascii", "replace")) is not None:
+                ranges.append((self._posting_range(kmer), offset))
+        if not ranges:
+            return list(range(len(self)))
+
+        # Start from the rarest k-mer and check that every other k-mer occurs
+        # at the matching position of each candidate hit.
+        ranges.sort(key=lambda item: item[0][1] - item[0][0])
+        (start, end), first_offset = ranges[0]
+        postings = self._postings
+        hits = [key - first_offset for key in postings[start:end]
+                if (key & 0xFFFFFFFF) >= first_offset]
+        for (start, end), offset in ranges[1:]:
+            hits = [key for key in hits
+                    if _bisect(postings, key + offset, start, end) != -1]
+            if not hits:
+                break
+        return sorted(set(key >> 32 for key in hits))
+
+    def record(self, record_number):
+        """Return a :class:`tinyfasta.FastaRecord` read from the FASTA file.
+
+        :param record_number: number of the record, counting from zero
+        :returns: :class:`tinyfasta.FastaRecord`
+        """
+        start, _, end = self._spans[3*record_number:3*record_number+3]
+        data = _read_chunk(self.fpath, start, end)
+        return next(_records_from_bytes(data))
+
+    def search(self, query):
+        """Return list of :class:`tinyfasta.FastaRecord` instances containing
+        the query.
+
+        :param query: nucleotide string
+        :returns: list of :class:`tinyfasta.FastaRecord` instances
+        """
+        fasta_records = []
+        for record_number in self.candidates(query):
+            fasta_record = self.record(record_number)
+            if fasta_record.sequence.contains(query):
+                fasta_records.append(fasta_record)
+        return fasta_records
+
+
+# Odd multipliers of the multiply-shift hash functions of the count-min
+# sketch. They are fixed so that sketches built in different processes can be
+# merged.
+_MULTIPLIERS = [(0x9E3779B97F4A7C15 * (2 * i + 1)) & 0xFFFFFFFFFFFFFFFF | 1
+                for i in range(16)]
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+class KmerCounter(object):
+    """Class for counting the k-mers of nucleotide sequences.
+
+    K-mers are encoded as integers, with a rolling update as the sequence is
+    read, so no string is created per k-mer. K-mers spanning bases other
+    than A, C, G and T are skipped.
+
+    By default the counts are exact and held in a dictionary, so the memory
+    used grows with the number of distinct k-mers. With ``sketch=True`` the
+    counts are held in a count-min sketch of fixed size, ``depth`` rows of
+    ``width`` counters, and :func:`count` returns an upper bound on the true
+    count, which is exceeded by more than ``2 * total / width`` with a
+    probability of at most ``0.5 ** depth``.
+
+    Counters built in separate processes, e.g. over parts of a file split
+    using :func:`tinyfasta.split.split_fasta`, can be combined using
+    :func:`merge`.
+    """
+
+    def __init__(self, k=21, canonical=False, sketch=False, width=1 << 20,
+                 depth=4, use_numpy=None):
+        """Initialise an instance of the KmerCounter class.
+
+        :param k: k-mer length, at most 32
+        :param canonical: count each k-mer together with its reverse
+                          complement
+        :param sketch: count approximately using a count-min sketch
+        :param width: number of counters per row of the sketch, a power of
+                      two
+        :param depth: number of rows of the sketch, at most 16
+        :param use_numpy: encode and count k-mers using NumPy, defaults to True
+                          if NumPy is installed
+        """
+        if not 0 < k <= 32:
+            raise ValueError("The k-mer length must be between 1 and 32")
+        if use_numpy is None:
+            use_numpy = _HAVE_NUMPY
+        if use_numpy and not _HAVE_NUMPY:
+            raise ImportError("NumPy is required when use_numpy is True")
+        self.k = k
+        self.canonical = canonical
+        self.sketch = sketch
+        self.use_numpy = use_numpy
+        self.total = 0
+        if sketch:
+            if width < 2 or width & (width - 1):
+                raise ValueError("The sketch width must be a power of two")
+            if not 0 < depth <= len(_MULTIPLIERS):
+                raise ValueError("The sketch depth must be between 1 and {}"
+                                 .format(len(_MULTIPLIERS)))
+            self.width = width
+            self.depth = depth
+            self._shift = 64 - (width.bit_length() - 1)
+            if use_numpy:
+                import numpy
+                self._table = numpy.zeros((depth, width), dtype=numpy.uint64)
+            else:
+                self._table = [array.array("Q", [0]) * width
+                               for _ in range(depth)]
+        else:
+            self._counts = collections.Counter()
+
+    def __len__(self):
+        """Return the number of distinct k-mers counted exactly."""
+        if self.sketch:
+            raise TypeError("The number of distinct k-mers is not known "
+                            "when counting with a sketch")
+        return len(self._counts)
+
+    def add(self, fasta_records):
+        """Count the k-mers of records.
+
+        :param fasta_records: iterable of :class:`tinyfasta.FastaRecord`
+                              instances, e.g. a :class:`tinyfasta.FastaParser`
+        """
+        for fasta_record in fasta_records:
+            self.add_sequence(str(fasta_record.sequence))
+
+    def add_file(self, fpath):
+        """Count the k-mers of all the records in a FASTA file.
+
+        The raw bytes of the records are counted, so no record objects are
+        created.
+
+        :param fpath: path to the FASTA file, which may be compressed
+        """
+        with open_fasta(fpath) as fh:
+            for _, _, _, body in iter_raw_records(fh):
+                self._add_bytes(body.translate(None, b"\r\n").upper())
+
+    def add_sequence(self, sequence):
+        """Count the k-mers of a sequence.
+
+        :param sequence: nucleotide string
+        """
+        self._add_bytes(sequence.upper().encode("ascii", "replace"))
+
+    def _add_bytes(self, sequence):
+        """Count the k-mers of an upper case sequence given as bytes."""
+        if self.use_numpy:
+            import numpy
+            codes = _numpy_codes(sequence, self.k, self.canonical)
+            self.total += len(codes)
+            if self.sketch:
+                for row, index in zip(self._table, self._numpy_hashes(codes)):
+                    row += numpy.bincount(index, minlength=self.width).astype(
+                        numpy.uint64)
+            else:
+                codes, counts = numpy.unique(codes, return_counts=True)
+                self._counts.update(dict(zip(codes.tolist(),
+                                             counts.tolist())))
+            return
+        codes = _rolling_codes(sequence, self.k, self.canonical)
+        if not self.sketch:
+            counts = collections.Counter(codes)
+            self.total += sum(counts.values())
+            self._counts.update(counts)
+            return
+        shift = self._shift
+        multipliers = _MULTIPLIERS[:self.depth]
+        for code in codes:
+            self.total += 1
+            for row, multiplier in zip(self._table, multipliers):
+                row[((code * multiplier) & _MASK64) >> shift] += 1
+
+    def _numpy_hashes(self, codes):
+        """Return list of numpy arrays of the sketch columns of the codes."""
+        import numpy
+        shift = numpy.uint64(self._shift)
+        return [((codes * numpy.uint64(multiplier)) >> shift).astype(
+                    numpy.intp)
+                for multiplier in _MULTIPLIERS[:self.depth]]
+
+    def _code(self, kmer):
+        """Return the code of a k-mer, or None if it is not made up of ACGT."""
+        if len(kmer) != self.k:
+            raise ValueError("Expected a k-mer of length {}".format(self.k))
+        code = _kmer_code(kmer.upper().encode("ascii", "replace"))
+        if code is not None and self.canonical:
+            code = min(code, _reverse_complement_code(code, self.k))
+        return code
+
+    def count(self, kmer):
+        """Return the number of times a k-mer has been counted.
+
+        With ``canonical=True`` this includes the occurrences of its reverse
+        complement. With ``sketch=True`` the count may be too high, but is
+        never too low.
+
+        :param kmer: string of length k
+        :returns: int
+        """
+        code = self._code(kmer)
+        if code is None:
+            return 0
+        if not self.sketch:
+            return self._counts[code]
+        return int(min(row[((code * multiplier) & _MASK64) >> self._shift]
+                       for row, multiplier in zip(self._table, _MULTIPLIERS)))
+
+    def items(self):
+        """Yield (kmer, count) tuples of the k-mers counted exactly.
+
+        With ``canonical=True`` only the smaller of each k-mer and its reverse
+        complement is yielded.
+        """
+        if self.sketch:
+            raise TypeError("Cannot list the k-mers counted with a sketch")
+        for code, count in self._counts.items():
+            yield _decode(code, self.k), count
+
+    def most_common(self, n=None):
+        """Return list of the n most common (kmer, count) tuples.
+
+        :param n: number of k-mers to return, defaults to all of them
+        :returns: list of tuples
+        """
+        if self.sketch:
+            raise TypeError("Cannot list the k-mers counted with a sketch")
+        return [(_decode(code, self.k), count)
+                for code, count in self._counts.most_common(n)]
+
+    def merge(self, other):
+        """Add the counts of another counter to this one.
+
+        The counters must have been created with the same k, canonical and
+        sketch settings.
+
+        :param other: :class:`tinyfasta.KmerCounter`
+        """
+        settings = ("k", "canonical", "sketch")
+        if self.sketch:
+            settings += ("width", "depth")
+        for name in settings:
+            if getattr(self, name) != getattr(other, name):
+                raise ValueError(
+                    "Cannot merge counters with different {}".format(name))
+        self.total += other.total
+        if not self.sketch:
+            self._counts.update(other._counts)
+        elif self.use_numpy:
+            import numpy
+            for row, other_row in zip(self._table, other._table):
+                row += numpy.asarray(other_row, dtype=numpy.uint64)
+        else:
+            for i, other_row in enumerate(other._table):
+                if not isinstance(other_row, array.array):
+                    other_row = array.array("Q", other_row.tobytes())
+                self._table[i] = array.array(
+                    "Q", map(int.__add__, self._table[i], other_row))
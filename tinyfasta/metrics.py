@@ -0,0 +1,189 @@
+"""Instrumentation of the parsing of FASTA files.
+
+A :class:`tinyfasta.ParserMetrics` instance passed to a
+:class:`tinyfasta.FastaParser` collects counters while the file is parsed.
+The bytes and lines are counted per block read, or per record for memory
+mapped files, and the parser only checks for a metrics object once per file,
+so parsing without metrics is not slowed down at all.
+"""
+
+import io
+import os
+import time
+
+from tinyfasta._blocks import count_bytes
+from tinyfasta.bgzf import open_fasta
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw binary file object counting the bytes and lines read through it."""
+
+    def __init__(self, fh, count_lines=False, underlying=None):
+        io.RawIOBase.__init__(self)
+        self._fh = fh
+        self._underlying = underlying
+        self._count_lines = count_lines
+        self.bytes = 0
+        self.lines = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._fh.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._fh.seek(offset, whence)
+
+    def tell(self):
+        return self._fh.tell()
+
+    def readinto(self, b):
+        data = self._fh.read(len(b))
+        size = len(data)
+        b[:size] = data
+        self.bytes += size
+        if self._count_lines:
+            self.lines += data.count(b"\n")
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._fh.close()
+            if self._underlying is not None:
+                self._underlying.close()
+        io.RawIOBase.close(self)
+
+
+class ParserMetrics(object):
+    """Counters collected while parsing a FASTA file.
+
+    The counters are:
+
+    - ``bytes_read``: bytes read from the file, i.e. compressed bytes for
+      compressed files
+    - ``bytes_parsed``: uncompressed bytes parsed
+    - ``lines``: lines parsed
+    - ``records``: records yielded
+    - ``parser_seconds``: time spent in the parser producing records
+    - ``consumer_seconds``: time spent by the caller between records
+
+    The counters are reset each time the parser is iterated over. A progress
+    callback, if given, is called with the
+    :class:`tinyfasta.ParserMetrics` instance at most once per interval, and
+    once more when the end of the file is reached.
+    """
+
+    def __init__(self, progress=None, interval=1.0):
+        """Initialise an instance of the ParserMetrics class.
+
+        :param progress: function called with the metrics to report progress
+        :param interval: minimum number of seconds between progress calls
+        """
+        self.progress = progress
+        self.interval = interval
+        self._reset()
+
+    def _reset(self):
+        """Reset the counters."""
+        self.file_size = 0
+        self.bytes_read = 0
+        self.bytes_parsed = 0
+        self.lines = 0
+        self.records = 0
+        self.parser_seconds = 0.0
+        self.consumer_seconds = 0.0
+        self._readers = ()
+
+    @property
+    def percent(self):
+        """Percentage of the file read so far, None for streams of unknown
+        size."""
+        if self._readers:
+            self._update_from_readers()
+        if self.file_size is None:
+            return None
+        if not self.file_size:
+            return 100.0
+        return min(100.0, 100.0 * self.bytes_read / self.file_size)
+
+    def as_dict(self):
+        """Return the counters as a dictionary.
+
+        :returns: dict
+        """
+        if self._readers:
+            self._update_from_readers()
+        return {
+            "file_size": self.file_size,
+            "bytes_read": self.bytes_read,
+            "bytes_parsed": self.bytes_parsed,
+            "lines": self.lines,
+            "records": self.records,
+            "parser_seconds": self.parser_seconds,
+            "consumer_seconds": self.consumer_seconds,
+            "percent": self.percent,
+        }
+
+    def _update_from_readers(self):
+        """Copy the counts of the counting readers in use."""
+        disk, stream = self._readers
+        self.bytes_read = disk.bytes
+        self.bytes_parsed = stream.bytes
+        self.lines = stream.lines
+
+    def _open(self, fpath):
+        """Return binary file object, counting the bytes and lines read."""
+        self.file_size = os.path.getsize(fpath)
+        disk = _CountingReader(open(fpath, "rb"))
+        raw = io.BufferedReader(disk)
+        fh = open_fasta(fpath, fileobj=raw)
+        stream = _CountingReader(fh, count_lines=True, underlying=raw)
+        self._readers = (disk, stream)
+        return io.BufferedReader(stream)
+
+    def _count_read(self, blocks):
+        """Yield blocks read from a stream, counting their bytes."""
+        self.file_size = None
+        for block in blocks:
+            self.bytes_read += len(block)
+            yield block
+
+    def _count_parsed(self, blocks):
+        """Yield uncompressed blocks, counting their bytes and lines."""
+        for block in blocks:
+            self.bytes_parsed += len(block)
+            self.lines += block.count(b"\n")
+            yield block
+
+    def _count_spans(self, mapped, spans):
+        """Yield record spans in a memory mapped file, counting their bytes
+        and lines."""
+        self.file_size = len(mapped)
+        self._readers = ()
+        for start, sequence_start, end in spans:
+            self.bytes_read = self.bytes_parsed = end
+            self.lines += count_bytes(mapped, b"\n", start, end)
+            yield start, sequence_start, end
+
+    def _measure(self, fasta_records):
+        """Yield the records, timing the parser and the consumer."""
+        self._reset()
+        clock = time.perf_counter
+        progress = self.progress
+        start = last_report = clock()
+        for fasta_record in fasta_records:
+            now = clock()
+            self.parser_seconds += now - start
+            self.records += 1
+            if progress is not None and now - last_report >= self.interval:
+                last_report = now
+                progress(self)
+            yield fasta_record
+            start = clock()
+            self.consumer_seconds += start - now
+        self.parser_seconds += clock() - start
+        if self._readers:
+            self._update_from_readers()
+        if progress is not None:
+            progress(self)
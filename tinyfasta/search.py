@@ -0,0 +1,442 @@
+"""Search engines for finding patterns in sequences and descriptions.
+
+The search objects in this module provide ``search`` and ``finditer``
+methods, mirroring compiled regular expressions. They can therefore be passed
+to :func:`tinyfasta.Sequence.contains` and
+:func:`tinyfasta.Sequence.find_all` in place of a string or regular
+expression.
+
+Approximate matches, with mismatches or with insertions and deletions as
+well, are found using bit-parallel algorithms. The state of the search is
+held in Python integers with one bit per pattern position, so each character
+of the string is processed using a handful of integer operations whatever the
+length of the pattern.
+"""
+
+import collections
+import re
+
+from tinyfasta.alphabet import IUPAC_NUCLEOTIDES, reverse_complement
+
+
+class Match(object):
+    """Match of a search pattern in a string.
+
+    The interface mirrors the match objects of the :mod:`re` module. The
+    pattern that matched is available as the ``pattern`` attribute. Matches
+    of nucleotide motifs also record the ``strand``, "+" or "-", that the
+    match was found on. The ``distance`` attribute holds the number of
+    mismatches, or edits, between the pattern and the matching part of the
+    string, which is zero for exact matches.
+    """
+
+    def __init__(self, string, start, end, pattern, strand=None, distance=0):
+        self.string = string
+        self.pattern = pattern
+        self.strand = strand
+        self.distance = distance
+        self._start = start
+        self._end = end
+
+    def __repr__(self):
+        return "<Match span=({}, {}) pattern={!r} strand={!r}{}>".format(
+            self._start, self._end, self.pattern, self.strand,
+            " distance={}".format(self.distance) if self.distance else "")
+
+    def start(self):
+        """Return the start position of the match."""
+        return self._start
+
+    def end(self):
+        """Return the end position of the match."""
+        return self._end
+
+    def span(self):
+        """Return the (start, end) tuple of the match."""
+        return self._start, self._end
+
+    def group(self):
+        """Return the matching part of the string."""
+        return self.string[self._start:self._end]
+
+
+class _SearchEngine(object):
+    """Mixin adding ``search`` and ``scan`` methods to a search engine.
+
+    The search engine class provides a ``finditer(string)`` method yielding
+    :class:`tinyfasta.search.Match` instances for all the hits in a string.
+    """
+
+    def search(self, string):
+        """Return the first :class:`tinyfasta.search.Match` or None.
+
+        :param string: string to search
+        :returns: :class:`tinyfasta.search.Match` or None
+        """
+        for match in self.finditer(string):
+            return match
+        return None
+
+    def scan(self, fasta_records, component="sequence"):
+        """Yield (fasta_record, matches) tuples for the records with hits.
+
+        :param fasta_records: iterable of :class:`tinyfasta.FastaRecord`
+                              instances, e.g. a :class:`tinyfasta.FastaParser`
+        :param component: the record component to search, "sequence" or
+                          "description"
+        """
+        for fasta_record in fasta_records:
+            matches = getattr(fasta_record, component).find_all(self)
+            if matches:
+                yield fasta_record, matches
+
+
+class PatternSet(_SearchEngine):
+    """Set of strings searched for simultaneously using Aho-Corasick.
+
+    The patterns are compiled into a single automaton, so a string is scanned
+    once no matter how many patterns there are.
+    """
+
+    def __init__(self, patterns, ignore_case=False):
+        """Initialise an instance of the PatternSet class.
+
+        :param patterns: iterable of strings to search for
+        :param ignore_case: match the patterns irrespective of case
+        """
+        self.patterns = []
+        self.ignore_case = ignore_case
+        self._goto = [{}]
+        self._outputs = [()]
+        seen = set()
+        for pattern in patterns:
+            if not pattern or pattern in seen:
+                continue
+            seen.add(pattern)
+            self.patterns.append(pattern)
+            self._add(pattern.lower() if ignore_case else pattern,
+                      len(self.patterns) - 1)
+        self._fail = self._build_failure_links()
+
+    def __len__(self):
+        """Return the number of patterns in the set."""
+        return len(self.patterns)
+
+    def _add(self, pattern, index):
+        """Add a pattern to the trie."""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._outputs.append(())
+            state = next_state
+        self._outputs[state] = self._outputs[state] + (index,)
+
+    def _build_failure_links(self):
+        """Return the failure links of the trie, merging outputs."""
+        fail = [0] * len(self._goto)
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] += self._outputs[fail[next_state]]
+        return fail
+
+    def finditer(self, string):
+        """Yield :class:`tinyfasta.search.Match` instances for all the hits.
+
+        Overlapping hits are reported, in order of their end position.
+
+        :param string: string to search
+        """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        patterns = self.patterns
+        text = string.lower() if self.ignore_case else string
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in outputs[state]:
+                pattern = patterns[index]
+                yield Match(string, i + 1 - len(pattern), i + 1, pattern)
+
+    def hits(self, string):
+        """Return dictionary mapping the patterns found to their positions.
+
+        :param string: string to search
+        :returns: dict
+        """
+        positions = collections.OrderedDict()
+        for match in self.finditer(string):
+            positions.setdefault(match.pattern, []).append(match.start())
+        return positions
+
+
+def _iupac_regex(motif):
+    """Return regular expression string matching an IUPAC motif."""
+    parts = []
+    for code in motif.upper():
+        if code not in IUPAC_NUCLEOTIDES:
+            raise ValueError(
+                "Invalid IUPAC nucleotide code '{}' in motif '{}'".format(
+                    code, motif))
+        bases = IUPAC_NUCLEOTIDES[code]
+        parts.append(bases if len(bases) == 1 else "[{}]".format(bases))
+    return "".join(parts)
+
+
+class Motif(_SearchEngine):
+    """Nucleotide motif written using IUPAC codes.
+
+    The motif, and optionally its reverse complement, are compiled into a
+    single regular expression, so that hits on both strands are found in one
+    pass over the sequence.
+    """
+
+    def __init__(self, motif, both_strands=True, ignore_case=False):
+        """Initialise an instance of the Motif class.
+
+        :param motif: motif string made up of IUPAC nucleotide codes
+        :param both_strands: also find hits on the reverse strand
+        :param ignore_case: match the motif irrespective of case
+        """
+        self.motif = motif
+        self.both_strands = both_strands
+        self.ignore_case = ignore_case
+        flags = re.IGNORECASE if ignore_case else 0
+        forward = _iupac_regex(motif)
+        reverse = _iupac_regex(reverse_complement(motif))
+        self._palindromic = forward == reverse
+        if both_strands and not self._palindromic:
+            combined = "(?=(?P<plus>{})|(?P<minus>{}))".format(forward,
+                                                               reverse)
+        else:
+            combined = "(?=(?P<plus>{}))".format(forward)
+        self._regex = re.compile(combined, flags)
+        self._reverse = re.compile(reverse, flags)
+
+    def __len__(self):
+        """Return the length of the motif."""
+        return len(self.motif)
+
+    def finditer(self, string):
+        """Yield :class:`tinyfasta.search.Match` instances for all the hits.
+
+        Overlapping hits are reported. A hit on the reverse strand is
+        reported with the coordinates of the forward strand, i.e. the
+        sequence of the match is the reverse complement of the motif.
+
+        :param string: string to search
+        """
+        size = len(self.motif)
+        reverse = self._reverse
+        check_reverse = self.both_strands and not self._palindromic
+        for match in self._regex.finditer(string):
+            start = match.start()
+            if match.group("plus") is not None:
+                yield Match(string, start, start + size, self.motif, "+")
+                if self.both_strands and (self._palindromic
+                        or reverse.match(string, start)):
+                    yield Match(string, start, start + size, self.motif, "-")
+            elif check_reverse:
+                yield Match(string, start, start + size, self.motif, "-")
+
+
+def _bitap(string, patterns, max_mismatches):
+    """Yield (start, end, index, mismatches) of approximate pattern hits.
+
+    All the patterns are packed into one bit vector and searched for at once
+    using the Bitap shift-and algorithm extended to mismatches. Bit j of the
+    state for d mismatches is set if the pattern prefix ending at j matches
+    the string ending at the current position with at most d mismatches. The
+    first position of each pattern is always set before shifting in the next
+    character, so no bits leak from one pattern into the next.
+
+    :param string: string to search
+    :param patterns: list of non-empty patterns
+    :param max_mismatches: maximum number of mismatches
+    """
+    masks = {}
+    starts = ends = 0
+    end_bits = {}
+    offset = 0
+    for index, pattern in enumerate(patterns):
+        for i, char in enumerate(pattern):
+            masks[char] = masks.get(char, 0) | (1 << (offset + i))
+        starts |= 1 << offset
+        offset += len(pattern)
+        ends |= 1 << (offset - 1)
+        end_bits[offset - 1] = index
+    full = (1 << offset) - 1
+    states = [0] * (max_mismatches + 1)
+    for position, char in enumerate(string):
+        eq = masks.get(char, 0)
+        previous = states[0]
+        states[0] = ((previous << 1) | starts) & eq
+        for d in range(1, max_mismatches + 1):
+            state = states[d]
+            states[d] = ((((state << 1) | starts) & eq)
+                         | (((previous << 1) | starts) & full))
+            previous = state
+        hits = states[-1] & ends
+        while hits:
+            low = hits & -hits
+            hits ^= low
+            index = end_bits[low.bit_length() - 1]
+            mismatches = 0
+            while not states[mismatches] & low:
+                mismatches += 1
+            yield (position + 1 - len(patterns[index]), position + 1, index,
+                   mismatches)
+
+
+def _myers_ends(string, pattern, max_edits):
+    """Yield (end, edits) of the string positions where a pattern ends with
+    at most max_edits insertions, deletions and substitutions.
+
+    Uses the bit-vector algorithm of Myers (1999) to track the column of the
+    edit distance matrix as vertical deltas in two bit vectors.
+    """
+    size = len(pattern)
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    full = (1 << size) - 1
+    high = 1 << (size - 1)
+    pv = full
+    mv = 0
+    score = size
+    for position, char in enumerate(string):
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        if score <= max_edits:
+            yield position + 1, score
+
+
+def _alignment_start(string, end, pattern, edits):
+    """Return the start of the shortest alignment of a pattern ending at end
+    in the string with the given number of edits."""
+    window = string[max(0, end - len(pattern) - edits):end][::-1]
+    pattern = pattern[::-1]
+    # Row of the edit distance between the reversed pattern prefix read so
+    # far and each prefix of the reversed window.
+    row = list(range(len(window) + 1))
+    for char in pattern:
+        previous = row
+        row = [previous[0] + 1]
+        for j, window_char in enumerate(window):
+            row.append(min(previous[j] + (char != window_char),
+                           previous[j + 1] + 1, row[j] + 1))
+    return end - row.index(edits)
+
+
+def _edit_hits(string, pattern, max_edits):
+    """Return list of (start, end, edits) of the best hit in each run of
+    adjacent end positions."""
+    best = []
+    last_end = None
+    for end, edits in _myers_ends(string, pattern, max_edits):
+        if best and end == last_end + 1:
+            if edits < best[-1][1]:
+                best[-1] = (end, edits)
+        else:
+            best.append((end, edits))
+        last_end = end
+    return [(_alignment_start(string, end, pattern, edits), end, edits)
+            for end, edits in best]
+
+
+class ApproximatePatternSet(_SearchEngine):
+    """Set of strings searched for allowing mismatches or edits.
+
+    With ``max_mismatches`` the patterns may match with substitutions only,
+    and all of them are searched for in a single pass using a bit-parallel
+    Bitap algorithm. Every position at which a pattern matches is reported.
+
+    With ``max_edits`` insertions and deletions are allowed as well, and each
+    pattern is searched for using the bit-vector algorithm of Myers. An
+    approximate match usually ends at several adjacent positions, so for each
+    run of adjacent end positions only the one with the fewest edits is
+    reported, together with the start of its shortest alignment.
+
+    Use :func:`scan` to run all the patterns over a stream of records.
+    """
+
+    def __init__(self, patterns, max_mismatches=None, max_edits=None,
+                 ignore_case=False):
+        """Initialise an instance of the ApproximatePatternSet class.
+
+        :param patterns: iterable of strings to search for
+        :param max_mismatches: maximum number of substitutions in a match
+        :param max_edits: maximum number of substitutions, insertions and
+                          deletions in a match
+        :param ignore_case: match the patterns irrespective of case
+        """
+        if (max_mismatches is None) == (max_edits is None):
+            raise ValueError(
+                "Specify either max_mismatches or max_edits")
+        if (max_mismatches or max_edits or 0) < 0:
+            raise ValueError("The number of differences cannot be negative")
+        self.max_mismatches = max_mismatches
+        self.max_edits = max_edits
+        self.ignore_case = ignore_case
+        self.patterns = []
+        for pattern in patterns:
+            if pattern and pattern not in self.patterns:
+                self.patterns.append(pattern)
+        self._search_patterns = [p.lower() if ignore_case else p
+                                 for p in self.patterns]
+
+    def __len__(self):
+        """Return the number of patterns in the set."""
+        return len(self.patterns)
+
+    def finditer(self, string):
+        """Yield :class:`tinyfasta.search.Match` instances for all the hits.
+
+        The hits are yielded in order of their end position.
+
+        :param string: string to search
+        """
+        text = string.lower() if self.ignore_case else string
+        patterns = self.patterns
+        if self.max_mismatches is not None:
+            if not patterns:
+                return
+            for start, end, index, mismatches in _bitap(
+                    text, self._search_patterns, self.max_mismatches):
+                yield Match(string, start, end, patterns[index],
+                            distance=mismatches)
+            return
+        hits = []
+        for pattern, search_pattern in zip(patterns, self._search_patterns):
+            for start, end, edits in _edit_hits(text, search_pattern,
+                                                self.max_edits):
+                hits.append(Match(string, start, end, pattern,
+                                  distance=edits))
+        hits.sort(key=lambda match: match.end())
+        for match in hits:
+            yield match
@@ -0,0 +1,128 @@
+"""External sorting of FASTA records.
+
+Records are read in runs that fit in the memory budget. Each run is sorted in
+memory and written to a temporary file, and the sorted runs are then merged,
+so files many times larger than the available memory can be sorted while
+reading and writing them sequentially.
+"""
+
+import heapq
+import os
+import shutil
+import tempfile
+
+from tinyfasta import FastaParser
+from tinyfasta.writer import FastaWriter
+
+# Approximate number of bytes used by a record in addition to its content.
+_RECORD_COST = 200
+
+_KEYS = {
+    "length": len,
+    "description": lambda fasta_record: str(fasta_record.description),
+    "identifier": lambda fasta_record: fasta_record.description.identifier(),
+}
+
+
+class RecordSorter(object):
+    """Class for sorting FASTA records that may not fit in memory.
+
+    The sort is stable, records with equal keys are yielded in the order in
+    which they were read.
+    """
+
+    def __init__(self, key="length", reverse=False,
+                 memory_budget=256 * 1024 * 1024, tmp_dir=None, fan_in=64):
+        """Initialise an instance of the RecordSorter class.
+
+        :param key: "length", "description", "identifier" (see
+                    :func:`tinyfasta.FastaRecord.Description.identifier`), or
+                    function taking a :class:`tinyfasta.FastaRecord` and
+                    returning the value to sort on
+        :param reverse: sort in descending order
+        :param memory_budget: approximate number of bytes of records to hold
+                              in memory
+        :param tmp_dir: directory in which to create the run files
+        :param fan_in: maximum number of run files merged at once
+        """
+        if not callable(key):
+            if key not in _KEYS:
+                raise ValueError("Unknown sort key: {}".format(key))
+            key = _KEYS[key]
+        if fan_in < 2:
+            raise ValueError("Cannot merge fewer than two runs at a time")
+        self.key = key
+        self.reverse = reverse
+        self.memory_budget = memory_budget
+        self.tmp_dir = tmp_dir
+        self.fan_in = fan_in
+        self.num_runs = 0
+
+    def sort(self, fasta_records):
+        """Yield the records in sorted order.
+
+        :param fasta_records: iterable of :class:`tinyfasta.FastaRecord`
+                              instances, e.g. a :class:`tinyfasta.FastaParser`
+        """
+        self.num_runs = 0
+        work_dir = None
+        runs = []
+        try:
+            for run, more in self._runs(fasta_records):
+                self.num_runs += 1
+                if work_dir is None and not more:
+                    # Everything fitted in memory.
+                    for fasta_record in run:
+                        yield fasta_record
+                    return
+                if work_dir is None:
+                    work_dir = tempfile.mkdtemp(dir=self.tmp_dir)
+                runs.append(self._write_run(work_dir, len(runs), run))
+                run = None
+            num_files = len(runs)
+            while len(runs) > self.fan_in:
+                merged = []
+                for i in range(0, len(runs), self.fan_in):
+                    group = runs[i:i+self.fan_in]
+                    path = self._write_run(work_dir, num_files,
+                                           self._merge(group))
+                    num_files += 1
+                    for run_path in group:
+                        os.remove(run_path)
+                    merged.append(path)
+                runs = merged
+            for fasta_record in self._merge(runs):
+                yield fasta_record
+        finally:
+            if work_dir is not None:
+                shutil.rmtree(work_dir)
+
+    def _runs(self, fasta_records):
+        """Yield (sorted_records, more) tuples of runs fitting the budget."""
+        run = []
+        size = 0
+        for fasta_record in fasta_records:
+            if run and size > self.memory_budget:
+                run.sort(key=self.key, reverse=self.reverse)
+                yield run, True
+                run = []
+                size = 0
+            run.append(fasta_record)
+            size += (_RECORD_COST + len(fasta_record)
+                     + len(str(fasta_record.description)))
+        run.sort(key=self.key, reverse=self.reverse)
+        yield run, False
+
+    @staticmethod
+    def _write_run(work_dir, name, fasta_records):
+        """Write records to a run file and return its path."""
+        path = os.path.join(work_dir, "{}.fasta".format(name))
+        with FastaWriter(path, line_length=None) as writer:
+            writer.write_all(fasta_records)
+        return path
+
+    def _merge(self, run_paths):
+        """Return iterator merging the records of sorted run files."""
+        return heapq.merge(*[FastaParser(path, use_mmap=True)
+                             for path in run_paths],
+                           key=self.key, reverse=self.reverse)
@@ -0,0 +1,174 @@
+"""Splitting of FASTA files into balanced shards.
+
+The record boundaries are located in the memory mapped file without parsing
+the sequences. The shards are contiguous byte ranges of the input, which are
+copied by the kernel where possible.
+"""
+
+import bisect
+import collections
+import os
+
+from tinyfasta import _map_file
+from tinyfasta._blocks import (count_bytes, line_layout, record_name,
+                               record_spans)
+from tinyfasta.bgzf import is_gzip
+from tinyfasta.index import FaiEntry, write_fai
+
+Shard = collections.namedtuple("Shard",
+    ["path", "start", "end", "num_records", "residues"])
+
+_COPY_SIZE = 64 * 1024 * 1024
+
+
+def _scan(mapped, index):
+    """Return the record spans, residue counts and, if index is True, the
+    :class:`tinyfasta.index.FaiEntry` instances of a memory mapped file."""
+    spans = []
+    residues = []
+    entries = []
+    for start, sequence_start, end in record_spans(mapped):
+        spans.append((start, sequence_start, end))
+        if not index:
+            residues.append(end - sequence_start
+                            - count_bytes(mapped, b"\n", sequence_start, end)
+                            - count_bytes(mapped, b"\r", sequence_start, end))
+            continue
+        name = record_name(mapped[start:sequence_start])
+        layout = line_layout(mapped, sequence_start, end)
+        if layout is None:
+            raise ValueError(
+                "Cannot index record '{}': its sequence lines are of "
+                "different lengths".format(name))
+        residues.append(layout[0])
+        entries.append(FaiEntry(name, layout[0], sequence_start, *layout[1:]))
+    return spans, residues, entries
+
+
+def shard_boundaries(weights, num_shards):
+    """Return indices splitting a list of weights into balanced parts.
+
+    The parts are contiguous and each part is non-empty. The returned list
+    starts with 0 and ends with the number of weights.
+
+    :param weights: list of non-negative numbers, e.g. sequence lengths
+    :param num_shards: maximum number of parts
+    :returns: list of int
+    """
+    if not weights:
+        return [0]
+    num_shards = min(num_shards, len(weights))
+    prefix = [0]
+    for weight in weights:
+        prefix.append(prefix[-1] + weight)
+    boundaries = [0]
+    for k in range(1, num_shards):
+        ideal = prefix[-1] * k / float(num_shards)
+        i = bisect.bisect_left(prefix, ideal)
+        if i > 0 and ideal - prefix[i-1] < prefix[i] - ideal:
+            i -= 1
+        # Leave at least one record for this and each of the later parts.
+        i = max(i, boundaries[-1] + 1)
+        i = min(i, len(weights) - (num_shards - k))
+        boundaries.append(i)
+    boundaries.append(len(weights))
+    return boundaries
+
+
+def copy_range(src, dst, offset, count):
+    """Copy count bytes from offset in one file to the end of another.
+
+    Uses :func:`os.copy_file_range` or :func:`os.sendfile` where available,
+    so the data need not pass through user space, and falls back on reading
+    and writing it.
+
+    :param src: file object opened for reading in binary mode
+    :param dst: file object opened for writing in binary mode
+    :param offset: offset in the source file
+    :param count: number of bytes to copy
+    """
+    dst.flush()
+    for name in ("copy_file_range", "sendfile"):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        try:
+            while count > 0:
+                if name == "copy_file_range":
+                    copied = func(src.fileno(), dst.fileno(),
+                                  min(count, _COPY_SIZE), offset)
+                else:
+                    copied = func(dst.fileno(), src.fileno(), offset,
+                                  min(count, _COPY_SIZE))
+                if copied == 0:
+                    raise EOFError("Unexpected end of file")
+                offset += copied
+                count -= copied
+            return
+        except OSError:
+            # Not supported for these files, try the next method. Whatever
+            # was copied so far has advanced offset and count.
+            continue
+    src.seek(offset)
+    while count > 0:
+        data = src.read(min(count, _COPY_SIZE))
+        if not data:
+            raise EOFError("Unexpected end of file")
+        dst.write(data)
+        count -= len(data)
+
+
+def split_fasta(fpath, num_shards, by="residues", prefix=None,
+                write_index=False):
+    """Split a FASTA file into shards, returning their details.
+
+    The shards hold runs of consecutive records, balanced by their total
+    number of residues or by their number of records. There are fewer shards
+    than requested if the file holds fewer records.
+
+    :param fpath: path to the uncompressed FASTA file
+    :param num_shards: number of shards to split the file into
+    :param by: "residues" or "records"
+    :param prefix: path prefix of the shard files, defaults to fpath without
+                   its extension; the shard number and the extension of fpath
+                   are appended to it
+    :param write_index: write a ``.fai`` index for each shard
+    :returns: list of :class:`tinyfasta.split.Shard` instances
+    """
+    if by not in ("residues", "records"):
+        raise ValueError("Cannot balance shards by '{}'".format(by))
+    if num_shards < 1:
+        raise ValueError("The number of shards must be at least one")
+    if is_gzip(fpath):
+        raise ValueError(
+            "Cannot split compressed file '{}' by copying bytes".format(fpath))
+    root, ext = os.path.splitext(fpath)
+    if prefix is None:
+        prefix = root
+    with open(fpath, "rb") as fh:
+        mapped = _map_file(fh)
+        if mapped is None:
+            return []
+        try:
+            spans, residues, entries = _scan(mapped, write_index)
+        finally:
+            mapped.close()
+        weights = residues if by == "residues" else [1] * len(spans)
+        boundaries = shard_boundaries(weights, num_shards)
+        width = len(str(len(boundaries) - 1))
+        shards = []
+        for number, (first, last) in enumerate(zip(boundaries,
+                                                   boundaries[1:])):
+            path = "{}.{:0{}d}{}".format(prefix, number + 1, width, ext)
+            start = spans[first][0]
+            end = spans[last - 1][2]
+            with open(path, "wb") as out:
+                copy_range(fh, out, start, end - start)
+            if write_index:
+                write_fai(path + ".fai", [
+                    entry._replace(offset=entry.offset - start)
+                    for entry in entries[first:last]])
+            shards.append(Shard(path, start, end, last - first,
+                                sum(residues[first:last])))
+    return shards
+
@@ -0,0 +1,178 @@
+"""Whole file composition and length statistics of FASTA files.
+
+The statistics are computed from the raw bytes of each record using the
+string methods implemented in C, or NumPy when it is available, so no
+sequence strings are built and no Python code runs per base.
+"""
+
+import array
+import collections
+import importlib.util
+
+from tinyfasta._blocks import DEFAULT_BLOCK_SIZE, iter_raw_records, record_name
+from tinyfasta.bgzf import open_fasta
+
+# NumPy is only imported once the statistics are counted with it.
+_HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+_BASES = b"ACGTNacgtn"
+_SYMBOLS = [_BASES[i:i+1] for i in range(len(_BASES))]
+_COUNTED = _BASES + b"\r\n"
+
+
+class RecordStats(collections.namedtuple("RecordStats",
+        ["name", "length", "a", "c", "g", "t", "n", "other"])):
+    """Composition of a single record; base counts ignore case."""
+
+    __slots__ = ()
+
+    @property
+    def gc_content(self):
+        """Fraction of G and C out of all the A, C, G and T bases."""
+        acgt = self.a + self.c + self.g + self.t
+        return float(self.g + self.c) / acgt if acgt else 0.0
+
+
+FastaSummary = collections.namedtuple("FastaSummary",
+    ["num_records", "total_length", "min_length", "max_length",
+     "mean_length", "n50", "gc_content", "composition"])
+
+
+def n50(lengths):
+    """Return the N50 of a collection of sequence lengths.
+
+    :param lengths: iterable of sequence lengths
+    :returns: int
+    """
+    lengths = sorted(lengths, reverse=True)
+    half = sum(lengths) / 2.0
+    total = 0
+    for length in lengths:
+        total += length
+        if total >= half:
+            return length
+    return 0
+
+
+def _count_python(body, composition):
+    """Return base counts of a record using bytes.count."""
+    counts = [body.count(symbol) for symbol in _SYMBOLS]
+    for symbol, count in zip(bytearray(_BASES), counts):
+        if count:
+            composition[symbol] += count
+    residue = body.translate(None, _COUNTED)
+    if residue:
+        composition.update(bytearray(residue))
+    length = len(body) - body.count(b"\n") - body.count(b"\r")
+    return [counts[i] + counts[i + 5] for i in range(5)], length
+
+
+def _count_numpy(body, composition):
+    """Return base counts of a record using numpy.bincount."""
+    import numpy
+    histogram = numpy.bincount(numpy.frombuffer(body, dtype=numpy.uint8),
+                               minlength=256)
+    histogram[ord("\n")] = 0
+    histogram[ord("\r")] = 0
+    for byte in numpy.flatnonzero(histogram):
+        composition[int(byte)] += int(histogram[byte])
+    counts = [int(histogram[ord(base)] + histogram[ord(base.lower())])
+              for base in "ACGTN"]
+    return counts, int(histogram.sum())
+
+
+class FastaStats(object):
+    """Class for computing composition and length statistics of a FASTA file.
+
+    The file is read in large blocks. Use :func:`records` to stream the
+    statistics of the individual records and :func:`summary` for the
+    statistics of the file as a whole. Given a
+    :class:`tinyfasta.SummaryCache`, the statistics are computed once and
+    read back from the cache until the file changes.
+    """
+
+    def __init__(self, fpath, block_size=DEFAULT_BLOCK_SIZE, use_numpy=None,
+                 cache=None):
+        """Initialise an instance of the FastaStats class.
+
+        :param fpath: path to the FASTA file, which may be compressed
+        :param block_size: number of bytes read at a time
+        :param use_numpy: count bases using NumPy, defaults to True if NumPy
+                          is installed
+        :param cache: :class:`tinyfasta.SummaryCache` in which to keep the
+                      statistics
+        """
+        if use_numpy is None:
+            use_numpy = _HAVE_NUMPY
+        if use_numpy and not _HAVE_NUMPY:
+            raise ImportError("NumPy is required when use_numpy is True")
+        self.fpath = fpath
+        self.block_size = block_size
+        self.use_numpy = use_numpy
+        self.cache = cache
+        self._composition = None
+        self._summary = None
+
+    def records(self):
+        """Yield :class:`tinyfasta.stats.RecordStats` for each record."""
+        cached = None
+        if self.cache is not None:
+            # Take the identity of the file before it is scanned, so that
+            # changes made during the scan invalidate the cached statistics.
+            identity = self.cache.identity(self.fpath)
+            cached = self.cache.get(self.fpath, "stats", identity)
+        if cached is not None:
+            for fields in cached["records"]:
+                yield RecordStats(*fields)
+            self._composition = collections.Counter(
+                dict((byte, count) for byte, count in cached["composition"]))
+            return
+        count = _count_numpy if self.use_numpy else _count_python
+        composition = collections.Counter()
+        all_stats = []
+        with open_fasta(self.fpath) as fh:
+            for _, _, header, body in iter_raw_records(fh, self.block_size):
+                counts, length = count(body, composition)
+                record_stats = RecordStats(record_name(header), length,
+                                           counts[0], counts[1], counts[2],
+                                           counts[3], counts[4],
+                                           length - sum(counts))
+                if self.cache is not None:
+                    all_stats.append(record_stats)
+                yield record_stats
+        self._composition = composition
+        if self.cache is not None:
+            self.cache.put(self.fpath, "stats", {
+                "records": all_stats,
+                "composition": sorted(composition.items())}, identity)
+
+    def summary(self):
+        """Return the :class:`tinyfasta.stats.FastaSummary` of the file.
+
+        The composition is a dictionary mapping each character found in the
+        sequences to the number of times it occurs.
+
+        :returns: :class:`tinyfasta.stats.FastaSummary`
+        """
+        if self._summary is not None:
+            return self._summary
+        lengths = array.array("L")
+        gc = acgt = 0
+        for record_stats in self.records():
+            lengths.append(record_stats.length)
+            gc += record_stats.g + record_stats.c
+            acgt += (record_stats.a + record_stats.c + record_stats.g
+                     + record_stats.t)
+        total = sum(lengths)
+        composition = dict((chr(byte), count) for byte, count
+                           in sorted(self._composition.items()) if count)
+        self._summary = FastaSummary(
+            num_records=len(lengths),
+            total_length=total,
+            min_length=min(lengths) if lengths else 0,
+            max_length=max(lengths) if lengths else 0,
+            mean_length=float(total) / len(lengths) if lengths else 0.0,
+            n50=n50(lengths),
+            gc_content=float(gc) / acgt if acgt else 0.0,
+            composition=composition)
+        return self._summary
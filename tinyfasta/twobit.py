@@ -0,0 +1,278 @@
+"""Compact storage of nucleotide sequences in the UCSC ``.2bit`` format.
+
+Each base is packed into two bits. Runs of soft-masked (lower case) bases and
+runs of bases other than A, C, G and T are recorded separately as blocks. The
+latter are restored as N, so ambiguity codes other than N are not preserved.
+Any part of a sequence can be decoded without decoding the rest of it.
+"""
+
+import bisect
+import collections
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+
+from tinyfasta import FastaRecord, Sequence
+from tinyfasta.index import parse_region
+
+SIGNATURE = 0x1A412743
+
+
+def _pack_table():
+    """Return translation table mapping bases to base four digits."""
+    table = bytearray(b"0" * 256)
+    for base, digit in zip(bytearray(b"TCAGtcag"), bytearray(b"01230123")):
+        table[base] = digit
+    return bytes(table)
+
+_PACK = _pack_table()
+
+_UNPACK = dict((ord("{:x}".format(i)), "TCAG"[i >> 2] + "TCAG"[i & 3])
+               for i in range(16))
+
+_N_BLOCKS = re.compile(r"[^ACGTacgt]+")
+_MASK_BLOCKS = re.compile(r"[a-z]+")
+
+_TwoBitRecord = collections.namedtuple("_TwoBitRecord",
+    ["length", "n_starts", "n_ends", "mask_starts", "mask_ends",
+     "dna_offset"])
+
+
+def _blocks(regex, sequence):
+    """Return (starts, sizes) of the runs matching a regular expression."""
+    starts = []
+    sizes = []
+    for match in regex.finditer(sequence):
+        starts.append(match.start())
+        sizes.append(match.end() - match.start())
+    return starts, sizes
+
+
+def _pack(sequence):
+    """Return the sequence packed into two bits per base."""
+    if not sequence:
+        return b""
+    digits = sequence.encode("ascii", "replace").translate(_PACK)
+    digits += b"0" * (-len(digits) % 4)
+    return int(digits, 4).to_bytes(len(digits) // 4, "big")
+
+
+def _unpack(packed):
+    """Return the bases encoded in packed two bit data."""
+    return packed.hex().translate(_UNPACK)
+
+
+def _encode_record(sequence):
+    """Return the sequence encoded as a ``.2bit`` sequence record."""
+    n_starts, n_sizes = _blocks(_N_BLOCKS, sequence)
+    mask_starts, mask_sizes = _blocks(_MASK_BLOCKS, sequence)
+    parts = [struct.pack("<2I", len(sequence), len(n_starts))]
+    parts.append(struct.pack("<{}I".format(len(n_starts)), *n_starts))
+    parts.append(struct.pack("<{}I".format(len(n_sizes)), *n_sizes))
+    parts.append(struct.pack("<I", len(mask_starts)))
+    parts.append(struct.pack("<{}I".format(len(mask_starts)), *mask_starts))
+    parts.append(struct.pack("<{}I".format(len(mask_sizes)), *mask_sizes))
+    parts.append(struct.pack("<I", 0))
+    parts.append(_pack(sequence))
+    return b"".join(parts)
+
+
+def _overlapping(starts, ends, start, end):
+    """Yield the (start, end) of the blocks overlapping a range."""
+    i = bisect.bisect_right(ends, start)
+    while i < len(starts) and starts[i] < end:
+        yield max(starts[i], start), min(ends[i], end)
+        i += 1
+
+
+class TwoBitFile(object):
+    """Class for reading sequences from a ``.2bit`` file.
+
+    The file is memory mapped and only the bytes holding a requested region
+    are decoded.
+    """
+
+    @staticmethod
+    def create(fpath, fasta_records):
+        """Write records to a ``.2bit`` file and return a TwoBitFile.
+
+        The records are named after the first word of their description.
+
+        :param fpath: path to the ``.2bit`` file
+        :param fasta_records: iterable of :class:`tinyfasta.FastaRecord`
+                              instances, e.g. a :class:`tinyfasta.FastaParser`
+        :returns: :class:`tinyfasta.TwoBitFile`
+        """
+        names = []
+        sizes = []
+        directory = os.path.dirname(os.path.abspath(fpath))
+        with tempfile.TemporaryFile(dir=directory) as tmp:
+            for fasta_record in fasta_records:
+                fields = str(fasta_record.description)[1:].split()
+                name = (fields[0] if fields else "").encode("utf-8")
+                if len(name) > 255:
+                    raise ValueError(
+                        "Record name too long for .2bit: {}".format(name))
+                data = _encode_record(fasta_record.sequence._content)
+                tmp.write(data)
+                names.append(name)
+                sizes.append(len(data))
+            index_size = sum(len(name) + 5 for name in names)
+            version = 0
+            if 16 + index_size + sum(sizes) >= 2 ** 32:
+                version = 1
+                index_size += 4 * len(names)
+            offset_format = "<Q" if version else "<I"
+            with open(fpath, "wb") as fh:
+                fh.write(struct.pack("<4I", SIGNATURE, version, len(names), 0))
+                offset = 16 + index_size
+                for name, size in zip(names, sizes):
+                    fh.write(struct.pack("<B", len(name)) + name)
+                    fh.write(struct.pack(offset_format, offset))
+                    offset += size
+                tmp.seek(0)
+                shutil.copyfileobj(tmp, fh)
+        return TwoBitFile(fpath)
+
+    def __init__(self, fpath):
+        """Initialise an instance of the TwoBitFile class.
+
+        :param fpath: path to the ``.2bit`` file
+        """
+        self.fpath = fpath
+        self._fh = open(fpath, "rb")
+        self._mapped = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        signature, version, count, _ = struct.unpack("<4I", self._mapped[:16])
+        if signature != SIGNATURE:
+            self.close()
+            raise ValueError("Not a .2bit file: {}".format(fpath))
+        offset_format = "<Q" if version else "<I"
+        offset_size = struct.calcsize(offset_format)
+        self._offsets = collections.OrderedDict()
+        pos = 16
+        for _ in range(count):
+            size = self._mapped[pos]
+            name = self._mapped[pos+1:pos+1+size].decode("utf-8")
+            pos += 1 + size
+            self._offsets[name] = struct.unpack(
+                offset_format, self._mapped[pos:pos+offset_size])[0]
+            pos += offset_size
+        self._records = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """Return the number of sequences in the file."""
+        return len(self._offsets)
+
+    def __iter__(self):
+        """Yield the names of the sequences in the file."""
+        return iter(self._offsets)
+
+    def __contains__(self, name):
+        return name in self._offsets
+
+    def __getitem__(self, name):
+        """Return the named :class:`tinyfasta.FastaRecord`."""
+        return self.fetch(name)
+
+    def close(self):
+        """Close the ``.2bit`` file."""
+        if not self._fh.closed:
+            self._mapped.close()
+            self._fh.close()
+
+    def _record(self, name):
+        """Return the header of a sequence record."""
+        record = self._records.get(name)
+        if record is not None:
+            return record
+        pos = self._offsets[name]
+        length, n_count = struct.unpack("<2I", self._mapped[pos:pos+8])
+        pos += 8
+        n_starts = struct.unpack("<{}I".format(n_count),
+                                 self._mapped[pos:pos+4*n_count])
+        n_sizes = struct.unpack("<{}I".format(n_count),
+                                self._mapped[pos+4*n_count:pos+8*n_count])
+        pos += 8 * n_count
+        mask_count = struct.unpack("<I", self._mapped[pos:pos+4])[0]
+        pos += 4
+        mask_starts = struct.unpack("<{}I".format(mask_count),
+                                    self._mapped[pos:pos+4*mask_count])
+        mask_sizes = struct.unpack("<{}I".format(mask_count),
+                                   self._mapped[pos+4*mask_count:
+                                                pos+8*mask_count])
+        pos += 8 * mask_count + 4
+        record = _TwoBitRecord(
+            length, n_starts, [s + n for s, n in zip(n_starts, n_sizes)],
+            mask_starts, [s + n for s, n in zip(mask_starts, mask_sizes)],
+            pos)
+        self._records[name] = record
+        return record
+
+    def length(self, name):
+        """Return the length of a sequence.
+
+        :param name: name of the sequence
+        :returns: int
+        """
+        return self._record(name).length
+
+    def sequence(self, name, start=0, end=None):
+        """Return a :class:`tinyfasta.Sequence` decoded from the file.
+
+        :param name: name of the sequence
+        :param start: zero-based start coordinate
+        :param end: zero-based end coordinate (exclusive), defaults to the end
+                    of the sequence
+        :returns: :class:`tinyfasta.Sequence`
+        """
+        record = self._record(name)
+        if end is None or end > record.length:
+            end = record.length
+        sequence = Sequence()
+        if start >= end:
+            return sequence
+        first = record.dna_offset + start // 4
+        last = record.dna_offset + (end + 3) // 4
+        bases = _unpack(self._mapped[first:last])
+        bases = bases[start % 4:start % 4 + end - start]
+        pieces = []
+        pos = start
+        for block_start, block_end in _overlapping(
+                record.n_starts, record.n_ends, start, end):
+            pieces.append(bases[pos-start:block_start-start])
+            pieces.append("N" * (block_end - block_start))
+            pos = block_end
+        pieces.append(bases[pos-start:])
+        bases = "".join(pieces)
+        pieces = []
+        pos = start
+        for block_start, block_end in _overlapping(
+                record.mask_starts, record.mask_ends, start, end):
+            pieces.append(bases[pos-start:block_start-start])
+            pieces.append(bases[block_start-start:block_end-start].lower())
+            pos = block_end
+        pieces.append(bases[pos-start:])
+        sequence.add_sequence_line("".join(pieces))
+        sequence.format_line_length()
+        return sequence
+
+    def fetch(self, region):
+        """Return a :class:`tinyfasta.FastaRecord` for a sequence or region.
+
+        :param region: sequence name or samtools style region string, see
+                       :func:`tinyfasta.index.parse_region`
+        :returns: :class:`tinyfasta.FastaRecord`
+        """
+        name, start, end = parse_region(region, self.length)
+        fasta_record = FastaRecord(region)
+        fasta_record.sequence = self.sequence(name, start, end)
+        return fasta_record
@@ -0,0 +1,221 @@
+"""Validation and normalisation of the sequence alphabet of FASTA files.
+
+The file is processed in large blocks of raw bytes cut at record boundaries.
+The header lines are split off using a regular expression and the sequence
+bytes are checked, or rewritten, using :meth:`bytes.translate` tables, so no
+Python code runs per character. Only a block that contains an invalid
+character is examined record by record to report where it is.
+"""
+
+import collections
+import io
+import re
+
+from tinyfasta._blocks import (DEFAULT_BLOCK_SIZE, read_blocks, record_name,
+                               record_spans, split_blocks)
+from tinyfasta.alphabet import ALPHABETS, UNKNOWN_RESIDUES
+from tinyfasta.bgzf import decompress_blocks, open_fasta
+
+InvalidCharacter = collections.namedtuple("InvalidCharacter",
+    ["record_number", "name", "offset", "position", "character"])
+
+# Header lines of a block, and the same anchored to the start of a line, which
+# is much slower to match but needed if ">" also occurs within a line.
+_HEADER_LINES = re.compile(b"(>[^\n]*\n?)")
+_ANCHORED_HEADER_LINES = re.compile(b"(^>[^\n]*\n?)", re.MULTILINE)
+_ALL_BYTES = bytes(range(256))
+
+
+def _split_headers(data):
+    """Return list alternating between the sequences and the header lines of
+    a block of records, starting and ending with sequences."""
+    parts = _HEADER_LINES.split(data)
+    # Each header line matched must start a line.
+    if parts[0] or not all(sequence[-1:] in (b"\n", b"")
+                           for sequence in parts[2:-1:2]):
+        parts = _ANCHORED_HEADER_LINES.split(data)
+    return parts
+
+
+def _record_blocks(source, block_size):
+    """Yield (offset, block) tuples of uncompressed blocks of bytes cut at
+    record boundaries.
+
+    Anything preceding the first record is dropped.
+    """
+    if hasattr(source, "read"):
+        fh = source.buffer if isinstance(source, io.TextIOBase) else source
+        blocks = split_blocks(decompress_blocks(read_blocks(fh, block_size)))
+        return _skip_preamble(blocks)
+    return _read_record_blocks(source, block_size)
+
+
+def _read_record_blocks(fpath, block_size):
+    """Yield blocks cut at record boundaries from a, possibly compressed,
+    file."""
+    with open_fasta(fpath) as fh:
+        for data in _skip_preamble(split_blocks(read_blocks(fh, block_size))):
+            yield data
+
+
+def _skip_preamble(blocks):
+    """Yield (offset, block) tuples, dropping anything before the first
+    record."""
+    offset = 0
+    started = False
+    for data in blocks:
+        start = 0
+        if not started:
+            start = data.find(b">")
+            if start == -1:
+                offset += len(data)
+                continue
+            started = True
+        yield offset + start, data[start:] if start else data
+        offset += len(data)
+
+
+class AlphabetValidator(object):
+    """Class for checking and cleaning the sequences of FASTA files.
+
+    The sequences may only contain characters from the alphabet, i.e. the
+    IUPAC codes for "dna" and "rna" or the amino acid codes for "protein",
+    and line feeds. Lower case letters, e.g. soft-masked repeats, and
+    carriage returns, i.e. Windows line endings, are accepted if allowed.
+    The description lines are not checked.
+
+    Gzip and BGZF compressed files are decompressed on the fly.
+    """
+
+    def __init__(self, alphabet="dna", allow_lowercase=True, allow_cr=False,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        """Initialise an instance of the AlphabetValidator class.
+
+        :param alphabet: "dna", "rna", "protein", or string of the valid
+                         upper case characters
+        :param allow_lowercase: accept the lower case letters of the
+                                alphabet
+        :param allow_cr: accept carriage returns
+        :param block_size: number of bytes read at a time
+        """
+        self.alphabet = ALPHABETS.get(alphabet, alphabet).upper()
+        self.unknown = UNKNOWN_RESIDUES.get(alphabet, "N")
+        self.allow_lowercase = allow_lowercase
+        self.allow_cr = allow_cr
+        self.block_size = block_size
+        valid = self.alphabet + "\n"
+        if allow_lowercase:
+            valid += self.alphabet.lower()
+        if allow_cr:
+            valid += "\r"
+        self._valid = valid.encode("ascii")
+
+    def first_error(self, source):
+        """Return the first invalid character in the sequences, or None.
+
+        :param source: path to the FASTA file, or binary file object to read
+                       it from
+        :returns: :class:`tinyfasta.validate.InvalidCharacter` or None
+        """
+        valid = self._valid
+        record_number = 0
+        for offset, data in _record_blocks(source, self.block_size):
+            parts = _split_headers(data)
+            if b"".join(parts[0::2]).translate(None, valid):
+                error = self._locate(data, offset, record_number)
+                if error is not None:
+                    return error
+            record_number += len(parts) // 2
+        return None
+
+    def _locate(self, data, offset, record_number):
+        """Return the first invalid character in a block of records."""
+        valid = self._valid
+        for i, (start, sequence_start, end) in enumerate(record_spans(data)):
+            body = data[sequence_start:end]
+            invalid = body.translate(None, valid)
+            if not invalid:
+                continue
+            pos = min(body.find(bytes((byte,))) for byte in set(invalid))
+            position = (pos - body.count(b"\n", 0, pos)
+                        - body.count(b"\r", 0, pos))
+            header = data[start:sequence_start]
+            return InvalidCharacter(record_number + i, record_name(header),
+                                    offset + sequence_start + pos, position,
+                                    chr(body[pos]))
+        return None
+
+    def validate(self, source):
+        """Raise ValueError if the sequences contain invalid characters.
+
+        :param source: path to the FASTA file, or binary file object to read
+                       it from
+        :raises: ValueError describing the first invalid character
+        """
+        error = self.first_error(source)
+        if error is not None:
+            raise ValueError(
+                "Invalid character {!r} at position {} of record {} ('{}'), "
+                "byte offset {}".format(error.character, error.position,
+                                        error.record_number, error.name,
+                                        error.offset))
+
+    def _normalise_table(self, uppercase, mask, strip_cr):
+        """Return (table, deletechars) for normalising sequence bytes."""
+        alphabet = self.alphabet.encode("ascii")
+        lower = self.alphabet.lower().encode("ascii")
+        keep = alphabet + b"\n"
+        if not strip_cr:
+            keep += b"\r"
+        if not uppercase and self.allow_lowercase:
+            keep += lower
+        table = bytearray(_ALL_BYTES)
+        if mask:
+            unknown = ord(self.unknown)
+            for byte in bytearray(_ALL_BYTES.translate(None, keep)):
+                table[byte] = unknown
+        if uppercase:
+            for byte in bytearray(lower):
+                table[byte] = byte - 32
+        return bytes(table), b"\r" if strip_cr else b""
+
+    def normalise(self, source, output, uppercase=False, mask=False,
+                  strip_cr=False):
+        """Write a cleaned copy of a FASTA file, returning the number of
+        residues masked.
+
+        :param source: path to the FASTA file, or binary file object to read
+                       it from
+        :param output: path to the output file, or binary file object to
+                       write it to
+        :param uppercase: convert the sequences to upper case
+        :param mask: replace the characters not in the alphabet by the
+                     unknown residue, "N" for nucleotides and "X" for
+                     proteins
+        :param strip_cr: remove carriage returns, also from the description
+                         lines
+        :returns: int
+        """
+        table, delete = self._normalise_table(uppercase, mask, strip_cr)
+        # Characters that are not masked, whatever other changes are made.
+        unmasked = self.alphabet.encode("ascii") + b"\n\r"
+        if uppercase or self.allow_lowercase:
+            unmasked += self.alphabet.lower().encode("ascii")
+        masked = 0
+        fh = output if hasattr(output, "write") else open(output, "wb")
+        try:
+            for _, data in _record_blocks(source, self.block_size):
+                parts = _split_headers(data)
+                for i in range(0, len(parts), 2):
+                    sequence = parts[i]
+                    if mask:
+                        masked += len(sequence.translate(None, unmasked))
+                    parts[i] = sequence.translate(table, delete)
+                if strip_cr:
+                    for i in range(1, len(parts), 2):
+                        parts[i] = parts[i].replace(b"\r", b"")
+                fh.write(b"".join(parts))
+        finally:
+            if fh is not output:
+                fh.close()
+        return masked
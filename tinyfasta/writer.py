@@ -0,0 +1,171 @@
+"""Buffered writing of FASTA files."""
+
+import gzip
+
+from tinyfasta.bgzf import BgzfWriter
+from tinyfasta.index import FaiEntry, write_fai
+
+_ENCODING = "utf-8"
+_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def _regular_line_bases(line_lengths):
+    """Return the common line length or None if the lines are irregular."""
+    if not line_lengths:
+        return 0
+    line_bases = line_lengths[0]
+    for n in line_lengths[1:-1]:
+        if n != line_bases:
+            return None
+    if not 0 < line_lengths[-1] <= line_bases:
+        return None
+    return line_bases
+
+
+class FastaWriter(object):
+    """Class for writing FASTA files.
+
+    Records are wrapped into lines of a fixed length straight into a large
+    output buffer, which is written out in one go when it is full. The
+    output can optionally be gzip or BGZF compressed, and a samtools
+    compatible ``.fai`` index can be written as a side product.
+
+    The :class:`tinyfasta.FastaWriter` is best used as a context manager,
+    which makes sure that the output is flushed and the file closed.
+    """
+
+    def __init__(self, fpath, line_length=80, compression=None,
+                 write_index=False, buffer_size=_BUFFER_SIZE, threads=1):
+        """Initialise an instance of the FastaWriter.
+
+        :param fpath: path to the output file
+        :param line_length: length of the sequence lines, if None the line
+                            layout of each :class:`tinyfasta.FastaRecord` is
+                            kept as it is
+        :param compression: None, "gzip" or "bgzf"
+        :param write_index: write a ``.fai`` index (and a ``.gzi`` index for
+                            BGZF output) when the writer is closed
+        :param buffer_size: number of bytes buffered before writing to file
+        :param threads: number of threads used for BGZF compression
+        """
+        if compression not in (None, "gzip", "bgzf"):
+            raise ValueError(
+                "Unknown compression '{}'".format(compression))
+        if write_index and compression == "gzip":
+            raise ValueError(
+                "Cannot index gzip compressed output, use 'bgzf' instead")
+        self.fpath = fpath
+        self.line_length = line_length
+        self.compression = compression
+        self.write_index = write_index
+        self.buffer_size = buffer_size
+        if compression == "bgzf":
+            self._fh = BgzfWriter(fpath, threads=threads)
+        elif compression == "gzip":
+            self._fh = gzip.open(fpath, "wb")
+        else:
+            self._fh = open(fpath, "wb")
+        self._buffer = []
+        self._buffered = 0
+        self._offset = 0
+        self._entries = []
+        self._names = set()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, fasta_record):
+        """Write a record to the FASTA file.
+
+        :param fasta_record: :class:`tinyfasta.FastaRecord` or (description,
+                             sequence) tuple of strings
+        """
+        if isinstance(fasta_record, tuple):
+            description, sequence = fasta_record
+            width, line_lengths = self.line_length, None
+        else:
+            description = str(fasta_record.description)
+            sequence = fasta_record.sequence._content
+            width, line_lengths = self.line_length, None
+            if width is None:
+                width = fasta_record.sequence._line_length
+                line_lengths = fasta_record.sequence._line_lengths
+        if not description.startswith(">"):
+            description = ">" + description
+        self._add(description.strip().encode(_ENCODING) + b"\n")
+        sequence_offset = self._offset
+        data = memoryview(sequence.encode(_ENCODING))
+        length = len(data)
+        if line_lengths is None:
+            width = min(width or length, length)
+            if length:
+                self._add(b"\n".join([data[i:i+width]
+                                      for i in range(0, length, width)]))
+                self._add(b"\n")
+            line_bases = width
+        else:
+            start = 0
+            for n in line_lengths:
+                self._add(data[start:start+n])
+                self._add(b"\n")
+                start += n
+            line_bases = _regular_line_bases(line_lengths)
+        if self.write_index:
+            self._index(description, length, sequence_offset, line_bases)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write_all(self, fasta_records):
+        """Write all the records in an iterable to the FASTA file.
+
+        :param fasta_records: iterable of records, e.g. a
+                              :class:`tinyfasta.FastaParser`
+        """
+        for fasta_record in fasta_records:
+            self.write(fasta_record)
+
+    def _add(self, data):
+        """Add bytes to the output buffer."""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self._offset += len(data)
+
+    def _index(self, description, length, offset, line_bases):
+        """Add an entry for the record just written to the index."""
+        fields = description[1:].split()
+        name = fields[0] if fields else ""
+        if name in self._names:
+            raise ValueError(
+                "Cannot index '{}': duplicate record name '{}'".format(
+                    self.fpath, name))
+        if line_bases is None:
+            raise ValueError(
+                "Cannot index record '{}': its sequence lines are of "
+                "different lengths".format(name))
+        self._names.add(name)
+        line_width = line_bases + 1 if line_bases else 0
+        self._entries.append(FaiEntry(name, length, offset, line_bases,
+                                      line_width))
+
+    def flush(self):
+        """Write the buffered data to file."""
+        if self._buffer:
+            self._fh.write(b"".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        """Flush the buffer, close the file and write any index files."""
+        if self.closed:
+            return
+        self.flush()
+        self._fh.close()
+        self.closed = True
+        if self.write_index:
+            write_fai(self.fpath + ".fai", self._entries)
+            if self.compression == "bgzf":
+                self._fh.index.write(self.fpath + ".gzi")